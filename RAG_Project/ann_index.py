@@ -0,0 +1,267 @@
+"""
+ANN Index — Pluggable FAISS index types for large corpora
+
+LangChain's FAISS store defaults to ``IndexFlatL2``, an exact search whose
+cost grows linearly with the number of vectors. This module builds the
+alternatives FAISS offers for large collections and swaps them into an
+existing store:
+
+* ``flat`` — exact L2 search (the default for small indexes)
+* ``ivf``  — inverted file with k-means centroids; trained on the data,
+             queried over ``nprobe`` of ``nlist`` lists
+* ``hnsw`` — hierarchical navigable small-world graph; queried with
+             ``efSearch`` candidates
+
+``auto`` picks ``flat`` below a vector-count threshold and ``ivf`` above it.
+All types use the L2 metric, matching the LangChain default.
+
+Any type can additionally store its vectors compressed:
+
+* ``sq8`` — 8-bit scalar quantization (4x smaller than float32)
+* ``pq``  — product quantization, 8 bits per ``dim / 8`` sub-vector (32x)
+
+Compressed scores are approximate. :class:`ExactRerankIndex` restores
+exact ranking by re-scoring the top candidates against full-precision
+vectors, which can stay memory-mapped on disk.
+"""
+
+import contextlib
+import logging
+import math
+import time
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+QUANTIZATIONS = ("none", "sq8", "pq")
+
+# FAISS warns when k-means has fewer than 39 training points per centroid.
+_MIN_POINTS_PER_CENTROID = 39
+_TRAINING_POINTS_PER_CENTROID = 256
+# An 8-bit product quantizer trains 256 centroids per sub-vector.
+_PQ_CENTROIDS = 256
+
+
+def choose_index_type(n_vectors: int, requested: str = "auto", auto_threshold: int = 100_000) -> str:
+    """Resolve *requested* (``auto`` or an explicit type) for *n_vectors* vectors."""
+    if requested == "auto":
+        return "ivf" if n_vectors >= auto_threshold else "flat"
+    if requested not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {requested!r}; expected auto or one of {INDEX_TYPES}")
+    return requested
+
+
+def default_nlist(n_vectors: int) -> int:
+    """Return a centroid count of roughly ``4 * sqrt(n)``, trainable on *n_vectors*."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // _MIN_POINTS_PER_CENTROID))
+
+
+def default_pq_m(dim: int) -> int:
+    """Return the number of PQ sub-vectors: ``dim / 8``, or the nearest divisor of *dim*."""
+    target = max(1, dim // 8)
+    return min((m for m in range(1, dim + 1) if dim % m == 0), key=lambda m: abs(m - target))
+
+
+def _base(index):
+    """Return the FAISS index behind an optional :class:`ExactRerankIndex`."""
+    return getattr(index, "base_index", index)
+
+
+def index_type_of(index) -> str:
+    """Return the :data:`INDEX_TYPES` name of a FAISS *index*."""
+    index = _base(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def quantization_of(index) -> str:
+    """Return the :data:`QUANTIZATIONS` name of a FAISS *index*'s vector storage."""
+    index = _base(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "sq8"
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    return "none"
+
+
+def factory_string(
+    index_type: str,
+    quantization: str,
+    dim: int,
+    n_vectors: int,
+    nlist: int | None = None,
+    hnsw_m: int = 32,
+    pq_m: int | None = None,
+) -> str:
+    """Return the ``faiss.index_factory`` description for the requested layout."""
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization!r}; expected one of {QUANTIZATIONS}")
+    storage = {"none": "Flat", "sq8": "SQ8", "pq": f"PQ{pq_m or default_pq_m(dim)}"}[quantization]
+    if index_type == "flat":
+        return storage
+    if index_type == "ivf":
+        return f"IVF{nlist or default_nlist(n_vectors)},{storage}"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}" if quantization == "none" else f"HNSW{hnsw_m},{storage}"
+    raise ValueError(f"Unknown index type {index_type!r}")
+
+
+def build_index(
+    vectors: np.ndarray,
+    index_type: str,
+    quantization: str = "none",
+    nlist: int | None = None,
+    hnsw_m: int = 32,
+    hnsw_ef_construction: int = 80,
+    pq_m: int | None = None,
+    seed: int = 0,
+):
+    """Create, train (if needed) and fill a FAISS index of *index_type*.
+
+    Trainable indexes (IVF centroids, SQ ranges, PQ codebooks) are trained
+    on a random sample of up to 256 vectors per centroid. IVF indexes get a
+    direct map so that vectors can be reconstructed, which LangChain's MMR
+    search relies on. PQ needs at least 256 training vectors; smaller sets
+    fall back to SQ8.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dim = vectors.shape
+    if quantization == "pq" and n_vectors < _PQ_CENTROIDS:
+        logger.info("Only %d vectors; using sq8 instead of pq", n_vectors)
+        quantization = "sq8"
+
+    nlist = nlist or default_nlist(n_vectors)
+    description = factory_string(index_type, quantization, dim, n_vectors, nlist, hnsw_m, pq_m)
+    index = faiss.index_factory(dim, description, faiss.METRIC_L2)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = hnsw_ef_construction
+
+    if not index.is_trained:
+        sample_size = min(n_vectors, max(nlist, _PQ_CENTROIDS) * _TRAINING_POINTS_PER_CENTROID)
+        sample = vectors
+        if sample_size < n_vectors:
+            rows = np.random.default_rng(seed).choice(n_vectors, sample_size, replace=False)
+            sample = vectors[np.sort(rows)]
+        start = time.perf_counter()
+        index.train(sample)
+        logger.info(
+            "Trained %s index on %d vectors in %.2fs",
+            description, sample_size, time.perf_counter() - start,
+        )
+
+    index.add(vectors)
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index
+
+
+def configure_search(index, nprobe: int | None = None, ef_search: int | None = None) -> None:
+    """Apply query-time knobs: ``nprobe`` for IVF, ``efSearch`` for HNSW."""
+    index = _base(index)
+    kind = index_type_of(index)
+    if kind == "ivf" and nprobe:
+        index.nprobe = min(nprobe, index.nlist)
+    elif kind == "hnsw" and ef_search:
+        index.hnsw.efSearch = ef_search
+
+
+def convert_index(
+    vectorstore: FAISS,
+    index_type: str,
+    quantization: str = "none",
+    vectors: np.ndarray | None = None,
+    **build_kwargs,
+) -> FAISS:
+    """Rebuild *vectorstore*'s index as *index_type*/*quantization* in place.
+
+    Full-precision *vectors* should be passed when the current index is
+    already quantized, so the new one is not built from lossy
+    reconstructions. Vector positions, and therefore the docstore mapping,
+    are unchanged. Returns the store.
+    """
+    current = _base(vectorstore.index)
+    if current.ntotal == 0 or (
+        index_type_of(current) == index_type and quantization_of(current) == quantization
+    ):
+        return vectorstore
+    start = time.perf_counter()
+    if vectors is None:
+        vectors = current.reconstruct_n(0, current.ntotal)
+    vectorstore.index = build_index(vectors, index_type, quantization, **build_kwargs)
+    logger.info(
+        "Converted index to %s/%s (%d vectors) in %.2fs",
+        index_type, quantization, vectorstore.index.ntotal, time.perf_counter() - start,
+    )
+    return vectorstore
+
+
+def index_nbytes(index) -> int:
+    """Return the serialized size of a FAISS *index* in bytes."""
+    return int(faiss.serialize_index(_base(index)).nbytes)
+
+
+class ExactRerankIndex:
+    """Quantized FAISS index whose top candidates are re-scored exactly.
+
+    Each search fetches ``k * factor`` candidates from *base_index* and
+    re-ranks them by squared L2 distance to *exact_vectors* (a float32
+    array or ``np.memmap`` aligned with the index positions), so only the
+    candidate rows are read. ``reconstruct`` returns exact vectors, giving
+    MMR full-precision inputs. Every other attribute is delegated to the
+    base index.
+
+    This is a query-time wrapper; persist ``base_index`` itself.
+    """
+
+    def __init__(self, base_index, exact_vectors: np.ndarray, factor: int = 4):
+        self.base_index = base_index
+        self.exact_vectors = exact_vectors
+        self.factor = max(1, factor)
+
+    def __getattr__(self, name):
+        return getattr(self.base_index, name)
+
+    def search(self, queries: np.ndarray, k: int):
+        queries = np.asarray(queries, dtype=np.float32)
+        _, candidates = self.base_index.search(queries, min(self.base_index.ntotal, k * self.factor))
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        labels = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, (query, ids) in enumerate(zip(queries, candidates)):
+            ids = np.sort(ids[ids >= 0])
+            if not len(ids):
+                continue
+            exact = np.asarray(self.exact_vectors[ids], dtype=np.float32)
+            scores = np.einsum("ij,ij->i", exact - query, exact - query)
+            best = np.argsort(scores)[:k]
+            distances[row, : len(best)] = scores[best]
+            labels[row, : len(best)] = ids[best]
+        return distances, labels
+
+    def reconstruct(self, position: int) -> np.ndarray:
+        return np.asarray(self.exact_vectors[position], dtype=np.float32)
+
+
+def enable_exact_rerank(vectorstore: FAISS, exact_vectors: np.ndarray, factor: int = 4) -> FAISS:
+    """Wrap *vectorstore*'s index in an :class:`ExactRerankIndex`."""
+    vectorstore.index = ExactRerankIndex(_base(vectorstore.index), exact_vectors, factor)
+    return vectorstore
+
+
+@contextlib.contextmanager
+def unwrapped_index(vectorstore: FAISS):
+    """Temporarily expose the raw FAISS index, e.g. for ``save_local``."""
+    wrapped = vectorstore.index
+    vectorstore.index = _base(wrapped)
+    try:
+        yield vectorstore
+    finally:
+        vectorstore.index = wrapped
@@ -0,0 +1,90 @@
+"""
+Benchmark: flat vs IVF vs HNSW FAISS indexes
+
+Builds each index type from ``ann_index`` over a synthetic clustered vector
+set and reports build time, single-query latency and recall@k against
+exact (flat) search, sweeping ``nprobe`` for IVF and ``efSearch`` for HNSW.
+
+Usage:
+    python benchmarks/bench_ann.py [--vectors 200000 --dim 256 --queries 500 --k 4]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+from ann_index import build_index, configure_search  # noqa: E402
+
+
+def _clustered_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    vectors = centers[labels] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    ordered = sorted(latencies)
+    return {
+        "latency_ms_p50": statistics.median(latencies),
+        "latency_ms_p95": ordered[int(0.95 * (len(ordered) - 1))],
+        "recall_at_k": float(recall),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = _clustered_vectors(args.vectors, args.dim, max(16, args.vectors // 2000), rng)
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    results = []
+    truth = None
+    for index_type, knob, values in (
+        ("flat", None, [None]),
+        ("ivf", "nprobe", [1, 8, 16, 64]),
+        ("hnsw", "efSearch", [16, 64, 128]),
+    ):
+        start = time.perf_counter()
+        index = build_index(vectors, index_type)
+        build_seconds = time.perf_counter() - start
+        if truth is None:
+            _, truth = index.search(queries, args.k)
+        for value in values:
+            if knob == "nprobe":
+                configure_search(index, nprobe=value)
+            elif knob == "efSearch":
+                configure_search(index, ef_search=value)
+            results.append({
+                "index_type": index_type,
+                knob or "param": value,
+                "build_seconds": build_seconds,
+                **_measure(index, queries, truth, args.k),
+            })
+
+    print(json.dumps({"vectors": args.vectors, "dim": args.dim, "k": args.k, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
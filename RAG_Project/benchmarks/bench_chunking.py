@@ -0,0 +1,108 @@
+"""
+Benchmark: RecursiveCharacterTextSplitter vs single-pass TokenChunker
+
+Parses the PDFs once (by default the AWS FAQ documents bundled in
+``Knowledgebase_Project/S3Docs``), then times splitting all pages with:
+
+* ``recursive``             — LangChain's splitter as the pipeline used it
+                              (1000/200 characters)
+* ``recursive_start_index`` — the same with ``add_start_index=True``, for
+                              the offset metadata the token chunker keeps
+* ``token``                 — ``TokenChunker`` (256/48 tokens)
+
+Pages are passed one per call (``per_page``), in batches of
+``_SPLIT_BATCH_PAGES`` as ``iter_document_chunks`` does (``batched``), and
+joined into one large text (``joined``), where the recursive splitter's
+per-level re-scanning is most visible. Reports MB/s, chunk counts and the
+spread of chunk sizes in chunker tokens, as JSON.
+
+Usage:
+    python benchmarks/bench_chunking.py [--sources DIR|GLOB|MANIFEST --repeat 5]
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_community.document_loaders import PyPDFLoader  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: E402
+
+import rag_backend as backend  # noqa: E402
+from chunker import TokenChunker, count_tokens  # noqa: E402
+
+_DEFAULT_SOURCES = os.path.join(
+    os.path.dirname(__file__), "..", "..", "Knowledgebase_Project", "S3Docs",
+)
+
+
+def _splitters() -> dict:
+    return {
+        "recursive": RecursiveCharacterTextSplitter(
+            chunk_size=1000, chunk_overlap=200, separators=backend.SPLITTER_SEPARATORS,
+        ),
+        "recursive_start_index": RecursiveCharacterTextSplitter(
+            chunk_size=1000, chunk_overlap=200, separators=backend.SPLITTER_SEPARATORS,
+            add_start_index=True,
+        ),
+        "token": TokenChunker(256, 48),
+    }
+
+
+def _measure(splitter, pages: list, repeat: int, batch_size: int) -> dict:
+    megabytes = sum(len(p.page_content.encode("utf-8")) for p in pages) / 1e6
+    batches = [pages[i:i + batch_size] for i in range(0, len(pages), batch_size)]
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = [chunk for batch in batches for chunk in splitter.split_documents(batch)]
+        seconds.append(time.perf_counter() - start)
+    sizes = [count_tokens(c.page_content) for c in chunks]
+    return {
+        "seconds_p50": statistics.median(seconds),
+        "mb_per_second": megabytes / statistics.median(seconds),
+        "chunks": len(chunks),
+        "chunk_tokens_mean": statistics.mean(sizes),
+        "chunk_tokens_min": min(sizes),
+        "chunk_tokens_max": max(sizes),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sources", default=_DEFAULT_SOURCES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    pages = [
+        page
+        for source in backend.resolve_sources(args.sources)
+        for page in PyPDFLoader(source).load()
+    ]
+    joined = [Document(page_content="\n\n".join(p.page_content for p in pages))]
+
+    results = {}
+    for name, splitter in _splitters().items():
+        results[name] = {
+            "per_page": _measure(splitter, pages, args.repeat, 1),
+            "batched": _measure(splitter, pages, args.repeat, backend._SPLIT_BATCH_PAGES),
+            "joined": _measure(splitter, joined, args.repeat, 1),
+        }
+
+    print(json.dumps({
+        "pages": len(pages),
+        "characters": len(joined[0].page_content),
+        "text_tokens": count_tokens(joined[0].page_content),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: serial ask vs concurrent ask_many throughput
+
+Answers the same batch of questions over a synthetic index with stub
+Bedrock models, first with serial ``ask`` calls and then with
+``ask_many`` at increasing ``max_concurrency``. Model calls sleep like
+network requests, so throughput should scale until the cap or the GIL-
+bound local work (retrieval, prompt assembly) dominates.
+
+Usage:
+    python benchmarks/bench_concurrency.py [--questions 200 --llm-latency 0.3 --levels 1,4,16,64]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.documents import Document  # noqa: E402
+
+import rag_backend as backend  # noqa: E402
+from bench_retrieval import _percentile  # noqa: E402
+from pdf_fixtures import page_lines  # noqa: E402
+from stubs import BagOfWordsEmbeddings, StubChatModel  # noqa: E402
+
+
+def _summary(label: str, concurrency: int, seconds: float, results: list) -> dict:
+    latencies = [r["timings"]["total"] * 1000 for r in results]
+    return {
+        "mode": label,
+        "max_concurrency": concurrency,
+        "seconds": seconds,
+        "questions_per_second": len(results) / seconds,
+        "latency_ms_p50": statistics.median(latencies),
+        "latency_ms_p95": _percentile(latencies, 95),
+        "errors": sum(r.get("error") is not None for r in results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--levels", default="1,2,4,8,16,32,64")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    docs = [
+        Document(page_content=" ".join(page_lines(i, 120, seed=3)), metadata={"page": i})
+        for i in range(args.chunks)
+    ]
+    vectorstore = backend.build_vector_index(docs, BagOfWordsEmbeddings())
+    llm = StubChatModel(
+        latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+    )
+    chain, retriever = backend.get_rag_chain(vectorstore, llm=llm)
+    rng = random.Random(0)
+    questions = [
+        " ".join(rng.sample(doc.page_content.split(), 8)) for doc in rng.choices(docs, k=args.questions)
+    ]
+
+    results = []
+    start = time.perf_counter()
+    serial = [backend.ask(chain, retriever, q) for q in questions]
+    results.append(_summary("serial_ask", 1, time.perf_counter() - start, serial))
+    for level in (int(v) for v in args.levels.split(",")):
+        start = time.perf_counter()
+        batch = backend.ask_many(chain, retriever, questions, max_concurrency=level)
+        results.append(_summary("ask_many", level, time.perf_counter() - start, batch))
+
+    print(json.dumps({
+        "questions": args.questions,
+        "llm_latency": args.llm_latency,
+        "tokens_per_second": args.tokens_per_second,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
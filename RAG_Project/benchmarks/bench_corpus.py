@@ -0,0 +1,66 @@
+"""
+Benchmark: multi-document parsing scalability
+
+Parses and splits a corpus of PDFs with ``iter_corpus_chunks`` at several
+worker-process counts and reports wall time, chunks/sec and speed-up over
+a single process. Embedding is excluded so the numbers isolate the
+CPU-bound PyPDF stage.
+
+Usage:
+    python benchmarks/bench_corpus.py [--docs 32 --pages 40]
+    python benchmarks/bench_corpus.py --corpus ../Knowledgebase_Project/S3Docs
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import rag_backend as backend  # noqa: E402
+from pdf_fixtures import make_text_pdf  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", help="Directory, glob or manifest of PDFs (default: synthetic)")
+    parser.add_argument("--docs", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.corpus:
+            paths = backend.resolve_sources(args.corpus)
+        else:
+            paths = [
+                make_text_pdf(os.path.join(tmpdir, f"policy-{i:03d}.pdf"), args.pages, seed=i)
+                for i in range(args.docs)
+            ]
+
+        results, baseline = [], None
+        for workers in args.workers:
+            start = time.perf_counter()
+            chunks = sum(1 for _ in backend.iter_corpus_chunks(paths, max_workers=workers))
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            results.append({
+                "documents": len(paths),
+                "workers": workers,
+                "chunks": chunks,
+                "seconds": elapsed,
+                "chunks_per_second": chunks / elapsed,
+                "speedup": baseline / elapsed,
+            })
+
+    print(json.dumps({"cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: sequential vs concurrent chunk embedding
+
+Embeds a synthetic set of chunks with ``FAISS.from_documents`` (one request
+at a time, today's behaviour) and with ``EmbeddingEngine`` at several worker
+counts, against a stub embedder with injected per-request latency. A final
+run caps the stub's concurrency to show adaptive back-off on throttling.
+
+Usage:
+    python benchmarks/bench_embedding.py [--chunks 400] [--latency 0.02]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_community.vectorstores import FAISS  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+
+from embedding_engine import EmbeddingEngine, build_faiss_from_documents  # noqa: E402
+from stubs import StubEmbeddings  # noqa: E402
+
+
+def _documents(n: int) -> list:
+    return [
+        Document(page_content=f"Policy clause {i}: employees accrue leave.", metadata={"page": i})
+        for i in range(n)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    docs = _documents(args.chunks)
+    results = []
+
+    stub = StubEmbeddings(latency=args.latency)
+    start = time.perf_counter()
+    FAISS.from_documents(docs, stub)
+    elapsed = time.perf_counter() - start
+    results.append({"mode": "from_documents", "workers": 1, "seconds": elapsed,
+                    "chunks_per_second": args.chunks / elapsed})
+
+    for workers in args.workers:
+        stub = StubEmbeddings(latency=args.latency)
+        engine = EmbeddingEngine(stub, max_workers=workers)
+        build_faiss_from_documents(docs, stub, engine)
+        results.append({"mode": "engine", "workers": workers, **engine.stats})
+
+    throttled = StubEmbeddings(latency=args.latency, max_concurrency=4)
+    engine = EmbeddingEngine(throttled, max_workers=16, base_delay=0.01)
+    build_faiss_from_documents(docs, throttled, engine)
+    results.append({"mode": "engine_throttled", "workers": 16, **engine.stats})
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
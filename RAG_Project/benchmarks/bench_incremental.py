@@ -0,0 +1,74 @@
+"""
+Benchmark: full rebuild vs incremental page-level re-index after a one-page edit
+
+Indexes a synthetic multi-page PDF through ``build_vector_index`` with a
+private index cache, then amends one page and rebuilds it twice: once
+with ``INDEX_INCREMENTAL`` off (everything re-embedded) and once with it
+on (only the edited page). Reports embedding calls and wall time of each.
+
+Usage:
+    python benchmarks/bench_incremental.py [--pages 500 --embed-latency 0.02 --edited-page 250]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import rag_backend as backend  # noqa: E402
+from index_cache import IndexCache  # noqa: E402
+from pdf_fixtures import make_text_pdf  # noqa: E402
+from stubs import StubEmbeddings  # noqa: E402
+
+
+def _build(pdf_path: str, embeddings: StubEmbeddings, cache_dir: str, incremental: bool) -> dict:
+    backend._index_cache = IndexCache(cache_dir, max_entries=10)
+    backend.INDEX_INCREMENTAL = incremental
+    embeddings.calls = 0
+    start = time.perf_counter()
+    vectorstore = backend.build_vector_index(embeddings=embeddings, pdf_url=pdf_path)
+    return {
+        "seconds": time.perf_counter() - start,
+        "embedding_calls": embeddings.calls,
+        "vectors": vectorstore.index.ntotal,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--edited-page", type=int, default=None)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+    edited_page = args.edited_page or args.pages // 2
+
+    embeddings = StubEmbeddings(dim=args.dim, latency=args.embed_latency)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pdf_path = os.path.join(tmpdir, "policy.pdf")
+        make_text_pdf(pdf_path, args.pages)
+        results = {}
+        for mode, incremental in (("full_rebuild", False), ("incremental", True)):
+            cache_dir = os.path.join(tmpdir, f"cache-{mode}")
+            make_text_pdf(pdf_path, args.pages)
+            results["initial_build"] = _build(pdf_path, embeddings, cache_dir, incremental)
+            make_text_pdf(pdf_path, args.pages, edited_pages={edited_page})
+            results[mode] = _build(pdf_path, embeddings, cache_dir, incremental)
+
+    print(json.dumps({
+        "pages": args.pages,
+        "edited_page": edited_page,
+        "embed_latency": args.embed_latency,
+        "embed_max_workers": backend.EMBED_MAX_WORKERS,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
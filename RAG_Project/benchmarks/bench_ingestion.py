@@ -0,0 +1,92 @@
+"""
+Benchmark: eager vs streaming PDF ingestion
+
+Builds a FAISS index from a synthetic multi-page PDF two ways and reports
+wall time and peak resident memory of each:
+
+* ``eager``     — ``load_and_split_documents`` then ``FAISS.from_documents``
+                  (every page, chunk and vector list in memory at once)
+* ``streaming`` — ``iter_document_chunks`` into ``build_faiss_streaming``
+                  (page-by-page parsing overlapped with batched embedding)
+
+Each mode runs in a fresh subprocess so peak RSS is not shared.
+
+Usage:
+    python benchmarks/bench_ingestion.py [--pages 1000] [--dim 1024]
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _run_mode(mode: str, pdf_path: str, dim: int, latency: float) -> dict:
+    from langchain_community.vectorstores import FAISS
+
+    import rag_backend as backend
+    from embedding_engine import EmbeddingEngine, build_faiss_streaming
+    from stubs import StubEmbeddings
+
+    embeddings = StubEmbeddings(dim=dim, latency=latency)
+    start = time.perf_counter()
+    if mode == "eager":
+        chunks = backend.load_and_split_documents(pdf_path)
+        vectorstore = FAISS.from_documents(chunks, embeddings)
+    else:
+        engine = EmbeddingEngine(embeddings, max_workers=backend.EMBED_MAX_WORKERS)
+        vectorstore = build_faiss_streaming(
+            backend.iter_document_chunks(pdf_path), embeddings, engine,
+            batch_size=backend.EMBED_BATCH_SIZE,
+        )
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "vectors": vectorstore.index.ntotal,
+        "seconds": elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--words-per-page", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--mode", choices=["eager", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    if args.mode:
+        print(json.dumps(_run_mode(args.mode, args.pdf, args.dim, args.latency)))
+        return
+
+    from pdf_fixtures import make_text_pdf
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pdf_path = make_text_pdf(
+            os.path.join(tmpdir, "bench.pdf"), args.pages, args.words_per_page,
+        )
+        for mode in ("eager", "streaming"):
+            output = subprocess.run(
+                [sys.executable, "-W", "ignore", __file__, "--mode", mode, "--pdf", pdf_path,
+                 "--dim", str(args.dim), "--latency", str(args.latency)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results.append({"pages": args.pages, **json.loads(output.strip().splitlines()[-1])})
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: LangChain FAISS MMR vs vectorized MMRRetriever
+
+Builds a FAISS store over synthetic clustered vectors (same generator as
+``bench_ann``) and times MMR selection for the same query vectors with
+LangChain's ``max_marginal_relevance_search_by_vector`` and with
+``MMRRetriever.search_by_vector``, at several ``fetch_k`` values. The
+index is HNSW by default so that candidate search does not drown out the
+MMR stage. Also reports how often both return the same documents in the
+same order.
+
+Usage:
+    python benchmarks/bench_mmr.py [--vectors 50000 --dim 1024 --index-type hnsw --fetch-k 8,50,200]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+from langchain_community.vectorstores import FAISS  # noqa: E402
+
+from ann_index import configure_search, convert_index  # noqa: E402
+from bench_ann import _clustered_vectors  # noqa: E402
+from bench_retrieval import _percentile  # noqa: E402
+from mmr_retrieval import MMRRetriever, get_normalized_vectors  # noqa: E402
+from stubs import StubEmbeddings  # noqa: E402
+
+
+def _time(search, queries: np.ndarray) -> tuple:
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        docs = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([d.id for d in docs])
+    return latencies, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", default="8,50,200")
+    parser.add_argument("--index-type", default="hnsw", choices=("flat", "ivf", "hnsw"))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = _clustered_vectors(args.vectors, args.dim, max(16, args.vectors // 2000), rng)
+    vectorstore = FAISS.from_embeddings(
+        ((f"chunk {i}", vector) for i, vector in enumerate(vectors)), StubEmbeddings(args.dim),
+    )
+    convert_index(vectorstore, args.index_type)
+    configure_search(vectorstore.index, nprobe=16, ef_search=256)
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    start = time.perf_counter()
+    get_normalized_vectors(vectorstore)
+    matrix_seconds = time.perf_counter() - start
+
+    results = []
+    for fetch_k in (int(v) for v in args.fetch_k.split(",")):
+        retriever = MMRRetriever(vectorstore=vectorstore, k=args.k, fetch_k=fetch_k)
+        baseline, expected = _time(
+            lambda q: vectorstore.max_marginal_relevance_search_by_vector(q, k=args.k, fetch_k=fetch_k),
+            queries,
+        )
+        vectorized, found = _time(retriever.search_by_vector, queries)
+        results.append({
+            "fetch_k": fetch_k,
+            "langchain_ms_p50": statistics.median(baseline),
+            "langchain_ms_p95": _percentile(baseline, 95),
+            "vectorized_ms_p50": statistics.median(vectorized),
+            "vectorized_ms_p95": _percentile(vectorized, 95),
+            "identical_results": sum(a == b for a, b in zip(expected, found)) / len(queries),
+        })
+
+    print(json.dumps({
+        "vectors": args.vectors,
+        "dim": args.dim,
+        "k": args.k,
+        "index_type": args.index_type,
+        "matrix_build_seconds": matrix_seconds,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark: end-to-end RAG pipeline with stub Bedrock models
+
+Runs the public ``rag_backend`` entry points over local PDFs (by default
+the AWS FAQ documents bundled in ``Knowledgebase_Project/S3Docs``) with a
+deterministic local embedder (``BagOfWordsEmbeddings`` by default, so
+retrieval returns related chunks, or latency-injecting ``StubEmbeddings``)
+and a ``StubChatModel`` whose first-token latency and token rate are
+configurable:
+
+* ``load_and_split``     — ``load_and_split_documents`` once per PDF
+* ``build_vector_index`` — embedding and indexing every chunk, repeated
+* ``get_rag_chain``      — chain and retriever construction, repeated
+* ``ask``                — one call per generated question, with its
+                           ``retrieval`` and ``generation`` sub-stages
+
+Each stage reports p50/p95/p99 latency, throughput and the process peak
+RSS after the stage, as JSON on stdout, together with the prompt tokens
+sent to the model per ``ask``. No AWS access is needed.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sources DIR|GLOB|MANIFEST --questions 30
+                                         --llm-latency 0.2 --tokens-per-second 200
+                                         --context-dedup false --context-max-tokens 0]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import rag_backend as backend  # noqa: E402
+from bench_retrieval import _percentile  # noqa: E402
+from stubs import BagOfWordsEmbeddings, StubChatModel, StubEmbeddings  # noqa: E402
+
+_DEFAULT_SOURCES = os.path.join(
+    os.path.dirname(__file__), "..", "..", "Knowledgebase_Project", "S3Docs",
+)
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _stage(latencies: list, work: dict | None = None) -> dict:
+    """Summarise per-run *latencies* (seconds) and *work* done across all runs."""
+    elapsed = sum(latencies)
+    latency_ms = [s * 1000 for s in latencies]
+    return {
+        "runs": len(latencies),
+        "latency_ms": {
+            "p50": _percentile(latency_ms, 50),
+            "p95": _percentile(latency_ms, 95),
+            "p99": _percentile(latency_ms, 99),
+            "mean": statistics.fmean(latency_ms),
+        },
+        "throughput": {
+            f"{unit}_per_second": count / elapsed if elapsed else None
+            for unit, count in {"runs": len(latencies), **(work or {})}.items()
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _questions(chunks: list, count: int, rng: random.Random) -> list:
+    """Build questions from short word runs of randomly chosen chunks."""
+    questions = []
+    for chunk in rng.choices(chunks, k=count):
+        words = chunk.page_content.split()
+        start = rng.randrange(max(1, len(words) - 8))
+        questions.append(f"What does the document say about {' '.join(words[start:start + 8])}?")
+    return questions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sources", default=_DEFAULT_SOURCES)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--build-repeats", type=int, default=3)
+    parser.add_argument("--embedder", choices=("bow", "stub"), default="bow")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--search-type", default=backend.SEARCH_TYPE)
+    parser.add_argument("--context-dedup", choices=("true", "false"), default=str(backend.CONTEXT_DEDUP).lower())
+    parser.add_argument("--context-max-tokens", type=int, default=backend.CONTEXT_MAX_TOKENS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+    backend.CONTEXT_DEDUP = args.context_dedup == "true"
+    backend.CONTEXT_MAX_TOKENS = args.context_max_tokens
+
+    sources = backend.resolve_sources(args.sources)
+    if not sources:
+        parser.error(f"no PDFs found for {args.sources!r}")
+    if args.embedder == "bow":
+        embeddings = BagOfWordsEmbeddings(dim=args.dim)
+    else:
+        embeddings = StubEmbeddings(dim=args.dim, latency=args.embed_latency)
+    llm = StubChatModel(
+        latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        answer_tokens=args.answer_tokens,
+    )
+    stages = {}
+
+    chunks, latencies = [], []
+    for source in sources:
+        start = time.perf_counter()
+        chunks.extend(backend.load_and_split_documents(source))
+        latencies.append(time.perf_counter() - start)
+    stages["load_and_split"] = _stage(latencies, {"chunks": len(chunks)})
+
+    latencies = []
+    for _ in range(args.build_repeats):
+        start = time.perf_counter()
+        vectorstore = backend.build_vector_index(chunks, embeddings)
+        latencies.append(time.perf_counter() - start)
+    stages["build_vector_index"] = _stage(latencies, {"chunks": len(chunks) * args.build_repeats})
+
+    latencies = []
+    for _ in range(args.build_repeats):
+        start = time.perf_counter()
+        chain, retriever = backend.get_rag_chain(vectorstore, llm=llm, search_type=args.search_type)
+        latencies.append(time.perf_counter() - start)
+    stages["get_rag_chain"] = _stage(latencies)
+
+    timings = []
+    for question in _questions(chunks, args.questions, random.Random(0)):
+        timings.append(backend.ask(chain, retriever, question)["timings"])
+    stages["ask"] = _stage(
+        [t["total"] for t in timings],
+        {"answer_tokens": args.answer_tokens * len(timings)},
+    )
+    for sub_stage in ("retrieval", "generation"):
+        stages[f"ask.{sub_stage}"] = _stage([t.get(sub_stage, 0.0) for t in timings])
+
+    print(json.dumps({
+        "config": {
+            "sources": len(sources),
+            "chunks": len(chunks),
+            "chunk_size": backend.CHUNK_SIZE,
+            "chunk_overlap": backend.CHUNK_OVERLAP,
+            "embedder": args.embedder,
+            "dim": args.dim,
+            "search_type": args.search_type,
+            "embed_latency": args.embed_latency,
+            "llm_latency": args.llm_latency,
+            "tokens_per_second": args.tokens_per_second,
+            "prefill_tokens_per_second": args.prefill_tokens_per_second,
+            "answer_tokens": args.answer_tokens,
+            "context_dedup": backend.CONTEXT_DEDUP,
+            "context_max_tokens": backend.CONTEXT_MAX_TOKENS,
+        },
+        "input_tokens_per_ask": llm.input_tokens / len(timings) if timings else None,
+        "stages": stages,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: float32 vs SQ8 vs PQ index storage, with and without exact re-rank
+
+Builds each quantization from ``ann_index`` over a synthetic clustered
+vector set (same generator as ``bench_ann``) and reports serialized index
+size, load (deserialize) time, single-query latency and recall@k against
+exact float32 search. Quantized indexes are measured twice: on their own
+and wrapped in ``ExactRerankIndex`` over memory-mapped float32 vectors.
+
+Usage:
+    python benchmarks/bench_quantization.py [--vectors 200000 --dim 256 --index-type flat]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+from ann_index import ExactRerankIndex, build_index, configure_search, index_nbytes  # noqa: E402
+from bench_ann import _clustered_vectors, _measure  # noqa: E402
+
+
+def _load_seconds(index) -> float:
+    data = faiss.serialize_index(index)
+    start = time.perf_counter()
+    faiss.deserialize_index(data)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--index-type", default="flat", choices=("flat", "ivf", "hnsw"))
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = _clustered_vectors(args.vectors, args.dim, max(16, args.vectors // 2000), rng)
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    _, truth = build_index(vectors, "flat").search(queries, args.k)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        vectors_path = os.path.join(tmpdir, "vectors.npy")
+        np.save(vectors_path, vectors)
+        exact_vectors = np.load(vectors_path, mmap_mode="r")
+
+        results = []
+        for quantization in ("none", "sq8", "pq"):
+            start = time.perf_counter()
+            index = build_index(vectors, args.index_type, quantization)
+            configure_search(index, nprobe=16, ef_search=64)
+            row = {
+                "quantization": quantization,
+                "build_seconds": time.perf_counter() - start,
+                "index_mb": index_nbytes(index) / 1e6,
+                "load_seconds": _load_seconds(index),
+            }
+            results.append({**row, "rerank": False, **_measure(index, queries, truth, args.k)})
+            if quantization != "none":
+                reranked = ExactRerankIndex(index, exact_vectors, args.rerank_factor)
+                results.append({**row, "rerank": True, **_measure(reranked, queries, truth, args.k)})
+
+    print(json.dumps({
+        "vectors": args.vectors,
+        "dim": args.dim,
+        "k": args.k,
+        "index_type": args.index_type,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: MMR vs similarity vs hybrid (BM25 + vector RRF) retrieval
+
+Builds an index over synthetic policy chunks, each tagged with a unique
+clause number and leave-type acronym, and measures per-query latency and
+recall@k for two query classes:
+
+* ``identifier`` — exact clause-number lookups ("clause 12.3.4")
+* ``topical``    — a handful of words drawn from the chunk body
+
+Vectors come from ``BagOfWordsEmbeddings``, which (like dense models)
+ignores digits, so identifier queries show what lexical matching adds.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--chunks 2000 --queries 200 --k 4]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.documents import Document  # noqa: E402
+
+import rag_backend as backend  # noqa: E402
+from pdf_fixtures import page_lines  # noqa: E402
+from stubs import BagOfWordsEmbeddings  # noqa: E402
+
+_ACRONYMS = ["CL", "SL", "EL", "ML", "PL", "LWP", "CO", "BL"]
+
+
+def _corpus(n: int) -> list:
+    docs = []
+    for i in range(n):
+        clause = f"{i // 100 + 1}.{i // 10 % 10 + 1}.{i % 10 + 1}"
+        body = " ".join(page_lines(i, 60, seed=7)[1:])
+        docs.append(Document(
+            page_content=f"Clause {clause} ({_ACRONYMS[i % len(_ACRONYMS)]}): {body}",
+            metadata={"page": i, "clause": clause},
+        ))
+    return docs
+
+
+def _queries(docs: list, count: int, rng: random.Random) -> list:
+    queries = []
+    for doc in rng.sample(docs, count):
+        queries.append(("identifier", f"What does clause {doc.metadata['clause']} say?", doc.metadata["page"]))
+        words = doc.page_content.split(":", 1)[1].split()
+        queries.append(("topical", " ".join(rng.sample(words, 8)), doc.metadata["page"]))
+    return queries
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+    backend.SEARCH_K = args.k
+
+    docs = _corpus(args.chunks)
+    vectorstore = backend.build_vector_index(docs, BagOfWordsEmbeddings())
+    queries = _queries(docs, min(args.queries, len(docs)), random.Random(0))
+
+    results = []
+    for search_type in ("mmr", "similarity", "hybrid"):
+        retriever = backend.get_retriever(vectorstore, search_type)
+        latencies, hits = [], {"identifier": [], "topical": []}
+        for kind, query, target_page in queries:
+            start = time.perf_counter()
+            found = retriever.invoke(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits[kind].append(any(d.metadata["page"] == target_page for d in found))
+        results.append({
+            "search_type": search_type,
+            "k": args.k,
+            "latency_ms_p50": statistics.median(latencies),
+            "latency_ms_p95": _percentile(latencies, 95),
+            **{f"recall@k_{kind}": sum(h) / len(h) for kind, h in hits.items()},
+        })
+
+    print(json.dumps({"chunks": args.chunks, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
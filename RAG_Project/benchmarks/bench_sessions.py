@@ -0,0 +1,123 @@
+"""
+Benchmark: per-session vs process-wide shared index in the Streamlit frontend
+
+Opens several chat sessions in one process with Streamlit's ``AppTest``
+and, for each, measures the time from session start to the first
+complete answer and the growth in resident memory the session causes:
+
+* ``per_session`` — the frontend's former start-up: every session runs
+                    ``build_vector_index`` and ``get_rag_chain`` and keeps
+                    the result in ``st.session_state`` (index cache on, so
+                    later sessions load the index from disk)
+* ``shared``      — the real ``rag_frontend.py``, where every session
+                    reuses the one warmed-up ``RAGService``
+
+Bedrock is replaced by stub models and the PDF by a synthetic one.
+
+Usage:
+    python benchmarks/bench_sessions.py [--sessions 5 --pages 300 --embed-latency 0.01]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import rag_backend as backend  # noqa: E402
+from index_cache import IndexCache  # noqa: E402
+from pdf_fixtures import make_text_pdf  # noqa: E402
+from stubs import StubChatModel, StubEmbeddings  # noqa: E402
+
+_FRONTEND = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rag_frontend.py"))
+_QUESTION = "How many days of casual leave can be carried forward?"
+
+# The frontend's start-up and answer path before the shared service.
+_PER_SESSION_APP = """
+import streamlit as st
+import rag_backend as backend
+
+if "rag_chain" not in st.session_state:
+    vectorstore = backend.build_vector_index(pdf_url=backend.PDF_SOURCE_URL)
+    st.session_state.rag_chain, st.session_state.rag_retriever = backend.get_rag_chain(vectorstore)
+
+if user_input := st.chat_input("Ask a question about the document …"):
+    deltas = backend.ask_stream(
+        st.session_state.rag_chain, user_input, retriever=st.session_state.rag_retriever
+    )
+    st.write_stream(item for item in deltas if isinstance(item, str))
+"""
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def _open_session(mode: str) -> AppTest:
+    if mode == "shared":
+        app = AppTest.from_file(_FRONTEND, default_timeout=600)
+    else:
+        app = AppTest.from_string(_PER_SESSION_APP, default_timeout=600)
+    app.run()
+    app.chat_input[0].set_value(_QUESTION).run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        backend.PDF_SOURCE_URL = make_text_pdf(os.path.join(tmpdir, "policy.pdf"), args.pages)
+        backend.get_embeddings = lambda: StubEmbeddings(dim=args.dim, latency=args.embed_latency)
+        backend.get_llm = lambda: StubChatModel(latency=args.llm_latency, tokens_per_second=200.0)
+
+        results = {}
+        for mode in ("per_session", "shared"):
+            backend._index_cache = IndexCache(os.path.join(tmpdir, f"cache-{mode}"))
+            open_apps, sessions = [], []
+            for number in range(1, args.sessions + 1):
+                rss_before = _rss_mb()
+                start = time.perf_counter()
+                open_apps.append(_open_session(mode))
+                sessions.append({
+                    "session": number,
+                    "time_to_first_answer_s": time.perf_counter() - start,
+                    "rss_growth_mb": _rss_mb() - rss_before,
+                })
+            later = sessions[1:] or sessions
+            results[mode] = {
+                "sessions": sessions,
+                "mean_rss_growth_per_additional_session_mb":
+                    sum(s["rss_growth_mb"] for s in later) / len(later),
+                "mean_time_to_first_answer_additional_sessions_s":
+                    sum(s["time_to_first_answer_s"] for s in later) / len(later),
+            }
+            open_apps.clear()
+
+    print(json.dumps({
+        "pages": args.pages,
+        "dim": args.dim,
+        "embed_latency": args.embed_latency,
+        "llm_latency": args.llm_latency,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
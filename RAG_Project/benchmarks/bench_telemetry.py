@@ -0,0 +1,96 @@
+"""
+Benchmark: telemetry overhead
+
+Measures the cost of one empty ``telemetry.span`` with telemetry enabled,
+enabled with JSON log lines (to a null handler), and disabled, then the
+latency of full ``ask`` calls over a synthetic index with an instant stub
+model in each mode, where instrumentation overhead is least hidden by
+model time. Prints JSON including the per-stage registry summary.
+
+Usage:
+    python benchmarks/bench_telemetry.py [--chunks 2000 --asks 300 --spans 200000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.documents import Document  # noqa: E402
+
+import rag_backend as backend  # noqa: E402
+import telemetry  # noqa: E402
+from bench_retrieval import _percentile  # noqa: E402
+from pdf_fixtures import page_lines  # noqa: E402
+from stubs import BagOfWordsEmbeddings, StubChatModel  # noqa: E402
+
+_MODES = {
+    "disabled": {"enabled": False, "json_log": False},
+    "enabled": {"enabled": True, "json_log": False},
+    "enabled_json_log": {"enabled": True, "json_log": True},
+}
+
+
+def _span_ns(spans: int) -> float:
+    start = time.perf_counter()
+    for _ in range(spans):
+        with telemetry.span("noop"):
+            pass
+    return (time.perf_counter() - start) / spans * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--asks", type=int, default=300)
+    parser.add_argument("--spans", type=int, default=200_000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+    telemetry.logger.setLevel(logging.INFO)
+    telemetry.logger.addHandler(logging.NullHandler())
+    telemetry.logger.propagate = False
+
+    docs = [
+        Document(page_content=" ".join(page_lines(i, 120, seed=3)), metadata={"page": i})
+        for i in range(args.chunks)
+    ]
+    vectorstore = backend.build_vector_index(docs, BagOfWordsEmbeddings())
+    chain, retriever = backend.get_rag_chain(vectorstore, llm=StubChatModel(answer_tokens=16))
+    questions = [" ".join(doc.page_content.split()[:8]) for doc in docs[: args.asks]]
+
+    results, summary = {}, {}
+    for mode, settings in _MODES.items():
+        telemetry.configure(**settings)
+        span_ns = _span_ns(args.spans)
+        telemetry.reset()
+        for question in questions[:20]:
+            backend.ask(chain, retriever, question)
+        latencies = []
+        for question in questions:
+            start = time.perf_counter()
+            backend.ask(chain, retriever, question)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[mode] = {
+            "span_overhead_ns": span_ns,
+            "ask_ms_p50": statistics.median(latencies),
+            "ask_ms_p95": _percentile(latencies, 95),
+        }
+        if mode == "enabled":
+            summary = telemetry.summary()
+
+    print(json.dumps({
+        "chunks": args.chunks,
+        "asks": args.asks,
+        "search_type": backend.SEARCH_TYPE,
+        "results": results,
+        "registry_summary": summary,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Synthetic PDF fixtures for offline benchmarks
+
+Writes text PDFs of arbitrary length with deterministic, policy-like
+content so ingestion benchmarks can run without downloading documents.
+"""
+
+import random
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+_WORDS = (
+    "employee leave policy casual sick earned maternity paternity holiday "
+    "manager approval days year month salary notice period clause section "
+    "entitlement accrual carry forward encashment probation confirmation "
+    "attendance working hours compensatory off weekend public record"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_lines(page_number: int, words_per_page: int, seed: int = 0) -> list:
+    """Return the text lines of one synthetic page."""
+    rng = random.Random(seed * 1_000_003 + page_number)
+    words = [rng.choice(_WORDS) for _ in range(words_per_page)]
+    lines = [f"Section {page_number}."]
+    for start in range(0, len(words), 12):
+        lines.append(" ".join(words[start:start + 12]))
+        if rng.random() < 0.15:
+            lines.append("")
+    return lines
+
+
+def make_text_pdf(
+    path: str, pages: int, words_per_page: int = 400, seed: int = 0, edited_pages=(),
+) -> str:
+    """Write a *pages*-page text PDF to *path* and return the path.
+
+    Page numbers in *edited_pages* get different text (drawn with
+    ``seed + 1``), simulating an amended version of the same document.
+    """
+    return write_text_pdf(path, [
+        page_lines(number, words_per_page, seed + 1 if number in edited_pages else seed)
+        for number in range(1, pages + 1)
+    ])
+
+
+def write_text_pdf(path: str, pages: list) -> str:
+    """Write a PDF with one page per list of text lines in *pages* and return the path."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for lines in pages:
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+        body = " T* ".join(f"({_escape(line)}) Tj" for line in lines)
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 9 Tf 11 TL 40 760 Td {body} ET".encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    with open(path, "wb") as fh:
+        writer.write(fh)
+    return path
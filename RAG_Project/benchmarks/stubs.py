@@ -0,0 +1,156 @@
+"""
+Stub Bedrock models for offline benchmarks
+
+Deterministic stand-ins for ``BedrockEmbeddings`` and ``ChatBedrock`` that
+need no AWS access. Latency, token rate and throttling are injected so the
+benchmarks exercise the same code paths as live Titan and Claude endpoints.
+"""
+
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+from botocore.exceptions import ClientError
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class StubEmbeddings(Embeddings):
+    """Hash-seeded random unit vectors with simulated request latency.
+
+    Each text costs one "request" of *latency* seconds. If more than
+    *max_concurrency* requests are in flight the call fails with a
+    ``ThrottlingException``, like Bedrock does when over quota.
+    """
+
+    def __init__(self, dim: int = 256, latency: float = 0.0, max_concurrency: int | None = None):
+        self.dim = dim
+        self.latency = latency
+        self.max_concurrency = max_concurrency
+        self.calls = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _request(self, text: str) -> list:
+        with self._lock:
+            self.calls += 1
+            if self.max_concurrency is not None and self._in_flight >= self.max_concurrency:
+                raise ClientError(
+                    {"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}},
+                    "InvokeModel",
+                )
+            self._in_flight += 1
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            return self._vector(text)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def embed_documents(self, texts: list) -> list:
+        return [self._request(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self._request(text)
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """Feature-hashed bag-of-words vectors over alphabetic words only.
+
+    Gives retrieval-quality benchmarks a meaningful notion of similarity.
+    Digits are dropped, mimicking how dense embedding models blur exact
+    identifiers such as clause numbers.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.calls = 0
+
+    def _vector(self, text: str) -> list:
+        self.calls += 1
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"[a-z]+", text.lower()):
+            bucket = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest(), "little")
+            vector[bucket % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self._vector(text)
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model answering with deterministic filler at a fixed token rate.
+
+    Each reply waits *latency* seconds plus the prompt's prefill time at
+    *prefill_tokens_per_second* before its first token, then emits
+    *answer_tokens* tokens at *tokens_per_second*, streamed token by token
+    when the caller streams. The words are seeded from the prompt so
+    repeated questions get identical answers. Prompt sizes (estimated at
+    four characters per token) accumulate in ``input_tokens``.
+    """
+
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    prefill_tokens_per_second: float = 0.0
+    answer_tokens: int = 64
+    input_tokens: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _prompt(self, messages: list) -> str:
+        prompt = "".join(str(message.content) for message in messages)
+        self.input_tokens += len(prompt) // 4
+        return prompt
+
+    def _first_token_delay(self, prompt: str) -> float:
+        prefill = len(prompt) / 4 / self.prefill_tokens_per_second if self.prefill_tokens_per_second else 0.0
+        return self.latency + prefill
+
+    def _tokens(self, prompt: str) -> list:
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "little")
+        rng = np.random.default_rng(seed)
+        return [f"w{n} " for n in rng.integers(0, 5000, self.answer_tokens)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = self._prompt(messages)
+        tokens = self._tokens(prompt)
+        delay = self._first_token_delay(prompt)
+        delay += len(tokens) / self.tokens_per_second if self.tokens_per_second else 0.0
+        if delay:
+            time.sleep(delay)
+        usage = {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(tokens),
+            "total_tokens": len(prompt) // 4 + len(tokens),
+        }
+        message = AIMessage(content="".join(tokens), usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self._prompt(messages)
+        delay = self._first_token_delay(prompt)
+        if delay:
+            time.sleep(delay)
+        for token in self._tokens(prompt):
+            if self.tokens_per_second:
+                time.sleep(1.0 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,150 @@
+"""
+Context Packer — Deduplicated, token-budgeted prompt context
+
+Chunks are split with ``CHUNK_OVERLAP`` characters shared between
+neighbours, so the top-k retrieved chunks often repeat text. Two adjacent
+chunks from one page carry the same overlap, and boilerplate lines
+(headers, footers, disclaimers) recur across pages. Claude bills and
+prefills every repeated input token.
+
+:func:`pack_context` assembles the context in relevance order:
+
+1. chunks of the same page that overlap or contain one another are merged
+2. lines already emitted by a more relevant chunk are dropped
+3. segments are kept until the token budget is spent, the last one cut at
+   a line or sentence boundary
+"""
+
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEPARATOR = "\n\n---\n\n"
+
+# Bedrock has no local tokenizer; ~4 characters per token is close for
+# English prose with Claude and Titan.
+_CHARS_PER_TOKEN = 4
+# Shorter lines (headings, bullets, numbers) are legitimately repeated.
+_MIN_DEDUP_LINE_CHARS = 30
+# Do not bother appending a truncated tail shorter than this.
+_MIN_TAIL_TOKENS = 32
+_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s|\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Return an approximate token count for *text*."""
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+
+def _join_overlapping(first: str, second: str, min_overlap: int) -> str | None:
+    """Return *first* and *second* joined over their shared span, or ``None``."""
+    if second in first:
+        return first
+    probe = second[:min_overlap]
+    start = first.find(probe)
+    while start != -1:
+        if second.startswith(first[start:]):
+            return first + second[len(first) - start:]
+        start = first.find(probe, start + 1)
+    return None
+
+
+def _merge(first: str, second: str, min_overlap: int) -> str | None:
+    return _join_overlapping(first, second, min_overlap) or _join_overlapping(second, first, min_overlap)
+
+
+def merge_overlapping(docs: list, min_overlap: int = 20) -> list:
+    """Merge overlapping chunks of the same source page.
+
+    Returns one text per merged segment, ordered by the rank of its most
+    relevant chunk. Chunks from different pages are never merged.
+    """
+    segments = []  # [page key, text], in order of first appearance
+    for doc in docs:
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        text = doc.page_content.strip()
+        absorbed_into = None
+        for segment in segments:
+            if segment[0] != key:
+                continue
+            merged = _merge(segment[1], text, min_overlap)
+            if merged is None:
+                continue
+            if absorbed_into is None:
+                segment[1] = text = merged
+                absorbed_into = segment
+            else:
+                # The new chunk bridged two earlier segments of the page.
+                absorbed_into[1] = text = merged
+                segment[0] = None
+        segments = [s for s in segments if s[0] is not None]
+        if absorbed_into is None:
+            segments.append([key, text])
+    return [text for _, text in segments]
+
+
+def drop_repeated_lines(texts: list, min_chars: int = _MIN_DEDUP_LINE_CHARS) -> list:
+    """Remove lines of *min_chars* or more that an earlier text already contains."""
+    seen = set()
+    result = []
+    for text in texts:
+        kept = []
+        for line in text.split("\n"):
+            normalized = " ".join(line.split()).lower()
+            if len(normalized) >= min_chars:
+                if normalized in seen:
+                    continue
+                seen.add(normalized)
+            kept.append(line)
+        text = "\n".join(kept).strip()
+        if text:
+            result.append(text)
+    return result
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cut *text* to *max_chars*, preferring the last line or sentence end."""
+    head = text[:max_chars]
+    boundaries = [m.start() for m in _BOUNDARY_RE.finditer(head)]
+    if boundaries and boundaries[-1] >= max_chars // 2:
+        return head[: boundaries[-1]].rstrip()
+    return head.rstrip()
+
+
+def pack_context(
+    docs: list,
+    max_tokens: int | None = None,
+    dedup: bool = True,
+    separator: str = DEFAULT_SEPARATOR,
+) -> str:
+    """Join retrieved *docs* (most relevant first) into a prompt context.
+
+    With *dedup*, overlapping same-page chunks are merged and repeated
+    lines dropped. If *max_tokens* is set, segments are added in relevance
+    order until the estimated token budget is reached.
+    """
+    texts = [doc.page_content for doc in docs]
+    if dedup:
+        texts = drop_repeated_lines(merge_overlapping(docs))
+    if not max_tokens:
+        return separator.join(texts)
+
+    packed, used = [], 0
+    for text in texts:
+        cost = estimate_tokens(text) + (estimate_tokens(separator) if packed else 0)
+        if used + cost <= max_tokens:
+            packed.append(text)
+            used += cost
+            continue
+        remaining = max_tokens - used - (estimate_tokens(separator) if packed else 0)
+        if remaining >= _MIN_TAIL_TOKENS:
+            packed.append(_truncate(text, remaining * _CHARS_PER_TOKEN))
+        break
+
+    logger.debug(
+        "Packed %d chunk(s) into %d segment(s), ~%d tokens",
+        len(docs), len(packed), estimate_tokens(separator.join(packed)),
+    )
+    return separator.join(packed)
@@ -0,0 +1,245 @@
+"""
+Embedding Engine — Concurrent, throttling-aware batch embedding
+
+Titan Embed accepts a single text per request, so embedding a large PDF is
+dominated by request latency rather than compute. This module fans the
+requests out over a bounded thread pool, backs off when Bedrock throttles,
+and returns the vectors as one float32 matrix in the original chunk order,
+ready for ``FAISS.add_embeddings``. :func:`build_faiss_streaming` feeds
+chunks through the engine in fixed-size batches so that parsing, splitting
+and embedding overlap and memory stays bounded.
+
+Concurrency is adaptive: every ``ThrottlingException`` halves the number of
+requests allowed in flight and each run of successful calls raises it again
+by one, up to ``max_workers``.
+"""
+
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+}
+
+
+def is_throttling_error(exc: Exception) -> bool:
+    """Return ``True`` if *exc* is a Bedrock throttling response."""
+    response = getattr(exc, "response", None)
+    error = response.get("Error") if isinstance(response, dict) else None
+    code = error.get("Code") if isinstance(error, dict) else None
+    return code in THROTTLING_ERROR_CODES or "ThrottlingException" in str(exc)
+
+
+class _AdaptiveLimiter:
+    """Additive-increase / multiplicative-decrease cap on in-flight requests."""
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self._in_flight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, throttled: bool) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+class EmbeddingEngine:
+    """Embed many texts concurrently through a LangChain ``Embeddings`` client.
+
+    ``stats`` is updated after every :meth:`embed` call with the chunk count,
+    wall time, throughput, throttle events and retries of that run.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        max_workers: int = 8,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+    ):
+        self.embeddings = embeddings
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {}
+
+    def _embed_one(self, text: str, limiter: _AdaptiveLimiter, counters: dict) -> list:
+        attempt = 0
+        while True:
+            limiter.acquire()
+            try:
+                vector = self.embeddings.embed_documents([text])[0]
+            except Exception as exc:
+                limiter.release(throttled=is_throttling_error(exc))
+                if not is_throttling_error(exc) or attempt >= self.max_retries:
+                    raise
+                with counters["lock"]:
+                    counters["throttled"] += 1
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                attempt += 1
+                continue
+            limiter.release(throttled=False)
+            if attempt:
+                with counters["lock"]:
+                    counters["retries"] += attempt
+            return vector
+
+    def embed(self, texts: list) -> np.ndarray:
+        """Return a ``(len(texts), dim)`` float32 matrix in input order."""
+        start = time.perf_counter()
+        limiter = _AdaptiveLimiter(self.max_workers)
+        counters = {"throttled": 0, "retries": 0, "lock": threading.Lock()}
+
+        if texts:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                vectors = list(
+                    pool.map(lambda t: self._embed_one(t, limiter, counters), texts)
+                )
+            matrix = np.asarray(vectors, dtype=np.float32)
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+
+        elapsed = time.perf_counter() - start
+        self.stats = {
+            "chunks": len(texts),
+            "seconds": elapsed,
+            "chunks_per_second": len(texts) / elapsed if elapsed > 0 else 0.0,
+            "throttled": counters["throttled"],
+            "retries": counters["retries"],
+            "final_concurrency": limiter.limit,
+        }
+        logger.info(
+            "Embedded %d chunk(s) in %.2fs (%.1f chunks/s, %d throttled)",
+            len(texts), elapsed, self.stats["chunks_per_second"], counters["throttled"],
+        )
+        return matrix
+
+
+def build_faiss_from_documents(documents: list, embeddings, engine: EmbeddingEngine, cache=None) -> FAISS:
+    """Embed *documents* with *engine* and load the vectors into a new FAISS store.
+
+    Equivalent to ``FAISS.from_documents`` but with concurrent embedding.
+    With a *cache* (the indexing Lambda's ``EmbeddingCache``), only texts
+    it does not hold are embedded.
+    """
+    texts = [doc.page_content for doc in documents]
+    matrix = cache.embed(texts, engine.embed) if cache is not None else engine.embed(texts)
+    return FAISS.from_embeddings(
+        zip(texts, matrix),
+        embeddings,
+        metadatas=[doc.metadata for doc in documents],
+    )
+
+
+_END = object()
+
+
+def _produce_batches(documents, batch_size: int, out: queue.Queue, stop: threading.Event) -> None:
+    """Fill *out* with lists of *batch_size* documents, then ``_END``.
+
+    Returns early once *stop* is set, so a consumer that gave up never
+    leaves this thread blocked on a full queue.
+    """
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        iterator = iter(documents)
+        while batch := list(islice(iterator, batch_size)):
+            if not put(batch):
+                return
+    except BaseException as exc:  # surfaced to the consumer thread
+        put(exc)
+        return
+    put(_END)
+
+
+def build_faiss_streaming(
+    documents,
+    embeddings,
+    engine: EmbeddingEngine,
+    batch_size: int = 64,
+    prefetch: int = 2,
+) -> FAISS:
+    """Embed an iterable of *documents* batch by batch into a new FAISS store.
+
+    A background thread pulls documents from the (typically lazy) iterable
+    while the calling thread embeds the previous batch, with at most
+    *prefetch* batches buffered in between, so parsed pages and pending
+    chunks never accumulate beyond a few batches. If embedding fails the
+    producer is told to stop before the error propagates.
+    """
+    batches = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce_batches, args=(documents, batch_size, batches, stop),
+        name="faiss-batch-producer", daemon=True,
+    )
+    producer.start()
+
+    vectorstore = None
+    total, start = 0, time.perf_counter()
+    try:
+        while (batch := batches.get()) is not _END:
+            if isinstance(batch, BaseException):
+                raise batch
+            texts = [doc.page_content for doc in batch]
+            metadatas = [doc.metadata for doc in batch]
+            matrix = engine.embed(texts)
+            if vectorstore is None:
+                vectorstore = FAISS.from_embeddings(zip(texts, matrix), embeddings, metadatas=metadatas)
+            else:
+                vectorstore.add_embeddings(zip(texts, matrix), metadatas=metadatas)
+            total += len(batch)
+    finally:
+        stop.set()
+    producer.join()
+
+    if vectorstore is None:
+        raise ValueError("No chunks to index")
+    elapsed = time.perf_counter() - start
+    engine.stats = {
+        "chunks": total,
+        "seconds": elapsed,
+        "chunks_per_second": total / elapsed if elapsed > 0 else 0.0,
+    }
+    logger.info("Streamed %d chunk(s) into FAISS in %.2fs", total, elapsed)
+    return vectorstore
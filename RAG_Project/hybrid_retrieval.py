@@ -0,0 +1,159 @@
+"""
+Hybrid Retrieval — BM25 lexical index fused with FAISS vector search
+
+Dense Titan embeddings are weak on exact identifiers such as policy clause
+numbers ("4.2.1") and leave-type acronyms ("CL", "LWP"). This module keeps
+a small inverted index over the same chunks as the FAISS store and ranks
+them with BM25, then merges the lexical and vector rankings with
+reciprocal rank fusion (RRF) so either signal can surface a chunk.
+"""
+
+import heapq
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+import telemetry
+
+# Keep dotted/hyphenated identifiers ("4.2.1", "cl-3") as single tokens.
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list:
+    """Lower-case *text* and split it into BM25 terms."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over docstore ids.
+
+    Positions follow insertion order, which :meth:`from_vectorstore` aligns
+    with the FAISS index order.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.doc_lengths = []
+        self.postings = defaultdict(list)
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_id: str, text: str) -> None:
+        """Index *text* under *doc_id*."""
+        position = len(self.doc_ids)
+        tokens = tokenize(text)
+        self.doc_ids.append(doc_id)
+        self.doc_lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        for term, tf in Counter(tokens).items():
+            self.postings[term].append((position, tf))
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: FAISS) -> "BM25Index":
+        """Build an index over every chunk in *vectorstore*, in index order."""
+        index = cls()
+        for position in sorted(vectorstore.index_to_docstore_id):
+            doc_id = vectorstore.index_to_docstore_id[position]
+            index.add(doc_id, vectorstore.docstore.search(doc_id).page_content)
+        return index
+
+    def search(self, query: str, k: int) -> list:
+        """Return up to *k* ``(doc_id, score)`` pairs, best first."""
+        n = len(self.doc_ids)
+        if not n:
+            return []
+        avgdl = self._total_length / n or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for position, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / avgdl)
+                scores[position] += idf * tf * (self.k1 + 1) / (tf + norm)
+        top = heapq.nlargest(k, scores.items(), key=itemgetter(1))
+        return [(self.doc_ids[position], score) for position, score in top]
+
+    def save(self, path: str) -> None:
+        """Write the index to *path* as JSON."""
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "doc_ids": self.doc_ids,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings,
+            }, fh)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Read an index previously written by :meth:`save`."""
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.doc_ids = data["doc_ids"]
+        index.doc_lengths = data["doc_lengths"]
+        index._total_length = sum(index.doc_lengths)
+        index.postings = defaultdict(list, {
+            term: [tuple(p) for p in postings] for term, postings in data["postings"].items()
+        })
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list, rrf_k: int = 60) -> list:
+    """Fuse ranked lists of ids into one list ordered by summed ``1/(rrf_k + rank)``."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever fusing FAISS similarity and BM25 rankings with RRF.
+
+    Each leg contributes its top ``fetch_k`` candidates and the ``k``
+    best-fused chunks are returned. Lexical candidates scoring below
+    ``min_lexical_ratio`` of the best BM25 score are dropped; they only
+    matched near-ubiquitous terms and would otherwise earn fusion credit
+    for chunks the vector leg already ranked.
+    """
+
+    vectorstore: FAISS
+    lexical_index: BM25Index
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    min_lexical_ratio: float = 0.1
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        with telemetry.span("query_embedding"):
+            embedding = self.vectorstore.embedding_function.embed_query(query)
+        with telemetry.span("search"):
+            vector_docs = self.vectorstore.similarity_search_by_vector(embedding, k=self.fetch_k)
+        by_id = {doc.id: doc for doc in vector_docs}
+        with telemetry.span("lexical_search"):
+            lexical = self.lexical_index.search(query, self.fetch_k)
+        cutoff = lexical[0][1] * self.min_lexical_ratio if lexical else 0.0
+        lexical_ids = [doc_id for doc_id, score in lexical if score >= cutoff]
+
+        fused = reciprocal_rank_fusion([list(by_id), lexical_ids], self.rrf_k)[: self.k]
+        return [by_id.get(doc_id) or self.vectorstore.docstore.search(doc_id) for doc_id in fused]
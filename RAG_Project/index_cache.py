@@ -0,0 +1,223 @@
+"""
+Index Cache — Persistent, content-addressed FAISS index storage
+
+Saves built FAISS indexes (vectors + docstore) to a local directory keyed by
+a hash of the source PDF contents and every setting that influences the
+resulting vectors. A rebuild with the same inputs loads the saved index
+instead of re-splitting and re-embedding the document.
+
+Entries are evicted least-recently-used once the cache holds more than
+``max_entries`` indexes. When a source changes, the newest entry built
+with the same settings can be found with :meth:`IndexCache.find_related`
+and updated incrementally instead of being rebuilt.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from ann_index import unwrapped_index
+from hybrid_retrieval import BM25Index
+
+logger = logging.getLogger(__name__)
+
+_INDEX_NAME = "index"
+_META_FILE = "meta.json"
+_LEXICAL_FILE = "lexical.json"
+_VECTORS_FILE = "vectors.npy"
+_READ_SIZE = 1 << 20
+
+
+def file_digest(path: str) -> str:
+    """Return the SHA-256 hex digest of the file at *path*."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        # hashlib.file_digest would need Python 3.11
+        for block in iter(lambda: fh.read(_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _settings_json(chunk_size, chunk_overlap, embedding_model_id, separators, chunker) -> bytes:
+    settings = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_model_id": embedding_model_id,
+        "separators": separators,
+        "chunker": chunker,
+    }
+    return json.dumps(settings, sort_keys=True).encode("utf-8")
+
+
+def compute_cache_key(
+    source_digests: list,
+    chunk_size: int,
+    chunk_overlap: int,
+    embedding_model_id: str,
+    separators: list,
+    chunker: str = "recursive",
+    index_settings: dict | None = None,
+) -> str:
+    """Return a hex digest identifying an index built from these inputs.
+
+    *source_digests* holds one content digest per source document, in the
+    order the documents are indexed. *index_settings* holds the options
+    that shape the FAISS index itself (type, build parameters), which do
+    not change the vectors but do change what is saved.
+    """
+    digest = hashlib.sha256()
+    for source_digest in source_digests:
+        digest.update(source_digest.encode("ascii"))
+    digest.update(_settings_json(chunk_size, chunk_overlap, embedding_model_id, separators, chunker))
+    if index_settings:
+        digest.update(json.dumps(index_settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def compute_settings_key(
+    chunk_size: int,
+    chunk_overlap: int,
+    embedding_model_id: str,
+    separators: list,
+    chunker: str = "recursive",
+) -> str:
+    """Return a hex digest of the settings alone, ignoring source contents.
+
+    Indexes sharing this key hold comparable chunks and vectors, so one can
+    be updated into another page by page.
+    """
+    return hashlib.sha256(
+        _settings_json(chunk_size, chunk_overlap, embedding_model_id, separators, chunker)
+    ).hexdigest()
+
+
+class IndexCache:
+    """Directory of saved FAISS indexes with LRU eviction.
+
+    Each entry lives in ``<root>/<key>/`` and holds the files written by
+    ``FAISS.save_local``, the BM25 ``lexical.json`` when the store carries a
+    ``lexical_index``, full-precision ``vectors.npy`` when it carries
+    ``exact_vectors`` (loaded back memory-mapped), and a small
+    ``meta.json``. The directory mtime is refreshed on every hit and used as
+    the recency signal for eviction.
+    """
+
+    def __init__(self, root: str, max_entries: int = 5):
+        self.root = root
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "last_load_seconds": None}
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def load(self, key: str, embeddings) -> FAISS | None:
+        """Return the cached index for *key*, or ``None`` on a miss."""
+        entry = self._entry_dir(key)
+        if not os.path.isfile(os.path.join(entry, f"{_INDEX_NAME}.faiss")):
+            self.stats["misses"] += 1
+            logger.info("Index cache miss (key=%s)", key[:12])
+            return None
+
+        start = time.perf_counter()
+        try:
+            # Entries are only ever written by IndexCache.save, so the
+            # pickled docstore comes from a trusted location.
+            vectorstore = FAISS.load_local(
+                entry,
+                embeddings,
+                index_name=_INDEX_NAME,
+                allow_dangerous_deserialization=True,
+            )
+            lexical_path = os.path.join(entry, _LEXICAL_FILE)
+            if os.path.isfile(lexical_path):
+                vectorstore.lexical_index = BM25Index.load(lexical_path)
+            vectors_path = os.path.join(entry, _VECTORS_FILE)
+            if os.path.isfile(vectors_path):
+                vectorstore.exact_vectors = np.load(vectors_path, mmap_mode="r")
+        except Exception as exc:
+            logger.warning("Discarding unreadable cache entry %s: %s", key[:12], exc)
+            shutil.rmtree(entry, ignore_errors=True)
+            self.stats["misses"] += 1
+            return None
+        elapsed = time.perf_counter() - start
+
+        os.utime(entry)
+        self.stats["hits"] += 1
+        self.stats["last_load_seconds"] = elapsed
+        logger.info(
+            "Index cache hit (key=%s, %d vectors, loaded in %.3fs)",
+            key[:12], vectorstore.index.ntotal, elapsed,
+        )
+        return vectorstore
+
+    def save(self, key: str, vectorstore: FAISS, metadata: dict | None = None) -> None:
+        """Persist *vectorstore* under *key* and evict old entries."""
+        os.makedirs(self.root, exist_ok=True)
+        entry = self._entry_dir(key)
+        staging = f"{entry}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+
+        with unwrapped_index(vectorstore):
+            vectorstore.save_local(staging, index_name=_INDEX_NAME)
+        exact_vectors = getattr(vectorstore, "exact_vectors", None)
+        if exact_vectors is not None:
+            np.save(os.path.join(staging, _VECTORS_FILE), exact_vectors)
+        lexical_index = getattr(vectorstore, "lexical_index", None)
+        if lexical_index is not None:
+            lexical_index.save(os.path.join(staging, _LEXICAL_FILE))
+        meta = {
+            "created": time.time(),
+            "vectors": vectorstore.index.ntotal,
+            **(metadata or {}),
+        }
+        with open(os.path.join(staging, _META_FILE), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+
+        # Publish atomically so a concurrent reader never sees a partial entry.
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(staging, entry)
+        logger.info("Saved index to cache (key=%s)", key[:12])
+        self.evict()
+
+    def entries(self) -> list:
+        """Return cached keys ordered from most to least recently used."""
+        if not os.path.isdir(self.root):
+            return []
+        keys = [
+            name for name in os.listdir(self.root)
+            if ".tmp-" not in name and os.path.isdir(self._entry_dir(name))
+        ]
+        return sorted(
+            keys,
+            key=lambda k: os.path.getmtime(self._entry_dir(k)),
+            reverse=True,
+        )
+
+    def find_related(self, settings_key: str, sources: list) -> str | None:
+        """Return the most recently used key built with *settings_key* from
+        any of *sources* (as recorded in ``meta.json``), or ``None``."""
+        for key in self.entries():
+            try:
+                with open(os.path.join(self._entry_dir(key), _META_FILE), encoding="utf-8") as fh:
+                    meta = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            if meta.get("settings") == settings_key and set(meta.get("sources", [])) & set(sources):
+                return key
+        return None
+
+    def evict(self) -> list:
+        """Remove least-recently-used entries beyond ``max_entries``."""
+        if self.max_entries <= 0:
+            return []
+        evicted = self.entries()[self.max_entries:]
+        for key in evicted:
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            logger.info("Evicted index cache entry (key=%s)", key[:12])
+        return evicted
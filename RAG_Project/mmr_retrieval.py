@@ -0,0 +1,138 @@
+"""
+MMR Retrieval — Vectorized maximal marginal relevance over FAISS
+
+LangChain's FAISS MMR search reconstructs each of the ``fetch_k``
+candidate vectors from the index one call at a time, then runs a
+selection loop that visits every candidate in Python for each pick. This
+module keeps a contiguous, row-normalized float32 copy of the store's
+vectors (built once per index) and runs the same greedy selection with
+matrix operations. It returns the same documents in the same order.
+"""
+
+import threading
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Return a contiguous float32 copy of *vectors* scaled to unit length.
+
+    All-zero rows stay zero, so their cosine similarity to anything is 0,
+    as in LangChain's ``cosine_similarity``.
+    """
+    matrix = np.array(vectors, dtype=np.float32, order="C")
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def maximal_marginal_relevance(
+    query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5
+) -> list:
+    """Return the positions of up to *k* *candidates* chosen by MMR.
+
+    *query* and the rows of *candidates* must be unit-normalized. Each pick
+    maximises ``lambda_mult * sim(query) - (1 - lambda_mult) * max
+    sim(selected)``. Ties go to the earlier candidate, which matches
+    ``langchain_community.vectorstores.utils.maximal_marginal_relevance``.
+    """
+    k = min(k, len(candidates))
+    if k <= 0:
+        return []
+    query_similarity = candidates @ query
+    best = int(np.argmax(query_similarity))
+    selected = [best]
+    redundancy = candidates @ candidates[best]
+    available = np.ones(len(candidates), dtype=bool)
+    available[best] = False
+    while len(selected) < k:
+        scores = lambda_mult * query_similarity - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, candidates @ candidates[best], out=redundancy)
+    return selected
+
+
+_matrix_lock = threading.Lock()
+
+
+def get_normalized_vectors(vectorstore: FAISS) -> np.ndarray:
+    """Return the row-normalized vectors of *vectorstore*, aligned with
+    index positions.
+
+    Built with one bulk ``reconstruct_n`` (or from an exact re-rank index's
+    full-precision vectors, which is what its ``reconstruct`` returns) and
+    kept on the store as ``normalized_vectors`` until the index object or
+    its size changes. This costs one float32 copy of the vectors.
+    """
+    index = vectorstore.index
+    cached = getattr(vectorstore, "normalized_vectors", None)
+    if cached is not None and cached[0] is index and len(cached[1]) == index.ntotal:
+        return cached[1]
+    with _matrix_lock:
+        cached = getattr(vectorstore, "normalized_vectors", None)
+        if cached is None or cached[0] is not index or len(cached[1]) != index.ntotal:
+            exact_vectors = getattr(index, "exact_vectors", None)
+            vectors = exact_vectors if exact_vectors is not None else index.reconstruct_n(0, index.ntotal)
+            cached = (index, normalize_rows(vectors))
+            vectorstore.normalized_vectors = cached
+    return cached[1]
+
+
+def candidate_vectors(vectorstore: FAISS, positions: np.ndarray) -> np.ndarray:
+    """Return the row-normalized vectors at *positions* without building
+    the full matrix.
+
+    For memory-mapped indexes, where a float32 copy of every vector would
+    put the whole index back on the heap: only the ``fetch_k`` candidate
+    rows are read and normalized, per query.
+    """
+    index = vectorstore.index
+    exact_vectors = getattr(index, "exact_vectors", None)
+    if exact_vectors is not None:
+        return normalize_rows(exact_vectors[positions])
+    if not len(positions):
+        return np.empty((0, index.d), dtype=np.float32)
+    return normalize_rows(np.vstack([index.reconstruct(int(p)) for p in positions]))
+
+
+class MMRRetriever(BaseRetriever):
+    """Retriever running vectorized MMR over ``fetch_k`` FAISS candidates.
+
+    Drop-in replacement for ``vectorstore.as_retriever(search_type="mmr")``.
+    With ``materialize=False`` candidates are read from the index per query
+    (see :func:`candidate_vectors`) instead of from the normalized matrix.
+    """
+
+    vectorstore: FAISS
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+    materialize: bool = True
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def search_by_vector(self, embedding: list) -> list[Document]:
+        """Return the MMR selection for a query *embedding*."""
+        query = np.asarray(embedding, dtype=np.float32)
+        _, indices = self.vectorstore.index.search(query[None, :], self.fetch_k)
+        positions = indices[0][indices[0] != -1]
+        if self.materialize:
+            candidates = get_normalized_vectors(self.vectorstore)[positions]
+        else:
+            candidates = candidate_vectors(self.vectorstore, positions)
+        chosen = maximal_marginal_relevance(normalize_rows(query), candidates, self.k, self.lambda_mult)
+        docstore_ids = self.vectorstore.index_to_docstore_id
+        return [self.vectorstore.docstore.search(docstore_ids[positions[i]]) for i in chosen]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        return self.search_by_vector(self.vectorstore.embedding_function.embed_query(query))
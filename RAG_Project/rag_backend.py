@@ -8,18 +8,47 @@ powered by AWS Bedrock (Titan Embed V2 + Claude 3 Sonnet).
 Uses the modern LangChain Expression Language (LCEL) pipeline.
 """
 
+import asyncio
+import glob
+import hashlib
+import json
 import logging
 import os
+import shutil
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from dotenv import load_dotenv
 from langchain_aws import BedrockEmbeddings, ChatBedrock
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import BaseCallbackHandler, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnableParallel, RunnablePassthrough
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+import telemetry
+from ann_index import (
+    choose_index_type,
+    configure_search,
+    convert_index,
+    enable_exact_rerank,
+    index_type_of,
+    quantization_of,
+)
+from chunker import TokenChunker
+from context_packer import estimate_tokens, pack_context
+from embedding_engine import EmbeddingEngine, build_faiss_streaming
+from hybrid_retrieval import BM25Index, HybridRetriever
+from index_cache import IndexCache, compute_cache_key, compute_settings_key, file_digest
+from mmr_retrieval import MMRRetriever
+from semantic_cache import QueryEmbeddingMemo, SemanticCache, index_fingerprint
+
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
@@ -47,14 +76,69 @@ PDF_SOURCE_URL = os.getenv(
     "https://www.upl-ltd.com/images/people/downloads/Leave-Policy-India.pdf",
 )
 
-# Chunking
-CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
-CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+# Ingestion
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+# Chunking: CHUNKER "recursive" sizes chunks in characters (CHUNK_SIZE /
+# CHUNK_OVERLAP), "token" in tokens (CHUNK_SIZE_TOKENS / CHUNK_OVERLAP_TOKENS).
+# "token" is opt-in: switching produces different chunks, so cached indexes
+# are rebuilt. Separate variables keep a character-sized .env from meaning tokens.
+CHUNKER = os.getenv("CHUNKER", "recursive")
+if CHUNKER == "token":
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE_TOKENS", "256"))
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+else:
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+SPLITTER_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+# Embedding
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "8"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Vector index type (auto, flat, ivf, hnsw)
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "auto")
+ANN_AUTO_THRESHOLD = int(os.getenv("ANN_AUTO_THRESHOLD", "100000"))
+ANN_IVF_NLIST = int(os.getenv("ANN_IVF_NLIST", "0"))
+ANN_IVF_NPROBE = int(os.getenv("ANN_IVF_NPROBE", "16"))
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+ANN_HNSW_EF_SEARCH = int(os.getenv("ANN_HNSW_EF_SEARCH", "64"))
+ANN_QUANTIZATION = os.getenv("ANN_QUANTIZATION", "none")
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "0"))
+ANN_EXACT_RERANK = os.getenv("ANN_EXACT_RERANK", "false").lower() == "true"
+ANN_RERANK_FACTOR = int(os.getenv("ANN_RERANK_FACTOR", "4"))
+
+# Index cache
+INDEX_CACHE_ENABLED = os.getenv("INDEX_CACHE_ENABLED", "true").lower() == "true"
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", ".index_cache")
+INDEX_CACHE_MAX_ENTRIES = int(os.getenv("INDEX_CACHE_MAX_ENTRIES", "5"))
+INDEX_INCREMENTAL = os.getenv("INDEX_INCREMENTAL", "true").lower() == "true"
 
 # Retrieval
 SEARCH_TYPE = os.getenv("SEARCH_TYPE", "mmr")
 SEARCH_K = int(os.getenv("SEARCH_K", "4"))
 SEARCH_FETCH_K = int(os.getenv("SEARCH_FETCH_K", "8"))
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+
+# Batch question answering
+ASK_MAX_CONCURRENCY = int(os.getenv("ASK_MAX_CONCURRENCY", "8"))
+
+# Context assembly
+CONTEXT_DEDUP = os.getenv("CONTEXT_DEDUP", "true").lower() == "true"
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+
+# Semantic answer cache
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+# Telemetry
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+TELEMETRY_JSON_LOG = os.getenv("TELEMETRY_JSON_LOG", "false").lower() == "true"
+telemetry.configure(enabled=TELEMETRY_ENABLED, json_log=TELEMETRY_JSON_LOG)
 
 # RAG prompt
 RAG_PROMPT_TEMPLATE = """\
@@ -73,23 +157,71 @@ Answer:"""
 # ---------------------------------------------------------------------------
 # Core Functions
 # ---------------------------------------------------------------------------
+def _page_digest(text: str) -> str:
+    """Return the SHA-256 hex digest of a page's extracted text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Pages split per call; the token chunker amortizes its setup over a batch.
+_SPLIT_BATCH_PAGES = 16
+
+
+def get_text_splitter(
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    chunker: str = CHUNKER,
+):
+    """Return the text splitter selected by *chunker*.
+
+    ``"token"`` is the single-pass :class:`chunker.TokenChunker` (sizes in
+    tokens); ``"recursive"`` is LangChain's ``RecursiveCharacterTextSplitter``
+    (sizes in characters).
+    """
+    if chunker == "token":
+        return TokenChunker(chunk_size, chunk_overlap)
+    if chunker == "recursive":
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=SPLITTER_SEPARATORS,
+        )
+    raise ValueError(f"Unknown CHUNKER {chunker!r}; expected 'token' or 'recursive'")
+
+
+def iter_document_chunks(
+    pdf_url: str = PDF_SOURCE_URL,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+):
+    """Yield overlapping chunks of the PDF at *pdf_url* a few pages at a time.
+
+    Pages are parsed lazily and split in batches of ``_SPLIT_BATCH_PAGES``,
+    so only one batch is held in memory. Produces the same chunks as
+    :func:`load_and_split_documents`. Each chunk carries a ``page_digest``
+    of its page's text, used for incremental re-indexing.
+    """
+    logger.info("Loading PDF from %s", pdf_url)
+    splitter = get_text_splitter(chunk_size, chunk_overlap)
+    pages, batch = 0, []
+    for page in PyPDFLoader(pdf_url).lazy_load():
+        pages += 1
+        page.metadata["page_digest"] = _page_digest(page.page_content)
+        batch.append(page)
+        if len(batch) == _SPLIT_BATCH_PAGES:
+            yield from splitter.split_documents(batch)
+            batch = []
+    yield from splitter.split_documents(batch)
+    logger.info("Loaded %d page(s)", pages)
+
+
+@telemetry.timed("load_and_split_documents")
 def load_and_split_documents(
     pdf_url: str = PDF_SOURCE_URL,
     chunk_size: int = CHUNK_SIZE,
     chunk_overlap: int = CHUNK_OVERLAP,
 ) -> list:
     """Load a PDF from *pdf_url* and split it into overlapping chunks."""
-    logger.info("Loading PDF from %s", pdf_url)
-    loader = PyPDFLoader(pdf_url)
-    pages = loader.load()
-    logger.info("Loaded %d page(s)", len(pages))
-
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", " ", ""],
-    )
-    chunks = splitter.split_documents(pages)
+    chunks = list(iter_document_chunks(pdf_url, chunk_size, chunk_overlap))
     logger.info(
         "Split into %d chunk(s) (size=%d, overlap=%d)",
         len(chunks), chunk_size, chunk_overlap,
@@ -97,6 +229,96 @@ def load_and_split_documents(
     return chunks
 
 
+def resolve_sources(spec) -> list:
+    """Expand a source specification into an ordered list of PDF sources.
+
+    *spec* may be a list of sources, an ``http(s)`` URL, a local PDF path,
+    a directory (every ``*.pdf`` inside, recursively), a glob pattern, or a
+    manifest file (``.txt`` with one source per line, or ``.json`` holding
+    a list). Entries of a list or manifest are expanded the same way.
+    """
+    if isinstance(spec, (list, tuple)):
+        return [source for item in spec for source in resolve_sources(item)]
+    if spec.startswith(("http://", "https://")):
+        return [spec]
+    if os.path.isdir(spec):
+        return sorted(glob.glob(os.path.join(spec, "**", "*.pdf"), recursive=True))
+    if glob.has_magic(spec):
+        return sorted(glob.glob(spec, recursive=True))
+    if spec.endswith(".json"):
+        with open(spec, encoding="utf-8") as fh:
+            return resolve_sources(json.load(fh))
+    if spec.endswith(".txt"):
+        with open(spec, encoding="utf-8") as fh:
+            lines = [line.strip() for line in fh]
+        return resolve_sources([line for line in lines if line and not line.startswith("#")])
+    return [spec]
+
+
+def _materialize_source(source: str, tmpdir: str, position: int) -> str:
+    """Return a local path for *source*, downloading URLs into *tmpdir*."""
+    if not source.startswith(("http://", "https://")):
+        return source
+    local_path = os.path.join(tmpdir, f"source-{position}.pdf")
+    with urllib.request.urlopen(source) as response, open(local_path, "wb") as fh:
+        shutil.copyfileobj(response, fh)
+    return local_path
+
+
+def _split_document(args: tuple) -> list:
+    """Process-pool worker: parse and split one PDF, tagging its source."""
+    local_path, source, chunk_size, chunk_overlap = args
+    return list(_with_source(iter_document_chunks(local_path, chunk_size, chunk_overlap), source))
+
+
+def iter_corpus_chunks(
+    local_paths: list,
+    sources: list | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    max_workers: int = INGEST_MAX_WORKERS,
+):
+    """Yield chunks of many PDFs, parsed in parallel worker processes.
+
+    Documents are yielded whole and in input order, each chunk carrying its
+    ``source`` (from *sources*, defaulting to the path) and ``page``. At
+    most ``2 * max_workers`` documents are in flight at once. A single
+    document is streamed page by page in-process instead.
+    """
+    sources = sources or local_paths
+    if len(local_paths) == 1 or max_workers <= 1:
+        for local_path, source in zip(local_paths, sources):
+            yield from _with_source(
+                iter_document_chunks(local_path, chunk_size, chunk_overlap), source,
+            )
+        return
+
+    tasks = iter(
+        (path, source, chunk_size, chunk_overlap)
+        for path, source in zip(local_paths, sources)
+    )
+    logger.info("Parsing %d document(s) with %d worker process(es)", len(local_paths), max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_split_document, task))
+            if len(pending) >= 2 * max_workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+_index_cache: IndexCache | None = None
+
+
+def get_index_cache() -> IndexCache:
+    """Return the process-wide index cache."""
+    global _index_cache
+    if _index_cache is None:
+        _index_cache = IndexCache(INDEX_CACHE_DIR, INDEX_CACHE_MAX_ENTRIES)
+    return _index_cache
+
+
 def get_embeddings() -> BedrockEmbeddings:
     """Return a Bedrock embeddings client."""
     return BedrockEmbeddings(
@@ -106,22 +328,220 @@ def get_embeddings() -> BedrockEmbeddings:
     )
 
 
+def _index_settings() -> dict:
+    """Return the ``ANN_*`` settings that shape a built index, for cache keys."""
+    return {
+        "index_type": ANN_INDEX_TYPE,
+        "auto_threshold": ANN_AUTO_THRESHOLD,
+        "ivf_nlist": ANN_IVF_NLIST,
+        "hnsw_m": ANN_HNSW_M,
+        "quantization": ANN_QUANTIZATION,
+        "pq_m": ANN_PQ_M,
+        "exact_rerank": ANN_EXACT_RERANK,
+    }
+
+
+def _matches_index_settings(vectorstore: FAISS) -> bool:
+    """Return ``True`` if a loaded *vectorstore* has the configured index layout."""
+    index = vectorstore.index
+    if index_type_of(index) != choose_index_type(index.ntotal, ANN_INDEX_TYPE, ANN_AUTO_THRESHOLD):
+        return False
+    if quantization_of(index) != ANN_QUANTIZATION:
+        return False
+    needs_exact = ANN_QUANTIZATION != "none" and ANN_EXACT_RERANK
+    return not needs_exact or getattr(vectorstore, "exact_vectors", None) is not None
+
+
+def _has_exact_vectors(vectorstore: FAISS) -> bool:
+    """Return ``True`` if *vectorstore*'s vectors can be recovered without loss."""
+    return (
+        quantization_of(vectorstore.index) == "none"
+        or getattr(vectorstore, "exact_vectors", None) is not None
+    )
+
+
+@telemetry.timed("build_vector_index")
 def build_vector_index(
     chunks: list | None = None,
     embeddings: BedrockEmbeddings | None = None,
+    pdf_url: str | list = PDF_SOURCE_URL,
+    use_cache: bool = INDEX_CACHE_ENABLED,
 ) -> FAISS:
     """Create a FAISS vector store from document *chunks*.
 
-    If *chunks* is ``None`` the default PDF is loaded and split automatically.
+    If *chunks* is ``None`` the documents named by *pdf_url* are loaded and
+    split automatically. *pdf_url* may be a single PDF or anything accepted
+    by :func:`resolve_sources` (list, directory, glob or manifest); all
+    documents are merged into one index. In that case the index is looked
+    up in the local index cache first (keyed by the document contents and
+    chunking/embedding settings) and saved there after a fresh build. If
+    only some pages changed since a cached build of the same sources, that
+    index is updated page by page instead (``INDEX_INCREMENTAL``).
     """
-    if chunks is None:
-        chunks = load_and_split_documents()
     if embeddings is None:
         embeddings = get_embeddings()
 
-    logger.info("Building FAISS index with %d chunks …", len(chunks))
-    vectorstore = FAISS.from_documents(chunks, embeddings)
-    logger.info("FAISS index ready (%d vectors)", vectorstore.index.ntotal)
+    if chunks is not None:
+        return _embed_and_index(chunks, embeddings)
+
+    sources = resolve_sources(pdf_url)
+    if not sources:
+        raise ValueError(f"No PDF sources found for {pdf_url!r}")
+
+    cache, cache_key, settings_key, vectorstore = get_index_cache(), None, None, None
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Download each remote PDF once; hashing and parsing read the local copy.
+        local_paths = [
+            _materialize_source(source, tmpdir, i) for i, source in enumerate(sources)
+        ]
+        if use_cache:
+            cache_key = compute_cache_key(
+                [file_digest(path) for path in local_paths],
+                CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL_ID, SPLITTER_SEPARATORS, CHUNKER,
+                _index_settings(),
+            )
+            with telemetry.span("index_cache_load"):
+                vectorstore = cache.load(cache_key, embeddings)
+            if vectorstore is not None and _matches_index_settings(vectorstore):
+                configure_search(vectorstore.index, ANN_IVF_NPROBE, ANN_HNSW_EF_SEARCH)
+                if ANN_EXACT_RERANK and getattr(vectorstore, "exact_vectors", None) is not None:
+                    enable_exact_rerank(vectorstore, vectorstore.exact_vectors, ANN_RERANK_FACTOR)
+                return vectorstore
+            if vectorstore is not None:
+                logger.info("Cached index does not match the ANN settings; rebuilding it")
+                vectorstore = None
+
+            settings_key = compute_settings_key(
+                CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL_ID, SPLITTER_SEPARATORS, CHUNKER,
+            )
+            related_key = cache.find_related(settings_key, sources) if INDEX_INCREMENTAL else None
+            if related_key is not None:
+                related = cache.load(related_key, embeddings)
+                # Quantized vectors without exact copies would seed the update lossily
+                if related is not None and _has_exact_vectors(related):
+                    vectorstore = _update_index(related, local_paths, sources, embeddings)
+
+        if vectorstore is None:
+            vectorstore = _embed_and_index(iter_corpus_chunks(local_paths, sources), embeddings)
+
+    if cache_key is not None:
+        try:
+            cache.save(cache_key, vectorstore, {"sources": sources, "settings": settings_key})
+        except OSError as exc:
+            logger.warning("Could not write index cache: %s", exc)
+    return vectorstore
+
+
+def _with_source(chunks, source: str):
+    """Yield *chunks* with their ``source`` metadata set to *source*."""
+    for chunk in chunks:
+        chunk.metadata["source"] = source
+        yield chunk
+
+
+@telemetry.timed("embed_and_index")
+def _embed_and_index(chunks, embeddings: BedrockEmbeddings) -> FAISS:
+    """Embed an iterable of *chunks* in batches and return a new FAISS store.
+
+    Batches of ``EMBED_BATCH_SIZE`` chunks are embedded concurrently while
+    the next batch is being parsed and split. The finished index is then
+    rebuilt as the ``ANN_INDEX_TYPE`` chosen for its size, compressed per
+    ``ANN_QUANTIZATION``, and a BM25 index over the same chunks is attached
+    as ``vectorstore.lexical_index``. With ``ANN_EXACT_RERANK`` the
+    full-precision vectors are kept as ``vectorstore.exact_vectors`` and
+    used to re-rank quantized search results.
+    """
+    logger.info("Building FAISS index …")
+    engine = EmbeddingEngine(
+        embeddings, max_workers=EMBED_MAX_WORKERS, max_retries=EMBED_MAX_RETRIES,
+    )
+    vectorstore = build_faiss_streaming(
+        chunks, embeddings, engine, batch_size=EMBED_BATCH_SIZE,
+    )
+    return _finalize_index(vectorstore)
+
+
+@telemetry.timed("update_index")
+def _update_index(vectorstore: FAISS, local_paths: list, sources: list, embeddings) -> FAISS:
+    """Update a cached *vectorstore* built from earlier versions of *sources*.
+
+    Pages are matched by ``page_digest`` within each source. Chunks of
+    unchanged pages keep their vectors (and get the page's new number if it
+    moved), new or edited pages are split and embedded, and the vectors of
+    pages that no longer exist are deleted by id. The result is finalized
+    like a fresh build.
+    """
+    start = time.perf_counter()
+    pages = defaultdict(list)  # (source, page) -> chunk ids
+    digests = {}
+    for doc_id in vectorstore.index_to_docstore_id.values():
+        metadata = vectorstore.docstore.search(doc_id).metadata
+        page_key = (metadata.get("source"), metadata.get("page"))
+        pages[page_key].append(doc_id)
+        digests[page_key] = metadata.get("page_digest")
+    stored = defaultdict(lambda: defaultdict(list))  # source -> digest -> [chunk ids per page]
+    for page_key, ids in pages.items():
+        if digests[page_key] is not None:
+            stored[page_key[0]][digests[page_key]].append(ids)
+
+    splitter = get_text_splitter()
+    kept, changed_pages, reused_pages = set(), [], 0
+    for path, source in zip(local_paths, sources):
+        for page in PyPDFLoader(path).lazy_load():
+            page.metadata["source"] = source
+            page.metadata["page_digest"] = _page_digest(page.page_content)
+            matches = stored[source].get(page.metadata["page_digest"])
+            if matches:
+                reused_pages += 1
+                for doc_id in matches.pop(0):
+                    vectorstore.docstore.search(doc_id).metadata.update(page.metadata)
+                    kept.add(doc_id)
+                continue
+            changed_pages.append(page)
+    fresh = splitter.split_documents(changed_pages)
+    stale = [i for i in vectorstore.index_to_docstore_id.values() if i not in kept]
+
+    # Deleting by id needs an exact flat index; the final type is rebuilt below.
+    convert_index(vectorstore, "flat", vectors=getattr(vectorstore, "exact_vectors", None))
+    vectorstore.exact_vectors = None
+    if stale:
+        vectorstore.delete(stale)
+    if fresh:
+        engine = EmbeddingEngine(
+            embeddings, max_workers=EMBED_MAX_WORKERS, max_retries=EMBED_MAX_RETRIES,
+        )
+        texts = [chunk.page_content for chunk in fresh]
+        vectorstore.add_embeddings(
+            zip(texts, engine.embed(texts)), metadatas=[chunk.metadata for chunk in fresh],
+        )
+    logger.info(
+        "Updated index incrementally: %d page(s) reused, %d chunk(s) embedded, "
+        "%d stale vector(s) removed in %.2fs",
+        reused_pages, len(fresh), len(stale), time.perf_counter() - start,
+    )
+    return _finalize_index(vectorstore)
+
+
+@telemetry.timed("finalize_index")
+def _finalize_index(vectorstore: FAISS) -> FAISS:
+    """Convert a freshly filled flat *vectorstore* to its configured type."""
+    index_type = choose_index_type(vectorstore.index.ntotal, ANN_INDEX_TYPE, ANN_AUTO_THRESHOLD)
+    exact_vectors = None
+    if ANN_QUANTIZATION != "none" and ANN_EXACT_RERANK:
+        exact_vectors = vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+    convert_index(
+        vectorstore, index_type, ANN_QUANTIZATION, vectors=exact_vectors,
+        nlist=ANN_IVF_NLIST or None, hnsw_m=ANN_HNSW_M, pq_m=ANN_PQ_M or None,
+    )
+    configure_search(vectorstore.index, ANN_IVF_NPROBE, ANN_HNSW_EF_SEARCH)
+    if exact_vectors is not None:
+        vectorstore.exact_vectors = exact_vectors
+        enable_exact_rerank(vectorstore, exact_vectors, ANN_RERANK_FACTOR)
+    vectorstore.lexical_index = BM25Index.from_vectorstore(vectorstore)
+    logger.info(
+        "FAISS index ready (%d vectors, %s/%s)",
+        vectorstore.index.ntotal, index_type, ANN_QUANTIZATION,
+    )
     return vectorstore
 
 
@@ -140,48 +560,378 @@ def get_llm() -> ChatBedrock:
 
 
 def _format_docs(docs: list) -> str:
-    """Join retrieved documents into a single context string."""
-    return "\n\n---\n\n".join(doc.page_content for doc in docs)
+    """Pack retrieved documents into a single context string.
+
+    Overlapping chunks are merged and repeated lines dropped
+    (``CONTEXT_DEDUP``), then the context is capped at
+    ``CONTEXT_MAX_TOKENS`` estimated tokens (``0`` = no cap), keeping the
+    most relevant documents.
+    """
+    return pack_context(docs, max_tokens=CONTEXT_MAX_TOKENS, dedup=CONTEXT_DEDUP)
 
 
-def get_rag_chain(vectorstore: FAISS):
-    """Build an LCEL RAG chain backed by the given *vectorstore*.
+def _build_prompt_inputs(inputs: dict) -> dict:
+    """Turn the retrieval branch output into prompt variables."""
+    with telemetry.span("prompt_assembly") as span:
+        context = _format_docs(inputs["context"])
+        span.set(context_tokens=estimate_tokens(context))
+    return {"context": context, "question": inputs["question"]}
+
+
+def get_lexical_index(vectorstore: FAISS) -> BM25Index:
+    """Return the BM25 index attached to *vectorstore*, building it if missing."""
+    lexical_index = getattr(vectorstore, "lexical_index", None)
+    if lexical_index is None or len(lexical_index) != vectorstore.index.ntotal:
+        lexical_index = BM25Index.from_vectorstore(vectorstore)
+        vectorstore.lexical_index = lexical_index
+    return lexical_index
+
 
-    Returns a tuple of (chain, retriever) so the caller can also
-    access the raw retrieved documents for source attribution.
+class _TimedMMRRetriever(MMRRetriever):
+    """:class:`MMRRetriever` reporting ``query_embedding`` and ``search`` spans.
+
+    ``mmr_retrieval`` is shared with the retrieval Lambda, which has no
+    telemetry registry, so the spans are added here.
     """
-    retriever = vectorstore.as_retriever(
-        search_type=SEARCH_TYPE,
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        with telemetry.span("query_embedding"):
+            embedding = self.vectorstore.embedding_function.embed_query(query)
+        with telemetry.span("search"):
+            return self.search_by_vector(embedding)
+
+
+def get_retriever(vectorstore: FAISS, search_type: str = SEARCH_TYPE):
+    """Return a retriever over *vectorstore* for the given *search_type*.
+
+    ``"hybrid"`` fuses BM25 and vector rankings and ``"mmr"`` runs
+    vectorized maximal marginal relevance; any other value is passed to
+    ``vectorstore.as_retriever`` (``"similarity"``, …).
+    """
+    if search_type == "hybrid":
+        return HybridRetriever(
+            vectorstore=vectorstore,
+            lexical_index=get_lexical_index(vectorstore),
+            k=SEARCH_K,
+            fetch_k=HYBRID_FETCH_K,
+            rrf_k=HYBRID_RRF_K,
+        )
+    if search_type == "mmr":
+        return _TimedMMRRetriever(vectorstore=vectorstore, k=SEARCH_K, fetch_k=SEARCH_FETCH_K)
+    return vectorstore.as_retriever(
+        search_type=search_type,
         search_kwargs={"k": SEARCH_K, "fetch_k": SEARCH_FETCH_K},
     )
 
+
+def get_rag_chain(vectorstore: FAISS, llm=None, search_type: str = SEARCH_TYPE):
+    """Build an LCEL RAG chain backed by the given *vectorstore*.
+
+    The chain retrieves once and returns a dict with ``answer``,
+    ``context`` (the retrieved documents) and ``question``, so source
+    attribution does not need a second retrieval pass. *llm* defaults to
+    :func:`get_llm`; *search_type* selects the retriever (see
+    :func:`get_retriever`).
+
+    Returns a tuple of (chain, retriever).
+    """
+    retriever = get_retriever(vectorstore, search_type)
+
     prompt = ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE)
 
-    chain = (
-        {"context": retriever | _format_docs, "question": RunnablePassthrough()}
+    generate = (
+        RunnableLambda(_build_prompt_inputs)
         | prompt
-        | get_llm()
+        | (llm or get_llm())
         | StrOutputParser()
     )
+    chain = RunnableParallel(
+        context=retriever, question=RunnablePassthrough()
+    ).assign(answer=generate)
 
     return chain, retriever
 
 
-def ask(chain, retriever, question: str) -> dict:
-    """Send a *question* through the RAG chain and return the result.
+def get_semantic_cache(vectorstore: FAISS) -> SemanticCache:
+    """Return a semantic answer cache bound to *vectorstore*.
 
-    Returns a dict with keys ``answer`` and ``source_documents``.
+    The store's embedding function is wrapped so that the question vector
+    computed for the cache lookup is reused by retrieval on a miss.
     """
-    logger.info("Question: %s", question)
+    if not isinstance(vectorstore.embedding_function, QueryEmbeddingMemo):
+        vectorstore.embedding_function = QueryEmbeddingMemo(vectorstore.embedding_function)
+    cache = SemanticCache(
+        vectorstore.embedding_function,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds=SEMANTIC_CACHE_TTL,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    )
+    cache.bind(index_fingerprint(vectorstore))
+    return cache
+
+
+class StageTimer(BaseCallbackHandler):
+    """Callback handler recording retrieval and generation wall time.
+
+    Each stage is also recorded in the telemetry registry, generation with
+    the model's reported ``input_tokens`` and ``output_tokens``.
+    """
+
+    # Record timestamps on the event loop, not after an executor hop.
+    run_inline = True
+
+    def __init__(self):
+        self._starts = {}
+        self.timings = {}
+
+    def _start(self, run_id) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def _end(self, run_id, stage: str, **counts) -> None:
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            elapsed = time.perf_counter() - start
+            self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+            telemetry.record(stage, elapsed, **counts)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs) -> None:
+        self._end(run_id, "retrieval")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                for key in ("input_tokens", "output_tokens"):
+                    if key in metadata:
+                        usage[key] = usage.get(key, 0) + metadata[key]
+        self._end(run_id, "generation", **usage)
+
+
+def _lookup_cached_answer(semantic_cache: SemanticCache, retriever, question: str) -> dict | None:
+    """Return a cached result for *question*, resolving sources by docstore id."""
+    vectorstore = retriever.vectorstore
+    with telemetry.span("semantic_cache_lookup") as span:
+        semantic_cache.bind(index_fingerprint(vectorstore))
+        hit = semantic_cache.lookup(question)
+        span.set(hits=int(hit is not None))
+    if hit is None:
+        return None
+    docs = [vectorstore.docstore.search(doc_id) for doc_id in hit["source_ids"]]
+    return {
+        "answer": hit["answer"],
+        "source_documents": [d for d in docs if not isinstance(d, str)],
+        "cached": True,
+    }
 
-    # Retrieve source documents separately for attribution
-    source_docs = retriever.invoke(question)
 
-    # Run the chain for the answer
-    answer = chain.invoke(question)
+def ask(chain, retriever, question: str, semantic_cache: SemanticCache | None = None) -> dict:
+    """Send a *question* through the RAG chain and return the result.
+
+    Returns a dict with keys ``answer``, ``source_documents`` and
+    ``timings`` (seconds spent in ``retrieval``, ``generation`` and
+    ``total``, plus finer stages such as ``query_embedding``, ``search``
+    and ``prompt_assembly`` while telemetry is enabled). The sources come
+    from the chain's own single retrieval pass.
 
-    logger.info("Answer received (%d source docs)", len(source_docs))
+    If a *semantic_cache* is given, a sufficiently similar earlier question
+    is answered from the cache (``cached`` is then ``True`` in the result)
+    and fresh answers are stored in it.
+    """
+    logger.info("Question: %s", question)
+
+    start = time.perf_counter()
+    if semantic_cache is not None:
+        cached = _lookup_cached_answer(semantic_cache, retriever, question)
+        if cached is not None:
+            cached["timings"] = {"total": time.perf_counter() - start}
+            telemetry.record("ask", cached["timings"]["total"])
+            return cached
+
+    timer = StageTimer()
+    with telemetry.collect_stages() as stages:
+        result = chain.invoke(question, config={"callbacks": [timer]})
+    return _answer_result(question, result, {**stages, **timer.timings}, start, semantic_cache)
+
+
+def _answer_result(question: str, result: dict, stages: dict, start: float, semantic_cache) -> dict:
+    """Shape a chain *result* as returned by :func:`ask` and cache it."""
+    timings = {**stages, "total": time.perf_counter() - start}
+    telemetry.record("ask", timings["total"])
+    source_docs = result["context"]
+    logger.info(
+        "Answer received (%d source docs, retrieval=%.3fs, generation=%.3fs, total=%.3fs)",
+        len(source_docs),
+        timings.get("retrieval", 0.0),
+        timings.get("generation", 0.0),
+        timings["total"],
+    )
+    if semantic_cache is not None:
+        semantic_cache.store(
+            question, result["answer"], [d.id for d in source_docs], timings["total"],
+        )
     return {
-        "answer": answer,
+        "answer": result["answer"],
         "source_documents": source_docs,
-    }
\ No newline at end of file
+        "timings": timings,
+        "cached": False,
+    }
+
+
+async def aask(chain, retriever, question: str, semantic_cache: SemanticCache | None = None) -> dict:
+    """Async variant of :func:`ask`, built on the chain's ``ainvoke``.
+
+    Returns the same dict. A *semantic_cache* lookup, which makes a
+    blocking embedding call, runs in a worker thread.
+    """
+    logger.info("Question: %s", question)
+
+    start = time.perf_counter()
+    if semantic_cache is not None:
+        cached = await asyncio.to_thread(_lookup_cached_answer, semantic_cache, retriever, question)
+        if cached is not None:
+            cached["timings"] = {"total": time.perf_counter() - start}
+            telemetry.record("ask", cached["timings"]["total"])
+            return cached
+
+    timer = StageTimer()
+    with telemetry.collect_stages() as stages:
+        result = await chain.ainvoke(question, config={"callbacks": [timer]})
+    return _answer_result(question, result, {**stages, **timer.timings}, start, semantic_cache)
+
+
+async def aask_many(
+    chain,
+    retriever,
+    questions: list,
+    max_concurrency: int = ASK_MAX_CONCURRENCY,
+    semantic_cache: SemanticCache | None = None,
+) -> list:
+    """Answer *questions* concurrently, at most *max_concurrency* at a time.
+
+    Returns one dict per question, in input order, each with an ``error``
+    key: ``None`` on success, or the exception raised for that question,
+    in which case ``answer`` is ``None`` and ``source_documents`` empty.
+    One failing question does not stop the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def answer(question: str) -> dict:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await aask(chain, retriever, question, semantic_cache)
+            except Exception as exc:
+                logger.warning("Question failed: %s (%s)", question, exc)
+                return {
+                    "answer": None,
+                    "source_documents": [],
+                    "timings": {"total": time.perf_counter() - start},
+                    "cached": False,
+                    "error": exc,
+                }
+            return {**result, "error": None}
+
+    return await asyncio.gather(*(answer(q) for q in questions))
+
+
+def ask_many(
+    chain,
+    retriever,
+    questions: list,
+    max_concurrency: int = ASK_MAX_CONCURRENCY,
+    semantic_cache: SemanticCache | None = None,
+) -> list:
+    """Blocking wrapper around :func:`aask_many` for scripts and batch jobs.
+
+    Runs a private event loop whose default thread pool is sized to
+    *max_concurrency*. Bedrock clients are synchronous, so LangChain runs
+    their calls in that pool, and the standard ``min(32, cpus + 4)``
+    workers would cap concurrency on small machines. Must not be called
+    from a running event loop; await :func:`aask_many` there instead.
+    """
+    async def run() -> list:
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=max(1, max_concurrency)))
+        return await aask_many(chain, retriever, questions, max_concurrency, semantic_cache)
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    logger.info(
+        "Answered %d question(s) in %.2fs (%d failed, concurrency=%d)",
+        len(results), time.perf_counter() - start,
+        sum(r["error"] is not None for r in results), max_concurrency,
+    )
+    return results
+
+
+def ask_stream(chain, question: str, retriever=None, semantic_cache: SemanticCache | None = None):
+    """Stream the answer to *question* as it is generated.
+
+    Yields answer text deltas (``str``) as Claude produces them, then a
+    final dict with ``source_documents``, ``timings`` (seconds to the
+    first token as ``time_to_first_token``, ``retrieval``, ``generation``
+    and ``total``) and ``cached``.
+    A *semantic_cache* (which also needs the chain's *retriever*) answers
+    paraphrases in a single delta.
+    """
+    if semantic_cache is not None and retriever is None:
+        raise ValueError("ask_stream needs the chain's retriever to use a semantic cache")
+    return _ask_stream(chain, question, retriever, semantic_cache)
+
+
+def _ask_stream(chain, question: str, retriever, semantic_cache: SemanticCache | None):
+    logger.info("Question (streaming): %s", question)
+
+    start = time.perf_counter()
+    if semantic_cache is not None:
+        cached = _lookup_cached_answer(semantic_cache, retriever, question)
+        if cached is not None:
+            yield cached["answer"]
+            elapsed = time.perf_counter() - start
+            cached["timings"] = {"time_to_first_token": elapsed, "total": elapsed}
+            telemetry.record("ask_stream", elapsed)
+            yield cached
+            return
+
+    timer = StageTimer()
+    first_token_at = None
+    source_docs = []
+    answer_parts = []
+    for chunk in chain.stream(question, config={"callbacks": [timer]}):
+        if "context" in chunk:
+            source_docs = chunk["context"]
+        delta = chunk.get("answer")
+        if delta:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                logger.info("Time to first token: %.3fs", first_token_at - start)
+            answer_parts.append(str(delta))
+            yield str(delta)
+
+    total = time.perf_counter() - start
+    timings = {**timer.timings, "total": total}
+    if first_token_at is not None:
+        timings["time_to_first_token"] = first_token_at - start
+        telemetry.record("time_to_first_token", timings["time_to_first_token"])
+    telemetry.record("ask_stream", total)
+    logger.info(
+        "Streamed answer complete (%d source docs, total=%.3fs)",
+        len(source_docs), total,
+    )
+    if semantic_cache is not None:
+        semantic_cache.store(
+            question, "".join(answer_parts), [d.id for d in source_docs], total,
+        )
+    yield {"source_documents": source_docs, "timings": timings, "cached": False}
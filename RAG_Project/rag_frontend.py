@@ -3,11 +3,16 @@ RAG Frontend — Streamlit UI for the RAG Q&A System
 
 A polished chat interface that lets users ask questions about the loaded
 PDF document and displays answers with source attribution.
+
+The index, retriever and chain are built once per server process by a
+background warm-up and shared read-only by every session; only the chat
+history lives in ``st.session_state``.
 """
 
 import streamlit as st
 
 import rag_backend as backend
+from rag_service import BUILDING, FAILED, READY, RAGService
 
 # ---------------------------------------------------------------------------
 # Page Configuration
@@ -19,6 +24,17 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# ---------------------------------------------------------------------------
+# Shared pipeline (one per server process)
+# ---------------------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def get_service() -> RAGService:
+    """Start the background index build the first time any session loads."""
+    return RAGService().start()
+
+
+service = get_service()
+
 # ---------------------------------------------------------------------------
 # Sidebar
 # ---------------------------------------------------------------------------
@@ -27,8 +43,18 @@ with st.sidebar:
     st.caption("Current settings loaded from `.env`")
     st.markdown(f"**Embedding Model:** `{backend.EMBEDDING_MODEL_ID}`")
     st.markdown(f"**LLM:** `{backend.LLM_MODEL_ID}`")
-    st.markdown(f"**Chunk Size:** `{backend.CHUNK_SIZE}` / Overlap: `{backend.CHUNK_OVERLAP}`")
+    unit = "tokens" if backend.CHUNKER == "token" else "chars"
+    st.markdown(f"**Chunk Size:** `{backend.CHUNK_SIZE}` / Overlap: `{backend.CHUNK_OVERLAP}` {unit}")
     st.markdown(f"**Search:** `{backend.SEARCH_TYPE}` (k={backend.SEARCH_K})")
+    if service.state == READY:
+        st.success(
+            f"Index ready · {service.vectorstore.index.ntotal} chunks · "
+            f"built in {service.build_seconds:.1f}s"
+        )
+    elif service.state == BUILDING:
+        st.info("Index warming up …")
+    elif service.state == FAILED:
+        st.error("Index build failed")
     st.divider()
     st.markdown(
         "📄 **Document Source:**\n\n"
@@ -47,17 +73,16 @@ st.markdown(
 )
 st.divider()
 
-# --- Index Initialization (cached in session state) ---
-if "rag_chain" not in st.session_state:
-    with st.spinner("📀 Building vector index — this only happens once …"):
-        try:
-            vectorstore = backend.build_vector_index()
-            chain, retriever = backend.get_rag_chain(vectorstore)
-            st.session_state.rag_chain = chain
-            st.session_state.rag_retriever = retriever
-        except Exception as exc:
-            st.error(f"❌ Failed to build index: {exc}")
-            st.stop()
+# --- Shared index readiness ---
+if service.state == BUILDING:
+    with st.spinner("📀 Warming up the shared vector index — this happens once per server …"):
+        service.wait()
+if service.state == FAILED:
+    st.error(f"❌ Failed to build index: {service.error}")
+    if st.button("Retry"):
+        service.restart()
+        st.rerun()
+    st.stop()
 
 # --- Chat History ---
 if "messages" not in st.session_state:
@@ -74,30 +99,36 @@ if user_input := st.chat_input("Ask a question about the document …"):
     with st.chat_message("user"):
         st.markdown(user_input)
 
-    # Generate answer
+    # Generate answer, rendering tokens as they arrive
     with st.chat_message("assistant"):
-        with st.spinner("🔍 Searching and generating answer …"):
-            try:
-                result = backend.ask(
-                    st.session_state.rag_chain,
-                    st.session_state.rag_retriever,
+        try:
+            result = {}
+
+            def _answer_deltas():
+                for item in backend.ask_stream(
+                    service.chain,
                     user_input,
-                )
-                answer = result["answer"]
-                sources = result["source_documents"]
-
-                st.markdown(answer)
-
-                # Show source documents
-                if sources:
-                    with st.expander(f"📚 Source Documents ({len(sources)} chunks)"):
-                        for i, doc in enumerate(sources, 1):
-                            page = doc.metadata.get("page", "N/A")
-                            st.markdown(f"**Chunk {i}** — Page {page}")
-                            st.code(doc.page_content[:500], language=None)
-
-                st.session_state.messages.append(
-                    {"role": "assistant", "content": answer}
-                )
-            except Exception as exc:
-                st.error(f"❌ Error generating answer: {exc}")
\ No newline at end of file
+                    retriever=service.retriever,
+                    semantic_cache=service.semantic_cache,
+                ):
+                    if isinstance(item, str):
+                        yield item
+                    else:
+                        result.update(item)
+
+            answer = st.write_stream(_answer_deltas())
+            sources = result.get("source_documents", [])
+
+            # Show source documents
+            if sources:
+                with st.expander(f"📚 Source Documents ({len(sources)} chunks)"):
+                    for i, doc in enumerate(sources, 1):
+                        page = doc.metadata.get("page", "N/A")
+                        st.markdown(f"**Chunk {i}** — Page {page}")
+                        st.code(doc.page_content[:500], language=None)
+
+            st.session_state.messages.append(
+                {"role": "assistant", "content": answer}
+            )
+        except Exception as exc:
+            st.error(f"❌ Error generating answer: {exc}")
@@ -0,0 +1,100 @@
+"""
+RAG Service — One shared, warmed-up pipeline per process
+
+Builds the vector index, retriever and chain once, in a background
+thread, so that every frontend session reuses the same read-only objects
+instead of re-downloading and re-embedding the document. The Streamlit
+frontend keeps one started service per server process (via
+``st.cache_resource``); sessions check :attr:`RAGService.state` to show
+readiness and call :meth:`RAGService.wait` before answering.
+
+The shared objects are safe to use from concurrent sessions: FAISS and
+BM25 searches only read, the LCEL chain holds no per-call state, and the
+semantic cache and query-embedding memo lock internally.
+"""
+
+import logging
+import threading
+import time
+
+import rag_backend as backend
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+BUILDING = "building"
+READY = "ready"
+FAILED = "failed"
+
+
+class RAGService:
+    """Process-wide RAG pipeline built by a background warm-up thread.
+
+    After :meth:`start`, :attr:`state` moves from ``building`` to ``ready``
+    (or ``failed``, with the exception in :attr:`error`). Once ready,
+    :attr:`vectorstore`, :attr:`chain`, :attr:`retriever` and
+    :attr:`semantic_cache` are set and never replaced, except by
+    :meth:`restart` after a failure.
+    """
+
+    def __init__(self, embeddings=None, llm=None, pdf_url=None):
+        self._embeddings = embeddings
+        self._llm = llm
+        self._pdf_url = pdf_url or backend.PDF_SOURCE_URL
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.state = STARTING
+        self.error = None
+        self.build_seconds = None
+        self.vectorstore = None
+        self.chain = None
+        self.retriever = None
+        self.semantic_cache = None
+
+    def start(self) -> "RAGService":
+        """Start the warm-up thread unless it is already running or done."""
+        with self._lock:
+            if self._thread is None:
+                self.state = BUILDING
+                self._thread = threading.Thread(target=self._build, name="rag-warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def restart(self) -> "RAGService":
+        """Retry a failed warm-up."""
+        with self._lock:
+            if self.state == FAILED:
+                self._ready.clear()
+                self._thread = None
+                self.error = None
+        return self.start()
+
+    def _build(self) -> None:
+        start = time.perf_counter()
+        try:
+            vectorstore = backend.build_vector_index(embeddings=self._embeddings, pdf_url=self._pdf_url)
+            chain, retriever = backend.get_rag_chain(vectorstore, llm=self._llm)
+            semantic_cache = (
+                backend.get_semantic_cache(vectorstore) if backend.SEMANTIC_CACHE_ENABLED else None
+            )
+        except Exception as exc:
+            logger.exception("RAG warm-up failed")
+            self.error = exc
+            self.state = FAILED
+        else:
+            self.vectorstore = vectorstore
+            self.chain = chain
+            self.retriever = retriever
+            self.semantic_cache = semantic_cache
+            self.build_seconds = time.perf_counter() - start
+            self.state = READY
+            logger.info("RAG pipeline ready in %.2fs", self.build_seconds)
+        finally:
+            self._ready.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the warm-up finishes; return ``True`` if it succeeded."""
+        self._ready.wait(timeout)
+        return self.state == READY
+
@@ -0,0 +1,174 @@
+"""
+Semantic Cache — Reuse answers for paraphrased questions
+
+Stores ``(question embedding, answer, source document ids)`` for answered
+questions and serves a stored answer when a new question's embedding is
+within a cosine-similarity threshold of an earlier one, skipping retrieval
+and Claude generation entirely.
+
+Entries expire after a TTL, the cache is bounded with least-recently-used
+eviction, and everything is dropped when the fingerprint of the underlying
+FAISS index changes.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+def index_fingerprint(vectorstore) -> str:
+    """Return a digest identifying the contents of a FAISS *vectorstore*.
+
+    Hashes the docstore ids in index order. The result is memoised on the
+    vectorstore itself, for its current index object and vector count, so
+    repeated calls are cheap and a rebuilt index is always hashed anew.
+    """
+    index = vectorstore.index
+    memo = getattr(vectorstore, "_index_fingerprint", None)
+    if memo is not None and memo[0] is index and memo[1] == index.ntotal:
+        return memo[2]
+    digest = hashlib.sha256()
+    for position in sorted(vectorstore.index_to_docstore_id):
+        digest.update(str(vectorstore.index_to_docstore_id[position]).encode("utf-8"))
+    fingerprint = digest.hexdigest()
+    vectorstore._index_fingerprint = (index, index.ntotal, fingerprint)
+    return fingerprint
+
+
+class QueryEmbeddingMemo(Embeddings):
+    """Embeddings wrapper that remembers recent query vectors.
+
+    Installed as the vector store's embedding function so that a cache miss
+    reuses the vector the semantic cache just computed instead of paying
+    for a second Titan call during retrieval.
+    """
+
+    def __init__(self, inner: Embeddings, max_entries: int = 64):
+        self.inner = inner
+        self.max_entries = max_entries
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: list) -> list:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        with self._lock:
+            if text in self._memo:
+                self._memo.move_to_end(text)
+                return self._memo[text]
+        vector = self.inner.embed_query(text)
+        with self._lock:
+            self._memo[text] = vector
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return vector
+
+
+class SemanticCache:
+    """In-memory answer cache matched by query-embedding cosine similarity.
+
+    ``stats`` tracks hits, misses and the generation time saved by hits
+    (the original latency of the cached answer minus the lookup time).
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.92,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.fingerprint = None
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "latency_saved_seconds": 0.0}
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def bind(self, fingerprint: str) -> None:
+        """Associate the cache with an index, clearing it if the index changed."""
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                if self._entries:
+                    logger.info("Index changed; clearing %d semantic cache entries", len(self._entries))
+                self._entries.clear()
+                self.fingerprint = fingerprint
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float) -> None:
+        expired = [
+            key for key, entry in self._entries.items()
+            if now - entry["created"] > self.ttl_seconds
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, question: str) -> dict | None:
+        """Return the cached entry closest to *question*, or ``None``.
+
+        A hit is a dict with ``answer``, ``source_ids``, ``similarity`` and
+        ``latency`` (the original end-to-end time of that answer).
+        """
+        start = time.perf_counter()
+        vector = self._embed(question)
+        with self._lock:
+            self._expire(time.time())
+            best_key, best_score = None, -1.0
+            if self._entries:
+                keys = list(self._entries)
+                matrix = np.stack([self._entries[k]["vector"] for k in keys])
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                best_key, best_score = keys[best], float(scores[best])
+
+            if best_key is None or best_score < self.threshold:
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            entry = self._entries[best_key]
+            saved = max(0.0, entry["latency"] - (time.perf_counter() - start))
+            self.stats["hits"] += 1
+            self.stats["latency_saved_seconds"] += saved
+
+        logger.info("Semantic cache hit (similarity=%.3f, saved %.2fs)", best_score, saved)
+        return {
+            "answer": entry["answer"],
+            "source_ids": entry["source_ids"],
+            "similarity": best_score,
+            "latency": entry["latency"],
+        }
+
+    def store(self, question: str, answer: str, source_ids: list, latency: float) -> None:
+        """Remember the *answer* to *question* for later paraphrases."""
+        vector = self._embed(question)
+        with self._lock:
+            self._entries[self._next_id] = {
+                "vector": vector,
+                "answer": answer,
+                "source_ids": list(source_ids),
+                "latency": latency,
+                "created": time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,212 @@
+"""
+Telemetry — Lightweight spans and an in-process stage registry
+
+Wraps pipeline stages (ingestion, query embedding, search, prompt
+assembly, generation, …) in named spans. Every finished span adds its
+duration, and any counts attached to it such as token usage, to a
+process-wide :class:`Registry` that :func:`summary` reports per stage as
+call counts and latency percentiles. Optionally each span is also
+written as one JSON log line to the ``telemetry`` logger.
+
+While telemetry is disabled, :func:`span` hands out a shared no-op
+object and :func:`timed` functions call straight through, so the
+instrumentation costs one flag check per stage.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("telemetry")
+
+_enabled = True
+_json_log = False
+_stage_totals = contextvars.ContextVar("telemetry_stage_totals", default=None)
+
+
+def configure(enabled: bool | None = None, json_log: bool | None = None) -> None:
+    """Turn span recording and JSON log lines on or off process-wide."""
+    global _enabled, _json_log
+    if enabled is not None:
+        _enabled = enabled
+    if json_log is not None:
+        _json_log = json_log
+
+
+def is_enabled() -> bool:
+    """Return whether spans are currently recorded."""
+    return _enabled
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[rank]
+
+
+class Registry:
+    """Thread-safe per-stage aggregates of span durations and counts.
+
+    Keeps the exact call count, total and maximum duration and summed
+    counts of every stage, plus its most recent *window* durations, from
+    which the percentiles in :meth:`summary` are computed.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._window = window
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, name: str, seconds: float, counts: dict | None = None) -> None:
+        """Add one run of stage *name* taking *seconds*, with numeric *counts*."""
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = {
+                    "count": 0, "total": 0.0, "max": 0.0,
+                    "recent": deque(maxlen=self._window), "counts": {},
+                }
+            stage["count"] += 1
+            stage["total"] += seconds
+            stage["max"] = max(stage["max"], seconds)
+            stage["recent"].append(seconds)
+            for key, value in (counts or {}).items():
+                stage["counts"][key] = stage["counts"].get(key, 0) + value
+
+    def summary(self) -> dict:
+        """Return ``{stage: {count, total_s, mean_ms, p50_ms, p95_ms, p99_ms, max_ms, …}}``.
+
+        Summed counts (e.g. ``input_tokens``) are included under their own
+        names.
+        """
+        with self._lock:
+            stages = {
+                name: (s["count"], s["total"], s["max"], sorted(s["recent"]), dict(s["counts"]))
+                for name, s in self._stages.items()
+            }
+        result = {}
+        for name, (count, total, longest, recent, counts) in sorted(stages.items()):
+            result[name] = {
+                "count": count,
+                "total_s": total,
+                "mean_ms": total / count * 1000,
+                "p50_ms": _percentile(recent, 50) * 1000,
+                "p95_ms": _percentile(recent, 95) * 1000,
+                "p99_ms": _percentile(recent, 99) * 1000,
+                "max_ms": longest * 1000,
+                **counts,
+            }
+        return result
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._stages.clear()
+
+
+REGISTRY = Registry()
+
+
+def record(name: str, seconds: float, **counts) -> None:
+    """Record a stage timed elsewhere (e.g. by a LangChain callback)."""
+    if not _enabled:
+        return
+    REGISTRY.record(name, seconds, counts)
+    totals = _stage_totals.get()
+    if totals is not None:
+        totals[name] = totals.get(name, 0.0) + seconds
+    if _json_log:
+        logger.info(json.dumps({"span": name, "ms": round(seconds * 1000, 3), **counts}))
+
+
+class Span:
+    """An open span; :meth:`set` attaches counts recorded when it closes."""
+
+    __slots__ = ("name", "counts", "_start")
+
+    def __init__(self, name: str, counts: dict):
+        self.name = name
+        self.counts = counts
+
+    def set(self, **counts) -> None:
+        self.counts.update(counts)
+
+    def __enter__(self) -> "Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.counts["errors"] = 1
+        record(self.name, time.perf_counter() - self._start, **self.counts)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **counts) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **counts):
+    """Return a context manager timing the stage *name*.
+
+    Counts given here or later through ``.set(...)`` on the entered span
+    are summed per stage in the registry. A span left by an exception
+    also counts one ``errors``.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, counts)
+
+
+def timed(name: str):
+    """Decorator wrapping every call of the function in :func:`span` *name*."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def collect_stages():
+    """Collect the seconds per stage recorded in the current context.
+
+    Yields a dict that fills with ``{stage: seconds}`` for spans finished
+    inside the block, including those run by LangChain in worker threads
+    (which copy the caller's context).
+    """
+    totals = {}
+    token = _stage_totals.set(totals)
+    try:
+        yield totals
+    finally:
+        _stage_totals.reset(token)
+
+
+def summary() -> dict:
+    """Return the process-wide per-stage summary (see :meth:`Registry.summary`)."""
+    return REGISTRY.summary()
+
+
+def reset() -> None:
+    """Clear the process-wide registry."""
+    REGISTRY.reset()
@@ -0,0 +1,492 @@
+"""
+Offline tests for rag_backend using stub embedding and chat models
+"""
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import pytest  # noqa: E402
+from botocore.exceptions import ClientError  # noqa: E402
+from langchain_community.docstore.in_memory import InMemoryDocstore  # noqa: E402
+from langchain_community.vectorstores import FAISS  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+
+import rag_backend as backend  # noqa: E402
+import telemetry  # noqa: E402
+from chunker import TokenChunker, count_tokens  # noqa: E402
+from context_packer import DEFAULT_SEPARATOR, estimate_tokens, pack_context  # noqa: E402
+from ann_index import index_type_of, quantization_of  # noqa: E402
+from embedding_engine import EmbeddingEngine, _AdaptiveLimiter, build_faiss_streaming, is_throttling_error  # noqa: E402
+from index_cache import IndexCache, compute_cache_key, file_digest  # noqa: E402
+from mmr_retrieval import MMRRetriever  # noqa: E402
+from pdf_fixtures import make_text_pdf, page_lines, write_text_pdf  # noqa: E402
+from rag_service import FAILED, READY, RAGService  # noqa: E402
+from semantic_cache import index_fingerprint  # noqa: E402
+from stubs import StubChatModel  # noqa: E402
+
+
+class CountingEmbeddings(Embeddings):
+    """Bag-of-letters embedder that counts every embedding request."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _vector(self, text: str) -> list:
+        self.calls += 1
+        counts = [0.0] * 26
+        for ch in text.lower():
+            if 'a' <= ch <= 'z':
+                counts[ord(ch) - ord('a')] += 1.0
+        return counts
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+class ThrottlingEmbeddings(CountingEmbeddings):
+    """Throttles the first *throttles* requests for every text."""
+
+    def __init__(self, throttles: int):
+        super().__init__()
+        self.throttles = throttles
+        self.attempts = {}
+
+    def embed_documents(self, texts):
+        [text] = texts
+        self.attempts[text] = self.attempts.get(text, 0) + 1
+        if self.attempts[text] <= self.throttles:
+            raise ClientError({"Error": {"Code": "ThrottlingException"}}, "InvokeModel")
+        return super().embed_documents(texts)
+
+
+def _documents():
+    return [
+        Document(page_content=f"Employees receive {n} days of casual leave per year.",
+                 metadata={'page': n})
+        for n in range(1, 11)
+    ]
+
+
+def _chain(embeddings, answers=None):
+    vectorstore = backend.build_vector_index(_documents(), embeddings)
+    llm = FakeListChatModel(responses=answers or ["Twelve days."])
+    return backend.get_rag_chain(vectorstore, llm=llm)
+
+
+def test_ask_embeds_question_once():
+    embeddings = CountingEmbeddings()
+    chain, retriever = _chain(embeddings)
+    embeddings.calls = 0
+
+    backend.ask(chain, retriever, "How many casual leaves?")
+
+    assert embeddings.calls == 1
+
+
+def test_ask_returns_answer_sources_and_timings():
+    chain, retriever = _chain(CountingEmbeddings())
+
+    result = backend.ask(chain, retriever, "How many casual leaves?")
+
+    assert result['answer'] == "Twelve days."
+    assert len(result['source_documents']) == backend.SEARCH_K
+    assert all(isinstance(d, Document) for d in result['source_documents'])
+    assert {'retrieval', 'generation', 'total'} <= set(result['timings'])
+
+
+def test_ask_stream_yields_deltas_then_sources():
+    chain, _ = _chain(CountingEmbeddings())
+
+    items = list(backend.ask_stream(chain, "How many casual leaves?"))
+
+    *deltas, final = items
+    assert all(isinstance(d, str) for d in deltas)
+    assert "".join(deltas) == "Twelve days."
+    assert len(final['source_documents']) == backend.SEARCH_K
+    assert 'time_to_first_token' in final['timings']
+
+
+def test_ask_stream_with_semantic_cache_requires_retriever():
+    chain, retriever = _chain(CountingEmbeddings())
+    cache = backend.get_semantic_cache(retriever.vectorstore)
+
+    with pytest.raises(ValueError, match="retriever"):
+        backend.ask_stream(chain, "How many casual leaves?", semantic_cache=cache)
+
+
+def test_semantic_cache_answers_repeat_question_without_generation():
+    embeddings = CountingEmbeddings()
+    chain, retriever = _chain(embeddings, answers=["Twelve days.", "unexpected"])
+    cache = backend.get_semantic_cache(retriever.vectorstore)
+    embeddings.calls = 0
+
+    first = backend.ask(chain, retriever, "How many casual leaves?", semantic_cache=cache)
+    second = backend.ask(chain, retriever, "how many casual leaves", semantic_cache=cache)
+
+    assert embeddings.calls == 2
+    assert first['cached'] is False
+    assert second['cached'] is True
+    assert second['answer'] == "Twelve days."
+    assert [d.page_content for d in second['source_documents']] == \
+        [d.page_content for d in first['source_documents']]
+    assert cache.stats['hits'] == 1
+
+
+def test_semantic_cache_is_cleared_when_index_is_rebuilt_with_same_chunk_count():
+    embeddings = CountingEmbeddings()
+    chain, retriever = _chain(embeddings)
+    old = retriever.vectorstore
+    cache = backend.get_semantic_cache(old)
+    backend.ask(chain, retriever, "How many casual leaves?", semantic_cache=cache)
+    assert cache.lookup("How many casual leaves?") is not None
+
+    # Same chunk count on the same index object, as when a rebuilt index is
+    # allocated where a collected one used to be
+    docs = [old.docstore.search(old.index_to_docstore_id[i]) for i in range(old.index.ntotal)]
+    ids = [f"rebuilt-{i}" for i in range(len(docs))]
+    rebuilt = FAISS(old.embedding_function, old.index, InMemoryDocstore(dict(zip(ids, docs))), dict(enumerate(ids)))
+
+    assert index_fingerprint(rebuilt) != index_fingerprint(old)
+    cache.bind(index_fingerprint(rebuilt))
+    assert cache.lookup("How many casual leaves?") is None
+
+
+def test_hybrid_retriever_finds_exact_clause_number():
+    docs = _documents() + [
+        Document(page_content="Clause 7.3.2 covers leave without pay (LWP).", metadata={'page': 11}),
+    ]
+    vectorstore = backend.build_vector_index(docs, CountingEmbeddings())
+    retriever = backend.get_retriever(vectorstore, search_type='hybrid')
+
+    results = retriever.invoke("clause 7.3.2")
+
+    assert "7.3.2" in results[0].page_content
+
+
+def test_pack_context_merges_overlaps_drops_repeats_and_fits_budget():
+    text = " ".join(f"Sentence {n} about earned leave carry-forward rules." for n in range(40))
+    splitter = backend.RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=100)
+    chunks = splitter.split_documents([Document(page_content=text, metadata={'page': 3})])
+    footer = "Confidential - UPL Leave Policy India - internal use only"
+    docs = [chunks[3], chunks[2], chunks[4]] + [
+        Document(page_content=f"Page {n} leave rules.\n{footer}", metadata={'page': n})
+        for n in (8, 9)
+    ]
+
+    context = pack_context(docs)
+
+    segments = context.split(DEFAULT_SEPARATOR)
+    assert len(segments) == 3
+    assert segments[0] in text
+    assert segments[0].startswith(chunks[2].page_content)
+    assert segments[0].endswith(chunks[4].page_content)
+    assert context.count("Sentence 20 about") <= 1
+    assert context.count(footer) == 1
+    assert estimate_tokens(pack_context(docs, max_tokens=60)) <= 60
+
+
+def test_index_cache_hit_skips_embedding(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, '_index_cache', IndexCache(str(tmp_path / 'cache')))
+    pdf = str(tmp_path / 'policy.pdf')
+    make_text_pdf(pdf, pages=3, words_per_page=300)
+    embeddings = CountingEmbeddings()
+    built = backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+    assert embeddings.calls > 0
+    assert backend.get_index_cache().stats['misses'] == 1
+
+    embeddings.calls = 0
+    cached = backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+
+    stats = backend.get_index_cache().stats
+    assert embeddings.calls == 0
+    assert stats['hits'] == 1 and stats['last_load_seconds'] is not None
+    assert cached.index.ntotal == built.index.ntotal
+
+
+def test_index_cache_key_changes_with_chunking_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, '_index_cache', IndexCache(str(tmp_path / 'cache')))
+    pdf = str(tmp_path / 'policy.pdf')
+    make_text_pdf(pdf, pages=3, words_per_page=300)
+    digests = [file_digest(pdf)]
+    args = (backend.CHUNK_SIZE, backend.CHUNK_OVERLAP, backend.EMBEDDING_MODEL_ID, backend.SPLITTER_SEPARATORS)
+    key = compute_cache_key(digests, *args)
+    assert compute_cache_key(digests, *args) == key
+    assert compute_cache_key(digests, args[0] + 100, *args[1:]) != key
+    assert compute_cache_key(digests, *args[:2], "other-model", args[3]) != key
+
+    embeddings = CountingEmbeddings()
+    backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+    monkeypatch.setattr(backend, 'CHUNK_OVERLAP', backend.CHUNK_OVERLAP + 10)
+    embeddings.calls = 0
+    backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+
+    assert embeddings.calls > 0
+    assert len(backend.get_index_cache().entries()) == 2
+
+
+def test_index_cache_evicts_least_recently_used_entry(tmp_path):
+    cache = IndexCache(str(tmp_path / 'cache'), max_entries=2)
+    embeddings = CountingEmbeddings()
+    for number, key in enumerate(['first', 'second']):
+        cache.save(key, FAISS.from_documents(_documents(), embeddings))
+        os.utime(os.path.join(cache.root, key), (1000 + number, 1000 + number))
+
+    assert cache.load('first', embeddings) is not None
+    cache.save('third', FAISS.from_documents(_documents(), embeddings))
+
+    assert cache.entries()[0] == 'third'
+    assert set(cache.entries()) == {'first', 'third'}
+    assert cache.load('second', embeddings) is None
+
+
+def _marked_pdf(path, name: str, pages: int) -> str:
+    """Write a PDF whose page *n* text starts with ``"<name> page <n>"``."""
+    return write_text_pdf(str(path), [
+        [f"{name} page {number}"] + page_lines(number, 40)[1:] for number in range(1, pages + 1)
+    ])
+
+
+def test_resolve_sources_expands_directories_globs_and_manifests(tmp_path):
+    corpus = tmp_path / 'corpus'
+    (corpus / 'nested').mkdir(parents=True)
+    first = _marked_pdf(corpus / 'a.pdf', 'alpha', 1)
+    second = _marked_pdf(corpus / 'nested' / 'b.pdf', 'beta', 1)
+    (corpus / 'notes.txt').write_text('not a pdf')
+    listing = tmp_path / 'sources.txt'
+    listing.write_text(f"# corpus\n{second}\n\nhttps://example.com/c.pdf\n")
+    manifest = tmp_path / 'sources.json'
+    manifest.write_text(json.dumps([first, str(listing)]))
+
+    assert backend.resolve_sources(str(corpus)) == [first, second]
+    assert backend.resolve_sources(str(corpus / '*.pdf')) == [first]
+    assert backend.resolve_sources(str(listing)) == [second, 'https://example.com/c.pdf']
+    assert backend.resolve_sources(str(manifest)) == [first, second, 'https://example.com/c.pdf']
+
+
+def test_corpus_chunks_carry_source_and_page_and_merge_into_one_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, '_index_cache', IndexCache(str(tmp_path / 'cache')))
+    paths = [_marked_pdf(tmp_path / 'alpha.pdf', 'alpha', 2), _marked_pdf(tmp_path / 'beta.pdf', 'beta', 3)]
+    names = {paths[0]: 'alpha', paths[1]: 'beta'}
+
+    chunks = list(backend.iter_corpus_chunks(paths, max_workers=2))
+    assert [c.metadata['source'] for c in chunks] == [paths[0]] * 2 + [paths[1]] * 3
+    for chunk in chunks:
+        marker = f"{names[chunk.metadata['source']]} page {chunk.metadata['page'] + 1}"
+        assert chunk.page_content.startswith(marker)
+
+    vectorstore = backend.build_vector_index(embeddings=CountingEmbeddings(), pdf_url=str(tmp_path / '*.pdf'))
+    indexed = [vectorstore.docstore.search(i) for i in vectorstore.index_to_docstore_id.values()]
+    assert vectorstore.index.ntotal == len(chunks)
+    assert {(d.metadata['source'], d.metadata['page']) for d in indexed} == {
+        (c.metadata['source'], c.metadata['page']) for c in chunks
+    }
+
+
+def test_rebuild_after_page_edit_embeds_only_that_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, '_index_cache', IndexCache(str(tmp_path / 'cache')))
+    pdf = str(tmp_path / 'policy.pdf')
+    make_text_pdf(pdf, pages=6, words_per_page=300)
+    embeddings = CountingEmbeddings()
+    original = backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+
+    make_text_pdf(pdf, pages=6, words_per_page=300, edited_pages={4})
+    embeddings.calls = 0
+    updated = backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+
+    expected = backend.load_and_split_documents(pdf)
+    assert embeddings.calls == len([c for c in expected if c.metadata['page'] == 3])
+    assert updated.index.ntotal == len(expected)
+    contents = {updated.docstore.search(i).page_content for i in updated.index_to_docstore_id.values()}
+    assert contents == {c.page_content for c in expected}
+    assert contents != {original.docstore.search(i).page_content
+                        for i in original.index_to_docstore_id.values()}
+
+
+def test_cached_index_is_rebuilt_when_index_type_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, '_index_cache', IndexCache(str(tmp_path / 'cache')))
+    pdf = str(tmp_path / 'policy.pdf')
+    make_text_pdf(pdf, pages=3, words_per_page=300)
+    embeddings = CountingEmbeddings()
+    assert index_type_of(backend.build_vector_index(embeddings=embeddings, pdf_url=pdf).index) == "flat"
+
+    monkeypatch.setattr(backend, 'ANN_INDEX_TYPE', "hnsw")
+    rebuilt = backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+    cached = backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+
+    assert index_type_of(rebuilt.index) == index_type_of(cached.index) == "hnsw"
+    assert len(backend.get_index_cache().entries()) == 2
+
+
+def test_cached_index_is_rebuilt_when_quantization_or_rerank_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, '_index_cache', IndexCache(str(tmp_path / 'cache')))
+    pdf = str(tmp_path / 'policy.pdf')
+    make_text_pdf(pdf, pages=3, words_per_page=300)
+    embeddings = CountingEmbeddings()
+    backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+
+    monkeypatch.setattr(backend, 'ANN_QUANTIZATION', "sq8")
+    monkeypatch.setattr(backend, 'ANN_EXACT_RERANK', True)
+    backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+    embeddings.calls = 0
+    cached = backend.build_vector_index(embeddings=embeddings, pdf_url=pdf)
+
+    assert quantization_of(cached.index) == "sq8"
+    assert cached.exact_vectors is not None and cached.exact_vectors.shape[0] == cached.index.ntotal
+    assert embeddings.calls == 0
+
+
+def test_ask_many_keeps_order_and_reports_per_question_errors():
+    def llm(prompt):
+        question = prompt.to_string().rsplit("Question:", 1)[1]
+        if "boom" in question:
+            raise RuntimeError("model failure")
+        return AIMessage(content=question.split("Answer:")[0].strip().upper())
+
+    vectorstore = backend.build_vector_index(_documents(), CountingEmbeddings())
+    chain, retriever = backend.get_rag_chain(vectorstore, llm=RunnableLambda(llm))
+    questions = [f"question {n}" for n in range(6)] + ["boom"] + ["last question"]
+
+    results = backend.ask_many(chain, retriever, questions, max_concurrency=3)
+
+    assert [r['answer'] for r in results] == [q.upper() for q in questions[:6]] + [None, "LAST QUESTION"]
+    assert isinstance(results[6]['error'], RuntimeError)
+    assert all(r['error'] is None for i, r in enumerate(results) if i != 6)
+    assert all(len(r['source_documents']) == backend.SEARCH_K for i, r in enumerate(results) if i != 6)
+
+
+def test_mmr_retriever_matches_langchain_mmr():
+    docs = [Document(page_content=" ".join(page_lines(n, 40)), metadata={'page': n}) for n in range(200)]
+    vectorstore = backend.build_vector_index(docs, CountingEmbeddings())
+    reference = vectorstore.as_retriever(search_type='mmr', search_kwargs={'k': 4, 'fetch_k': 20})
+    retriever = MMRRetriever(vectorstore=vectorstore, k=4, fetch_k=20)
+
+    for query in ["casual leave approval", "maternity notice period", "salary encashment", "zzz"]:
+        assert [d.id for d in retriever.invoke(query)] == [d.id for d in reference.invoke(query)]
+
+
+def test_rag_service_recovers_from_failed_warm_up(tmp_path, monkeypatch):
+    pdf = str(tmp_path / "policy.pdf")
+    monkeypatch.setattr(backend, 'INDEX_CACHE_ENABLED', False)
+    service = RAGService(embeddings=CountingEmbeddings(), llm=FakeListChatModel(responses=["Ten."]),
+                         pdf_url=pdf)
+
+    assert service.start().wait(timeout=30) is False
+    assert service.state == FAILED and service.error is not None
+
+    make_text_pdf(pdf, 3)
+    assert service.restart().wait(timeout=30) is True
+    assert service.state == READY and service.error is None
+    assert backend.ask(service.chain, service.retriever, "casual leave")['answer'] == "Ten."
+
+
+def test_ask_reports_stage_timings_and_fills_telemetry_registry(monkeypatch):
+    vectorstore = backend.build_vector_index(_documents(), CountingEmbeddings())
+    chain, retriever = backend.get_rag_chain(vectorstore, llm=StubChatModel(answer_tokens=5),
+                                             search_type='mmr')
+    telemetry.reset()
+
+    timings = backend.ask(chain, retriever, "How many casual leaves?")['timings']
+    backend.ask(chain, retriever, "Who approves leave?")
+
+    assert {'query_embedding', 'search', 'retrieval', 'prompt_assembly', 'generation'} <= set(timings)
+    assert timings['query_embedding'] + timings['search'] <= timings['retrieval'] <= timings['total']
+    summary = telemetry.summary()
+    assert summary['ask']['count'] == summary['generation']['count'] == 2
+    assert summary['generation']['output_tokens'] == 10
+    assert summary['generation']['input_tokens'] > summary['prompt_assembly']['context_tokens'] > 0
+
+    telemetry.reset()
+    monkeypatch.setattr(telemetry, '_enabled', False)
+    timings = backend.ask(chain, retriever, "How many casual leaves?")['timings']
+    assert set(timings) == {'retrieval', 'generation', 'total'}
+    assert telemetry.summary() == {}
+
+
+def test_token_chunker_respects_budget_separators_overlap_and_offsets():
+    paragraphs = ["\n".join(page_lines(n, 30)) for n in range(12)]
+    text = "\n\n".join(paragraphs) + "\n\n" + "x" * 400
+    chunker = TokenChunker(chunk_size=120, chunk_overlap=20)
+    page = Document(page_content=text, metadata={'page': 7})
+
+    chunks = chunker.split_documents([page])
+
+    assert [c.page_content for c in chunks] == [c.page_content for c in chunker.split_documents([page])]
+    assert all(count_tokens(c.page_content) <= 120 for c in chunks)
+    assert all(text[c.metadata['start_index']:].startswith(c.page_content) for c in chunks)
+    assert all(c.metadata['page'] == 7 for c in chunks)
+    # Chunks end at paragraph breaks while paragraphs fit; consecutive chunks overlap.
+    prose = [c for c in chunks if "x" not in c.page_content]
+    assert len(prose) >= 4 and all(c.page_content.endswith(tuple(paragraphs)) for c in prose)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        start, end = previous.metadata['start_index'], previous.metadata['start_index'] + len(previous.page_content)
+        assert start < chunk.metadata['start_index'] < end
+    assert "".join(c.page_content for c in chunks).count("x") >= 400
+
+
+def test_adaptive_limiter_halves_on_throttle_and_grows_by_one():
+    limiter = _AdaptiveLimiter(8)
+
+    for expected in (4, 2, 1, 1):
+        limiter.acquire()
+        limiter.release(throttled=True)
+        assert limiter.limit == expected
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(throttled=False)
+    # One success per slot raises the limit by one, up to the maximum.
+    assert limiter.limit == 3
+
+
+def test_embedding_engine_retries_throttled_requests_in_order():
+    texts = [f"clause {letter}" for letter in "abcdefghij"]
+    embeddings = ThrottlingEmbeddings(throttles=2)
+    engine = EmbeddingEngine(embeddings, max_workers=4, max_retries=3, base_delay=0.001)
+
+    matrix = engine.embed(texts)
+
+    assert matrix.tolist() == CountingEmbeddings().embed_documents(texts)
+    assert engine.stats['throttled'] == engine.stats['retries'] == 2 * len(texts)
+
+
+def test_embedding_engine_gives_up_after_max_retries():
+    embeddings = ThrottlingEmbeddings(throttles=10)
+    engine = EmbeddingEngine(embeddings, max_workers=2, max_retries=2, base_delay=0.001)
+
+    with pytest.raises(ClientError):
+        engine.embed(["clause a"])
+    assert embeddings.attempts == {"clause a": 3}
+
+
+def test_is_throttling_error_tolerates_missing_response():
+    error = RuntimeError("boom")
+    error.response = None
+
+    assert not is_throttling_error(error)
+    assert is_throttling_error(ClientError({"Error": {"Code": "TooManyRequestsException"}}, "InvokeModel"))
+
+
+def test_build_faiss_streaming_stops_producer_when_embedding_fails():
+    chunks = (Document(page_content=f"clause {n}") for n in range(100))
+    embeddings = ThrottlingEmbeddings(throttles=1)
+    engine = EmbeddingEngine(embeddings, max_workers=1, max_retries=0)
+
+    before = set(threading.enumerate())
+
+    with pytest.raises(ClientError):
+        build_faiss_streaming(chunks, embeddings, engine, batch_size=2, prefetch=1)
+
+    producers = set(threading.enumerate()) - before
+    for thread in producers:
+        thread.join(timeout=2)
+    assert not any(thread.is_alive() for thread in producers)
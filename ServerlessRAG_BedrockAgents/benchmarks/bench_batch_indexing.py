@@ -0,0 +1,120 @@
+"""
+Benchmark: indexing time per document by batch size
+
+Indexes the same ``--documents`` synthetic PDFs through the indexing
+Lambda's ``lambda_handler`` against ``LocalS3``, as one invocation per
+``--batch-sizes`` documents (a batch of 1 is the single-document event).
+Embeddings come from ``StubEmbeddings`` with per-request latency, so the
+embedding pool's utilisation shows the way it does against Bedrock.
+
+Reports wall time per document, S3 requests, shards and manifest
+versions written for each batch size, and checks that one unreadable
+document in a batch is reported as its own failure.
+
+Usage:
+    python benchmarks/bench_batch_indexing.py [--documents 50 --batch-sizes 1 10 50]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "RAG_Project", "benchmarks"))
+
+from bench_sharded_indexing import _load_handler  # noqa: E402
+from local_s3 import LocalS3  # noqa: E402
+from pdf_fixtures import make_text_pdf  # noqa: E402
+from stubs import StubEmbeddings  # noqa: E402
+
+
+def _events(keys: list, batch_size: int) -> list:
+    documents = [
+        {"document_key": key, "document_id": f"doc{number}", "user_id": "bench"}
+        for number, key in enumerate(keys, 1)
+    ]
+    if batch_size == 1:
+        return documents
+    return [{"documents": documents[i:i + batch_size]} for i in range(0, len(documents), batch_size)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    parser.add_argument("--s3-mb-per-second", type=float, default=200.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    indexing = _load_handler("indexing")
+    logging.getLogger().setLevel(logging.WARNING)
+    embeddings = StubEmbeddings(args.dim, latency=args.embed_latency)
+    indexing.get_embeddings = lambda: embeddings
+    indexing.EMBEDDING_CACHE_ENABLED = False  # measure batching alone
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        keys = []
+        for number in range(1, args.documents + 1):
+            key = f"documents/doc{number}.pdf"
+            path = os.path.join(tmpdir, "bucket", indexing.S3_BUCKET, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            make_text_pdf(path, args.pages, seed=number)
+            keys.append(key)
+
+        for batch_size in args.batch_sizes:
+            root = os.path.join(tmpdir, f"batch{batch_size}")
+            os.makedirs(os.path.join(root, indexing.S3_BUCKET))
+            os.symlink(os.path.join(tmpdir, "bucket", indexing.S3_BUCKET, "documents"),
+                       os.path.join(root, indexing.S3_BUCKET, "documents"))
+            s3 = LocalS3(root, args.s3_latency, args.s3_mb_per_second)
+            indexing.s3_client = s3
+            embeddings.calls = 0
+            start = time.perf_counter()
+            for event in _events(keys, batch_size):
+                response = indexing.lambda_handler(event, None)
+                assert response["statusCode"] == 200, response
+            seconds = time.perf_counter() - start
+            manifest, _ = indexing.read_manifest_from_s3()
+            results[batch_size] = {
+                "invocations": -(-args.documents // batch_size),
+                "ms_per_document": seconds / args.documents * 1000,
+                "total_s": seconds,
+                "embedding_requests": embeddings.calls,
+                "s3_requests": s3.requests,
+                "live_shards": len(manifest["shards"]),
+                "manifest_version": manifest["version"],
+                "documents_indexed": sum(len(shard["documents"]) for shard in manifest["shards"]),
+            }
+
+        # One missing document in an SQS batch fails alone
+        indexing.s3_client = LocalS3(os.path.join(tmpdir, "batch1"))
+        records = [
+            {"messageId": f"m{number}", "body": json.dumps(document)}
+            for number, document in enumerate(_events(keys[:3] + ["documents/missing.pdf"], 1))
+        ]
+        failures = indexing.lambda_handler({"Records": records}, None)["batchItemFailures"]
+
+    print(json.dumps({
+        "documents": args.documents,
+        "pages_per_document": args.pages,
+        "embed_latency": args.embed_latency,
+        "embed_max_workers": indexing.EMBED_MAX_WORKERS,
+        "s3_latency": args.s3_latency,
+        "results": results,
+        "sqs_batch_failures": failures,
+    }, indent=2))
+    if failures != [{"itemIdentifier": "m3"}]:
+        sys.exit("the unreadable document was not reported as the only failure")
+
+
+if __name__ == "__main__":
+    main()
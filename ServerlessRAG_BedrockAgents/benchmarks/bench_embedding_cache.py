@@ -0,0 +1,124 @@
+"""
+Benchmark: chunk embedding cache across indexing runs
+
+Indexes ``--documents`` synthetic PDFs through the indexing Lambda's
+``lambda_handler`` against ``LocalS3``, with embeddings from
+``StubEmbeddings`` (per-request latency), in four runs:
+
+* ``initial``   — every document for the first time (cold cache)
+* ``reupload``  — the same PDFs uploaded again
+* ``revision``  — new revisions with ``--edited-pages`` pages changed
+* ``uncached``  — the revisions again with ``EMBEDDING_CACHE_ENABLED`` off
+
+Each run is one batch invocation. Reports per run the wall time per
+document, Bedrock calls, cache hit ratio and saved calls, then compacts
+the cache down to ``--max-entries`` and reports what was kept. Exits
+non-zero if a cached vector differs from a freshly embedded one.
+
+Usage:
+    python benchmarks/bench_embedding_cache.py [--documents 20 --pages 10 --edited-pages 2]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "RAG_Project", "benchmarks"))
+
+from bench_sharded_indexing import _load_handler  # noqa: E402
+from local_s3 import LocalS3  # noqa: E402
+from pdf_fixtures import make_text_pdf  # noqa: E402
+from stubs import StubEmbeddings  # noqa: E402
+
+
+def _write_pdfs(s3: LocalS3, bucket: str, run: str, documents: int, pages: int, edited: tuple) -> list:
+    events = []
+    for number in range(1, documents + 1):
+        key = f"documents/{run}/doc{number}.pdf"
+        path = os.path.join(s3.root, bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        make_text_pdf(path, pages, seed=number * 10, edited_pages=edited)
+        events.append({"document_key": key, "document_id": f"doc{number}"})
+    return events
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--edited-pages", type=int, default=2)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    parser.add_argument("--max-entries", type=int, default=500)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    indexing = _load_handler("indexing")
+    logging.getLogger().setLevel(logging.WARNING)
+    embeddings = StubEmbeddings(args.dim, latency=args.embed_latency)
+    indexing.get_embeddings = lambda: embeddings
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        s3 = LocalS3(tmpdir, args.s3_latency)
+        indexing.s3_client = s3
+        edited = tuple(range(1, args.edited_pages + 1))
+        runs = {
+            "initial": _write_pdfs(s3, indexing.S3_BUCKET, "v1", args.documents, args.pages, ()),
+            "reupload": _write_pdfs(s3, indexing.S3_BUCKET, "v1-again", args.documents, args.pages, ()),
+            "revision": _write_pdfs(s3, indexing.S3_BUCKET, "v2", args.documents, args.pages, edited),
+        }
+        runs["uncached"] = runs["revision"]
+        for run, documents in runs.items():
+            indexing.EMBEDDING_CACHE_ENABLED = run != "uncached"
+            embeddings.calls = 0
+            start = time.perf_counter()
+            response = indexing.lambda_handler({"documents": documents}, None)
+            seconds = time.perf_counter() - start
+            body = json.loads(response["body"])
+            assert response["statusCode"] == 200, body
+            results[run] = {
+                "ms_per_document": seconds / args.documents * 1000,
+                "bedrock_calls": embeddings.calls,
+                "chunks": body["vectors_count"],
+                **body["embedding_cache"],
+            }
+
+        indexing.EMBEDDING_CACHE_ENABLED = True
+        cache = indexing.get_embedding_cache()
+        texts = [f"cached text {i}" for i in range(5)]
+        cache.embed(texts, lambda batch: np.asarray(embeddings.embed_documents(batch), dtype=np.float32))
+        cached = cache.embed(texts, lambda batch: sys.exit("cached texts were embedded again"))
+        exact = bool(np.array_equal(cached, np.asarray(embeddings.embed_documents(texts), dtype=np.float32)))
+
+        cache.max_entries = args.max_entries
+        start = time.perf_counter()
+        compaction = {**cache.compact(), "seconds": time.perf_counter() - start}
+        texts = [doc.page_content for doc in indexing.load_chunks(
+            os.path.join(tmpdir, indexing.S3_BUCKET, runs["revision"][-1]["document_key"]), "check")]
+        cache.embed(texts, lambda batch: np.asarray(embeddings.embed_documents(batch), dtype=np.float32))
+        compaction["hit_ratio_after_compaction"] = cache.stats["hit_ratio"]
+
+    print(json.dumps({
+        "documents": args.documents,
+        "pages_per_document": args.pages,
+        "edited_pages": args.edited_pages,
+        "embed_latency": args.embed_latency,
+        "results": results,
+        "cached_vectors_exact": exact,
+        "compaction": compaction,
+    }, indent=2))
+    if not exact:
+        sys.exit("cached vectors differ from freshly embedded ones")
+
+
+if __name__ == "__main__":
+    main()
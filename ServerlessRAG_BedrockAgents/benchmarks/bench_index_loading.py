@@ -0,0 +1,192 @@
+"""
+Benchmark: retrieval Lambda cold start, S3 download vs memory-mapped shared index
+
+Builds FAISS indexes of several sizes and stores each twice, as one
+shard with its manifest: as the S3 objects the indexing Lambda uploads
+(``LocalS3`` stands in for the bucket) and published under a shared root
+(a local directory stands in for the EFS mount). Each shard is written
+with each ``--docstores`` format: ``pickle`` (LangChain's ``index.pkl``,
+as shards were written before ``docstore_file``) and ``file`` (the
+offset-indexed ``docstore.jsonl`` read on demand). Every measurement runs
+``lambda/retrieval/handler.py`` in a fresh interpreter, as a new execution
+environment would, and reports:
+
+* ``load_s``           — ``load_faiss_index`` wall time
+* ``rss_mb``           — resident memory after load, and ``anon_mb``, its
+                         private part; mapped index pages are shared
+                         through the page cache and can be evicted
+                         (``rss_before_load_mb`` is the bare handler)
+* ``rss_after_queries_mb`` / ``query_ms_p50`` — after ``--queries``
+                         ``retrieve_context`` calls
+
+The stand-ins are local disk with a warm page cache, so neither mode pays
+network transfer here; on Lambda the S3 mode additionally downloads the
+whole index in every environment. Bedrock is replaced by random query
+embeddings.
+
+Usage:
+    python benchmarks/bench_index_loading.py [--sizes 10000 50000 150000 --dim 1024 --factory Flat --docstores pickle file]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_LAMBDA_DIR = os.path.join(os.path.dirname(__file__), "..", "lambda")
+for _function in ("common", "retrieval"):
+    sys.path.insert(0, os.path.abspath(os.path.join(_LAMBDA_DIR, _function)))
+
+import numpy as np  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from local_s3 import LocalS3  # noqa: E402
+
+_MODES = ("s3", "shared_mmap")
+_DOCSTORES = ("pickle", "file")
+_BUCKET = "bench-bucket"
+
+class RandomEmbeddings(Embeddings):
+    """Random unit-variance query vectors in place of Bedrock."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.rng = np.random.default_rng(1)
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.rng.standard_normal(self.dim, dtype=np.float32).tolist()
+
+
+def _memory_mb() -> dict:
+    status = {}
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon"):
+                status[key] = int(value.split()[0]) / 1024
+    return {"rss_mb": status["VmRSS"], "anon_mb": status["RssAnon"]}
+
+
+def _build(directory: str, n_vectors: int, dim: int, factory: str, docstore_format: str) -> None:
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    from docstore_file import write_docstore
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n_vectors, dim), dtype=np.float32)
+    index = faiss.index_factory(dim, factory)
+    index.train(vectors[: min(n_vectors, 50_000)])
+    index.add(vectors)
+    ids = [str(i) for i in range(n_vectors)]
+    docstore = InMemoryDocstore({
+        doc_id: Document(page_content=f"chunk {doc_id} " + "policy text " * 40, metadata={"page": i})
+        for i, doc_id in enumerate(ids)
+    })
+    if docstore_format == "pickle":
+        FAISS(RandomEmbeddings(dim), index, docstore, dict(enumerate(ids))).save_local(directory, index_name="index")
+    else:
+        faiss.write_index(index, os.path.join(directory, "index.faiss"))
+        write_docstore(directory, docstore, dict(enumerate(ids)), n_vectors)
+
+
+def _worker(args) -> None:
+    """Run in a fresh interpreter: cold-load the index through the handler."""
+    os.environ["S3_BUCKET_NAME"] = _BUCKET
+    os.environ["FAISS_SHARED_PATH"] = args.shared if args.mode == "shared_mmap" else ""
+    os.environ["DOCSTORE_ALLOW_PICKLE"] = "true"  # the pickle format is measured on purpose
+    import handler
+
+    handler.s3_client = LocalS3(args.bucket)
+    handler.DOCSTORE_DIR = os.path.join(os.path.dirname(args.bucket), "lambda-tmp", str(os.getpid()))
+    handler.get_embeddings = lambda: RandomEmbeddings(args.dim)
+
+    before_load = _memory_mb()["rss_mb"]
+    start = time.perf_counter()
+    handler.load_faiss_index()
+    load_s = time.perf_counter() - start
+    after_load = _memory_mb()
+    latencies = []
+    for _ in range(args.queries):
+        start = time.perf_counter()
+        handler.retrieve_context("How many days of casual leave can be carried forward?")
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(json.dumps({
+        "load_s": load_s,
+        "rss_before_load_mb": before_load,
+        **after_load,
+        "rss_after_queries_mb": _memory_mb()["rss_mb"],
+        "query_ms_p50": statistics.median(latencies),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 150_000])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--factory", default="Flat")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--docstores", nargs="+", choices=_DOCSTORES, default=list(_DOCSTORES))
+    parser.add_argument("--mode", choices=_MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--bucket", help=argparse.SUPPRESS)
+    parser.add_argument("--shared", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        _worker(args)
+        return
+
+    from index_shards import add_shard, empty_manifest, new_shard_id, shard_path
+    from shared_index import publish_shard, write_manifest
+
+    results = []
+    for n_vectors, docstore_format in [(n, d) for n in args.sizes for d in args.docstores]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bucket, shared = os.path.join(tmpdir, "s3"), os.path.join(tmpdir, "efs")
+            prefix = os.path.join(bucket, _BUCKET, "faiss-indexes")
+            shard = {"id": new_shard_id("bench"), "documents": ["bench"], "vectors": n_vectors}
+            shard_dir = os.path.join(prefix, shard_path(shard))
+            os.makedirs(shard_dir)
+            _build(shard_dir, n_vectors, args.dim, args.factory, docstore_format)
+            manifest = add_shard(empty_manifest(), shard)
+            write_manifest(prefix, manifest)
+            publish_shard(shard_dir, shared, shard)
+            write_manifest(shared, manifest)
+            index_mb = os.path.getsize(os.path.join(shard_dir, "index.faiss")) / 1e6
+            for mode in _MODES:
+                runs = [
+                    json.loads(subprocess.run(
+                        [sys.executable, __file__, "--mode", mode, "--bucket", bucket,
+                         "--shared", shared, "--dim", str(args.dim),
+                         "--queries", str(args.queries)],
+                        check=True, capture_output=True, text=True,
+                    ).stdout.strip().splitlines()[-1])
+                    for _ in range(args.repeat)
+                ]
+                results.append({
+                    "vectors": n_vectors,
+                    "index_mb": index_mb,
+                    "mode": mode,
+                    "docstore": docstore_format,
+                    **{key: statistics.median(run[key] for run in runs) for key in runs[0]},
+                })
+
+    print(json.dumps({
+        "dim": args.dim,
+        "factory": args.factory,
+        "queries": args.queries,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark: near-duplicate chunk collapsing on a boilerplate-heavy corpus
+
+Writes ``--documents`` synthetic policy PDFs, each with ``--pages``
+pages of its own text followed by three boilerplate pages: an identical
+legal footer, a policy template with the company name filled in, and a
+disclaimer with its own effective date. Indexes them through the
+indexing Lambda's ``lambda_handler`` against ``LocalS3`` with
+``StubEmbeddings``, with near-duplicate collapsing off and on, in two
+ways:
+
+* ``batch``     — one batch invocation (duplicates collapsed before embedding)
+* ``compacted`` — one invocation per document, then a compaction run
+                  (duplicates collapsed across the merged shards)
+
+Reports chunks, index vectors and bytes, embedding calls and ingest
+time. The embedding cache is off, so saved calls come from collapsing
+alone. Exits non-zero if a chunk of a document's own pages was collapsed.
+
+Usage:
+    python benchmarks/bench_near_duplicates.py [--documents 30 --pages 6]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "RAG_Project", "benchmarks"))
+
+from bench_sharded_indexing import _load_handler  # noqa: E402
+from local_s3 import LocalS3  # noqa: E402
+from pdf_fixtures import page_lines, write_text_pdf  # noqa: E402
+from stubs import StubEmbeddings  # noqa: E402
+
+
+def _boilerplate(number: int) -> list:
+    footer = page_lines(1, 250, seed=9001)
+    template = page_lines(2, 400, seed=9002)
+    template = [template[0], f"This policy applies to all employees of Company {number} Limited."] + template[1:]
+    disclaimer = page_lines(3, 150, seed=9003) + [f"Effective date 2024-{number % 12 + 1:02d}-{number % 28 + 1:02d}."]
+    return [footer, template, disclaimer]
+
+
+def _write_corpus(root: str, bucket: str, documents: int, pages: int) -> list:
+    events = []
+    for number in range(1, documents + 1):
+        key = f"documents/doc{number}.pdf"
+        path = os.path.join(root, bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        own = [page_lines(page, 400, seed=number) for page in range(1, pages + 1)]
+        write_text_pdf(path, own + _boilerplate(number))
+        events.append({"document_key": key, "document_id": f"doc{number}"})
+    return events
+
+
+def _index_size(s3: LocalS3, bucket: str, indexing, own_pages: int) -> dict:
+    manifest, _ = indexing.read_manifest_from_s3()
+    size, references, own_pages_collapsed = 0, 0, 0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for shard in manifest["shards"]:
+            prefix = os.path.join(s3.root, bucket, indexing.S3_FAISS_PREFIX, "shards", shard["id"])
+            size += sum(os.path.getsize(os.path.join(prefix, name))
+                        for name in indexing.INDEX_FILES if os.path.exists(os.path.join(prefix, name)))
+            store = indexing.load_shard(shard, tmpdir)
+            for position in range(store.index.ntotal):
+                doc = store.docstore.search(store.index_to_docstore_id[position])
+                for reference in doc.metadata.get("duplicates", []):
+                    references += 1
+                    own_pages_collapsed += reference["page"] < own_pages
+    return {
+        "vectors": sum(shard["vectors"] for shard in manifest["shards"]),
+        "index_kb": size / 1024,
+        "collapsed_references": references,
+        "own_pages_collapsed": own_pages_collapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--documents", type=int, default=30)
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    indexing = _load_handler("indexing")
+    logging.getLogger().setLevel(logging.WARNING)
+    embeddings = StubEmbeddings(args.dim, latency=args.embed_latency)
+    indexing.get_embeddings = lambda: embeddings
+    indexing.EMBEDDING_CACHE_ENABLED = False
+    indexing.SHARD_COMPACT_MIN_SHARDS = 2
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for mode in ("batch", "compacted"):
+            for collapsing in (False, True):
+                s3 = LocalS3(os.path.join(tmpdir, f"{mode}-{collapsing}"), args.s3_latency)
+                indexing.s3_client = s3
+                indexing.NEAR_DUPLICATE_ENABLED = collapsing
+                events = _write_corpus(s3.root, indexing.S3_BUCKET, args.documents, args.pages)
+                embeddings.calls = 0
+                start = time.perf_counter()
+                chunks = 0
+                if mode == "batch":
+                    body = json.loads(indexing.lambda_handler({"documents": events}, None)["body"])
+                    chunks = body["near_duplicates"].get("chunks", body["vectors_count"])
+                else:
+                    for event in events:
+                        body = json.loads(indexing.lambda_handler(event, None)["body"])
+                        chunks += body["vectors_count"]
+                    compaction_start = time.perf_counter()
+                    indexing.compact_shards()
+                    compaction_s = time.perf_counter() - compaction_start
+                seconds = time.perf_counter() - start
+                result = {
+                    "chunks": chunks,
+                    "embedding_calls": embeddings.calls,
+                    "ingest_s": seconds,
+                    **_index_size(s3, indexing.S3_BUCKET, indexing, args.pages),
+                }
+                if mode == "compacted":
+                    result["compaction_s"] = compaction_s
+                results[f"{mode}, collapsing {'on' if collapsing else 'off'}"] = result
+
+    print(json.dumps({
+        "documents": args.documents,
+        "own_pages_per_document": args.pages,
+        "boilerplate_pages_per_document": 3,
+        "embed_latency": args.embed_latency,
+        "threshold": indexing.NEAR_DUPLICATE_THRESHOLD,
+        "results": results,
+    }, indent=2))
+    if any(result["own_pages_collapsed"] for result in results.values()):
+        sys.exit("chunks of documents' own pages were collapsed")
+
+
+if __name__ == "__main__":
+    main()
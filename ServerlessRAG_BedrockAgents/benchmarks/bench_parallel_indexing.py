@@ -0,0 +1,143 @@
+"""
+Benchmark: parallel indexing Lambdas writing one shard manifest
+
+Starts ``--writers`` processes, each standing in for a concurrent
+indexing Lambda invocation, that index ``--documents`` documents each
+through ``handler.index_document`` against one ``LocalS3`` bucket, while
+another process runs ``compact_shards`` in a loop. Modes:
+
+* ``serialized``    — one writer indexes every document, the throughput
+                      ceiling when uploads have to be queued
+* ``unconditional`` — parallel writers, with the stand-in ignoring the
+                      manifest's conditional writes (last writer wins)
+* ``cas``           — parallel writers with compare-and-swap manifest
+                      updates, retried and rebased on conflict
+
+Afterwards the final manifest is checked against the documents written:
+every document must be listed in exactly one live shard whose files
+exist, and the retrieval Lambda must load all of their vectors. Reports
+throughput, lost documents and conflict retries as JSON, and exits
+non-zero if the ``cas`` mode lost or duplicated anything.
+
+Usage:
+    python benchmarks/bench_parallel_indexing.py [--writers 16 --documents 8 --s3-latency 0.02]
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_sharded_indexing import _document, _load_handler  # noqa: E402
+from bench_index_loading import RandomEmbeddings  # noqa: E402
+from local_s3 import LocalS3  # noqa: E402
+
+_MODES = ("serialized", "unconditional", "cas")
+
+
+def _handler(name: str, s3: LocalS3, dim: int):
+    logging.disable(logging.INFO)
+    handler = _load_handler(name)
+    handler.s3_client = s3
+    handler.get_embeddings = lambda: RandomEmbeddings(dim)
+    return handler
+
+
+def _writer(args, root: str, conditional: bool, writer: int, documents: list) -> dict:
+    s3 = LocalS3(root, args.s3_latency, args.s3_mb_per_second, conditional_writes=conditional)
+    indexing = _handler("indexing", s3, args.dim)
+    for number in documents:
+        indexing.index_document(_document(number, args.chunks, args.dim), f"doc{number}")
+    return {"writer": writer, "conflicts": s3.conflicts}
+
+
+def _compactor(root: str, conditional: bool, dim: int, stop) -> None:
+    s3 = LocalS3(root, conditional_writes=conditional)
+    indexing = _handler("indexing", s3, dim)
+    indexing.SHARD_COMPACT_MIN_SHARDS = 4
+    while not stop.is_set():
+        indexing.compact_shards()
+        time.sleep(0.2)
+
+
+def _check(root: str, dim: int, expected: set) -> dict:
+    s3 = LocalS3(root)
+    retrieval = _handler("retrieval", s3, dim)
+    manifest, _ = _handler("indexing", s3, dim).read_manifest_from_s3()
+    listed = Counter(doc for shard in manifest["shards"] for doc in shard["documents"])
+    missing_files = [
+        shard["id"] for shard in manifest["shards"]
+        if not os.path.exists(os.path.join(root, os.environ["S3_BUCKET_NAME"],
+                                           f"faiss-indexes/shards/{shard['id']}/index.faiss"))
+    ]
+    vectorstore = retrieval.load_faiss_index()
+    return {
+        "manifest_version": manifest["version"],
+        "live_shards": len(manifest["shards"]),
+        "lost_documents": len(expected - set(listed)),
+        "duplicated_documents": sum(1 for count in listed.values() if count > 1),
+        "shards_missing_files": len(missing_files),
+        "vectors_loaded": vectorstore.index.ntotal,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--documents", type=int, default=8, help="per writer")
+    parser.add_argument("--chunks", type=int, default=16)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    parser.add_argument("--s3-mb-per-second", type=float, default=200.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+    context = multiprocessing.get_context("fork")
+
+    numbers = list(range(1, args.writers * args.documents + 1))
+    expected = {f"doc{number}" for number in numbers}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for mode in _MODES:
+            root = os.path.join(tmpdir, mode)
+            conditional = mode != "unconditional"
+            writers = 1 if mode == "serialized" else args.writers
+            batches = [numbers[w::writers] for w in range(writers)]
+            stop = context.Event()
+            compactor = context.Process(target=_compactor, args=(root, conditional, args.dim, stop))
+            compactor.start()
+            start = time.perf_counter()
+            with context.Pool(writers) as pool:
+                outcomes = pool.starmap(
+                    _writer, [(args, root, conditional, w, batch) for w, batch in enumerate(batches)]
+                )
+            seconds = time.perf_counter() - start
+            stop.set()
+            compactor.join()
+            results[mode] = {
+                "writers": writers,
+                "seconds": seconds,
+                "documents_per_second": len(numbers) / seconds,
+                "conflict_retries": sum(o["conflicts"] for o in outcomes),
+                **_check(root, args.dim, expected),
+            }
+
+    print(json.dumps({
+        "documents": len(numbers),
+        "chunks_per_document": args.chunks,
+        "s3_latency": args.s3_latency,
+        "results": results,
+    }, indent=2))
+    cas = results["cas"]
+    if cas["lost_documents"] or cas["duplicated_documents"] or cas["shards_missing_files"]:
+        sys.exit("compare-and-swap manifest updates lost or duplicated documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark: per-document indexing cost, global index vs append-only shards
+
+Indexes ``--documents`` documents one after another through the indexing
+Lambda's storage path against ``LocalS3`` (with per-request latency and
+bandwidth), in two layouts:
+
+* ``global``  — the former flow: download ``index.faiss``/``index.pkl``,
+                ``merge_from`` the new vectors and upload everything again
+* ``sharded`` — ``handler.index_document``: upload the document's own shard
+                and rewrite the small manifest; ``compact_shards`` runs
+                every ``--compact-every`` documents, as the schedule would
+
+Parsing and embedding cost the same in both layouts and are skipped: each
+document is ``--chunks`` random vectors. Reports the per-document time
+over the first and last ``--window`` documents, compaction runs, and the
+retrieval Lambda's cold load of the sharded index before each compaction
+and at the end.
+
+Usage:
+    python benchmarks/bench_sharded_indexing.py [--documents 300 --chunks 64 --dim 1024]
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_LAMBDA_DIR = os.path.join(os.path.dirname(__file__), "..", "lambda")
+for _function in ("common", "indexing", "retrieval"):
+    sys.path.insert(0, os.path.abspath(os.path.join(_LAMBDA_DIR, _function)))
+os.environ.setdefault("S3_BUCKET_NAME", "bench-bucket")
+
+import numpy as np  # noqa: E402
+from langchain_community.vectorstores import FAISS  # noqa: E402
+
+from bench_index_loading import RandomEmbeddings  # noqa: E402
+from local_s3 import LocalS3  # noqa: E402
+
+
+def _load_handler(name: str):
+    """Import lambda/<name>/handler.py under a distinct module name."""
+    path = os.path.join(_LAMBDA_DIR, name, "handler.py")
+    spec = importlib.util.spec_from_file_location(f"{name}_handler", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _document(number: int, chunks: int, dim: int) -> FAISS:
+    rng = np.random.default_rng(number)
+    vectors = rng.standard_normal((chunks, dim), dtype=np.float32)
+    texts = [f"document {number} chunk {i} " + "policy text " * 40 for i in range(chunks)]
+    metadatas = [{"document_id": f"doc{number}", "page": i} for i in range(chunks)]
+    return FAISS.from_embeddings(zip(texts, vectors), RandomEmbeddings(dim), metadatas=metadatas)
+
+
+def _index_global(indexing, store: FAISS) -> None:
+    """The download-merge-upload flow the indexing Lambda used before shards."""
+    prefix = indexing.S3_FAISS_PREFIX
+    with tempfile.TemporaryDirectory() as tmpdir:
+        try:
+            indexing.download_from_s3(indexing.S3_BUCKET, f"{prefix}index.faiss", os.path.join(tmpdir, "index.faiss"))
+            indexing.download_from_s3(indexing.S3_BUCKET, f"{prefix}index.pkl", os.path.join(tmpdir, "index.pkl"))
+            existing = FAISS.load_local(tmpdir, store.embeddings, allow_dangerous_deserialization=True)
+            existing.merge_from(store)
+            store = existing
+        except Exception:
+            pass
+        store.save_local(tmpdir)
+        for name in ("index.faiss", "index.pkl"):
+            indexing.upload_to_s3(os.path.join(tmpdir, name), indexing.S3_BUCKET, f"{prefix}{name}")
+
+
+def _cold_load(retrieval) -> tuple:
+    retrieval._vectorstore_cache = None
+    retrieval._shard_cache.clear()
+    start = time.perf_counter()
+    vectorstore = retrieval.load_faiss_index()
+    return time.perf_counter() - start, vectorstore
+
+
+def _summary(seconds: list, window: int) -> dict:
+    return {
+        "first_docs_ms_p50": statistics.median(seconds[:window]) * 1000,
+        "last_docs_ms_p50": statistics.median(seconds[-window:]) * 1000,
+        "total_s": sum(seconds),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--chunks", type=int, default=64)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--compact-every", type=int, default=50)
+    parser.add_argument("--window", type=int, default=20)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    parser.add_argument("--s3-mb-per-second", type=float, default=200.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    indexing = _load_handler("indexing")
+    retrieval = _load_handler("retrieval")
+    logging.getLogger().setLevel(logging.WARNING)
+    indexing.get_embeddings = retrieval.get_embeddings = lambda: RandomEmbeddings(args.dim)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for layout in ("global", "sharded"):
+            s3 = LocalS3(os.path.join(tmpdir, layout), args.s3_latency, args.s3_mb_per_second)
+            indexing.s3_client = retrieval.s3_client = s3
+            seconds, compactions = [], []
+            for number in range(1, args.documents + 1):
+                store = _document(number, args.chunks, args.dim)
+                start = time.perf_counter()
+                if layout == "global":
+                    _index_global(indexing, store)
+                else:
+                    indexing.index_document(store, f"doc{number}")
+                seconds.append(time.perf_counter() - start)
+                if layout == "sharded" and number % args.compact_every == 0:
+                    cold_load_s = _cold_load(retrieval)[0]
+                    start = time.perf_counter()
+                    outcome = indexing.compact_shards()
+                    compactions.append({"after_document": number,
+                                        "seconds": time.perf_counter() - start,
+                                        "retrieval_cold_load_before_s": cold_load_s, **outcome})
+            results[layout] = {**_summary(seconds, args.window), "s3_requests": s3.requests,
+                               "s3_mb_transferred": s3.bytes_transferred / 1e6}
+            if layout == "sharded":
+                results[layout]["compactions"] = compactions
+                cold_load_s, vectorstore = _cold_load(retrieval)
+                results[layout]["retrieval_cold_load_s"] = cold_load_s
+                results[layout]["retrieval_vectors"] = vectorstore.index.ntotal
+
+    print(json.dumps({
+        "documents": args.documents,
+        "chunks_per_document": args.chunks,
+        "dim": args.dim,
+        "s3_latency": args.s3_latency,
+        "s3_mb_per_second": args.s3_mb_per_second,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Local S3 stand-in for offline benchmarks
+
+Implements the subset of the boto3 S3 client the Lambda handlers call
+(``download_file``, ``upload_file``, ``get_object``, ``put_object``,
+``head_object``, ``delete_object``, ``list_objects_v2``) over a local directory, one file per
+key, raising the same ``ClientError`` codes as S3 for missing keys.
+
+``put_object`` honours ``IfMatch`` / ``IfNoneMatch="*"`` like S3
+conditional writes, atomically across threads and processes (through a
+lock file), ``get_object`` honours ``Range="bytes=<first>-<last>"``, and
+objects carry MD5 ETags. With ``conditional_writes=False``
+the conditions are ignored, as a plain last-writer-wins overwrite.
+
+Optional per-request latency and transfer bandwidth make object size
+matter the way it does against real S3.
+"""
+
+import fcntl
+import hashlib
+import io
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+from botocore.exceptions import ClientError
+
+
+class LocalS3:
+    def __init__(
+        self,
+        root: str,
+        latency: float = 0.0,
+        mb_per_second: float | None = None,
+        conditional_writes: bool = True,
+    ):
+        self.root = root
+        self.latency = latency
+        self.mb_per_second = mb_per_second
+        self.conditional_writes = conditional_writes
+        self.requests = 0
+        self.bytes_transferred = 0
+        self.conflicts = 0
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, key)
+
+    def _transfer(self, size: int) -> None:
+        self.requests += 1
+        self.bytes_transferred += size
+        delay = self.latency + (size / 1e6 / self.mb_per_second if self.mb_per_second else 0.0)
+        if delay:
+            time.sleep(delay)
+
+    @staticmethod
+    def _missing(code: str, operation: str) -> ClientError:
+        return ClientError({"Error": {"Code": code, "Message": "Not Found"}}, operation)
+
+    @staticmethod
+    def _etag(body: bytes) -> str:
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def download_file(self, bucket: str, key: str, filename: str) -> None:
+        path = self._path(bucket, key)
+        if not os.path.exists(path):
+            self._transfer(0)
+            raise self._missing("404", "HeadObject")
+        self._transfer(os.path.getsize(path))
+        shutil.copyfile(path, filename)
+
+    def upload_file(self, filename: str, bucket: str, key: str) -> None:
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._transfer(os.path.getsize(filename))
+        shutil.copyfile(filename, path)
+
+    def get_object(self, Bucket: str, Key: str, Range: str | None = None, **kwargs) -> dict:
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            self._transfer(0)
+            raise self._missing("NoSuchKey", "GetObject")
+        with open(path, "rb") as fh:
+            body = fh.read()
+        etag = self._etag(body)
+        if Range:
+            start, _, end = Range[len("bytes="):].partition("-")
+            body = body[int(start):int(end) + 1]
+        self._transfer(len(body))
+        return {"Body": io.BytesIO(body), "ContentLength": len(body), "ETag": etag}
+
+    def put_object(
+        self, Bucket: str, Key: str, Body: bytes, IfMatch: str | None = None,
+        IfNoneMatch: str | None = None, **kwargs
+    ) -> dict:
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._transfer(len(Body))
+        staging = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(staging, "wb") as fh:
+            fh.write(Body)
+        with self._locked():
+            if self.conditional_writes and (IfMatch or IfNoneMatch):
+                current = None
+                if os.path.exists(path):
+                    with open(path, "rb") as fh:
+                        current = self._etag(fh.read())
+                if (IfNoneMatch == "*" and current is not None) or (IfMatch and IfMatch != current):
+                    os.remove(staging)
+                    self.conflicts += 1
+                    raise ClientError(
+                        {"Error": {"Code": "PreconditionFailed", "Message": "Precondition Failed"}},
+                        "PutObject",
+                    )
+            os.replace(staging, path)
+        return {"ETag": self._etag(Body)}
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        self._transfer(0)
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise self._missing("404", "HeadObject")
+        with open(path, "rb") as fh:
+            body = fh.read()
+        return {"ContentLength": len(body), "ETag": self._etag(body)}
+
+    def delete_object(self, Bucket: str, Key: str) -> dict:
+        self._transfer(0)
+        path = self._path(Bucket, Key)
+        if os.path.exists(path):
+            os.remove(path)
+        return {}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", **kwargs) -> dict:
+        self._transfer(0)
+        bucket_root = os.path.join(self.root, Bucket)
+        keys = []
+        for directory, _, files in os.walk(bucket_root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                key = os.path.relpath(os.path.join(directory, name), bucket_root).replace(os.sep, "/")
+                if key.startswith(Prefix):
+                    keys.append(key)
+        contents = [{"Key": key, "Size": os.path.getsize(self._path(Bucket, key))} for key in sorted(keys)]
+        return {"Contents": contents, "KeyCount": len(contents), "IsTruncated": False}
@@ -18,6 +18,9 @@ class Settings(BaseSettings):
     S3_BUCKET_NAME: str = os.getenv('S3_BUCKET_NAME', 'serverless-rag-vectors')
     S3_DOCUMENTS_PREFIX: str = os.getenv('S3_DOCUMENTS_PREFIX', 'documents/')
     
+    # Indexing queue (stack output IndexingQueueUrl); empty = invoke the Lambda
+    INDEXING_QUEUE_URL: str = os.getenv('INDEXING_QUEUE_URL', '')
+    
     # Cognito
     COGNITO_USER_POOL_ID: str = os.getenv('COGNITO_USER_POOL_ID', '')
     COGNITO_CLIENT_ID: str = os.getenv('COGNITO_CLIENT_ID', '')
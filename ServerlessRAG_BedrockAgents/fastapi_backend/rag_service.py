@@ -17,6 +17,7 @@ logger = logging.getLogger(__name__)
 s3_client = boto3.client('s3', region_name=settings.AWS_REGION)
 bedrock_agent_runtime = boto3.client('bedrock-agent-runtime', region_name=settings.AWS_REGION)
 lambda_client = boto3.client('lambda', region_name=settings.AWS_REGION)
+sqs_client = boto3.client('sqs', region_name=settings.AWS_REGION)
 
 
 class RAGService:
@@ -51,18 +52,23 @@ class RAGService:
             )
             logger.info(f"Uploaded document to S3: {s3_key}")
             
-            # Trigger indexing Lambda (async)
+            # Queue the document for batched indexing, or trigger the
+            # indexing Lambda (async)
             # Note: In production, get Lambda ARN from environment
+            indexing_event = json.dumps({
+                'document_key': s3_key,
+                'document_id': doc_id,
+                'user_id': user_id
+            })
             try:
-                lambda_client.invoke(
-                    FunctionName='serverless-rag-indexing',
-                    InvocationType='Event',
-                    Payload=json.dumps({
-                        'document_key': s3_key,
-                        'document_id': doc_id,
-                        'user_id': user_id
-                    })
-                )
+                if settings.INDEXING_QUEUE_URL:
+                    sqs_client.send_message(QueueUrl=settings.INDEXING_QUEUE_URL, MessageBody=indexing_event)
+                else:
+                    lambda_client.invoke(
+                        FunctionName='serverless-rag-indexing',
+                        InvocationType='Event',
+                        Payload=indexing_event
+                    )
                 logger.info(f"Triggered indexing for document: {doc_id}")
             except Exception as e:
                 logger.warning(f"Could not trigger indexing Lambda: {e}")
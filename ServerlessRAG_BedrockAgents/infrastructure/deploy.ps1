@@ -132,7 +132,8 @@ foreach ($lambda in $LAMBDA_DIRS) {
     $buildPath = Join-Path $lambdaRoot $dir
 
     Write-Host "`n  Building $dir..." -ForegroundColor White
-    docker build --provenance=false -t "$PROJECT_NAME-$repo" "$buildPath"
+    # Build from lambda\ so images can include the shared modules in common\
+    docker build --provenance=false -f (Join-Path $buildPath "Dockerfile") -t "$PROJECT_NAME-$repo" "$lambdaRoot"
     if ($LASTEXITCODE -ne 0) {
         Write-Host "ERROR: Docker build failed for $dir" -ForegroundColor Red
         exit 1
@@ -191,6 +192,18 @@ $INDEXING_LAMBDA_ARN = (aws cloudformation describe-stacks `
 
 Write-Host "[OK] Lambda functions deployed" -ForegroundColor Green
 
+# Shards written before the file docstore only have a pickled index.pkl,
+# which the retrieval Lambda refuses; convert them before it serves queries
+Write-Host "  Converting legacy shard docstores..." -ForegroundColor White
+$convertOut = Join-Path $env:TEMP "convert-docstores.json"
+aws lambda invoke `
+    --function-name "$PROJECT_NAME-indexing" `
+    --cli-binary-format raw-in-base64-out `
+    --payload '{\"action\": \"convert_docstores\"}' `
+    --region $AWS_REGION `
+    $convertOut | Out-Null
+Write-Host "[OK] Shard docstores converted: $(Get-Content $convertOut)" -ForegroundColor Green
+
 # ============================================================
 # Step 5: Deploy API Gateway
 # ============================================================
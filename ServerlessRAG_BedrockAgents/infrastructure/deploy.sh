@@ -82,11 +82,10 @@ for LAMBDA_DIR in indexing retrieval document_management; do
   IMAGE_URI="${AWS_ACCOUNT_ID}.dkr.ecr.${AWS_REGION}.amazonaws.com/${PROJECT_NAME}-${REPO_NAME}:latest"
   
   echo "Building $LAMBDA_DIR..."
-  cd $LAMBDA_DIR
-  docker build -t ${PROJECT_NAME}-${REPO_NAME} .
+  # Build from lambda/ so images can include the shared modules in common/
+  docker build -f $LAMBDA_DIR/Dockerfile -t ${PROJECT_NAME}-${REPO_NAME} .
   docker tag ${PROJECT_NAME}-${REPO_NAME}:latest $IMAGE_URI
   docker push $IMAGE_URI
-  cd ..
   
   echo "✓ Pushed $IMAGE_URI"
 done
@@ -126,8 +125,27 @@ DOCUMENT_MGMT_LAMBDA_ARN=$(aws cloudformation describe-stacks \
   --output text \
   --region $AWS_REGION)
 
+INDEXING_QUEUE_URL=$(aws cloudformation describe-stacks \
+  --stack-name ${PROJECT_NAME}-lambda \
+  --query 'Stacks[0].Outputs[?OutputKey==`IndexingQueueUrl`].OutputValue' \
+  --output text \
+  --region $AWS_REGION)
+
 echo "✓ Lambda functions deployed"
 
+# Shards written before the file docstore only have a pickled index.pkl,
+# which the retrieval Lambda refuses; convert them before it serves queries
+echo ""
+echo "Converting legacy shard docstores..."
+aws lambda invoke \
+  --function-name ${PROJECT_NAME}-indexing \
+  --cli-binary-format raw-in-base64-out \
+  --payload '{"action": "convert_docstores"}' \
+  --region $AWS_REGION \
+  /dev/stdout
+echo ""
+echo "✓ Shard docstores converted"
+
 # Step 5: Create Bedrock Agent (Manual step - provide instructions)
 echo ""
 echo "========================================="
@@ -170,6 +188,7 @@ echo "S3_BUCKET_NAME=$S3_BUCKET"
 echo "COGNITO_USER_POOL_ID=$USER_POOL_ID"
 echo "COGNITO_CLIENT_ID=$USER_POOL_CLIENT_ID"
 echo "COGNITO_REGION=$AWS_REGION"
+echo "INDEXING_QUEUE_URL=$INDEXING_QUEUE_URL"
 echo "# Add these after creating Bedrock Agent:"
 echo "# BEDROCK_AGENT_ID=<your-agent-id>"
 echo "# BEDROCK_AGENT_ALIAS_ID=<your-alias-id>"
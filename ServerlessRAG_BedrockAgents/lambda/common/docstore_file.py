@@ -0,0 +1,124 @@
+"""
+Docstore File — Offset-indexed chunk text and metadata, read on demand
+
+LangChain's ``save_local`` pickles the whole docstore into ``index.pkl``,
+so loading a shard unpickles the text and metadata of every chunk (with
+``allow_dangerous_deserialization``) although a query returns only *k*
+of them. Shards instead store their documents as two files next to
+``index.faiss``::
+
+    docstore.jsonl         one JSON record per vector position:
+                           {"id": ..., "text": ..., "metadata": {...}}
+    docstore.offsets.npy   int64 byte offsets of the records, plus the file end
+
+:class:`FileDocstore` memory-maps both and decodes a record only when
+it is looked up. Its keys are vector positions, so the store's
+``index_to_docstore_id`` is :class:`PositionIds` and costs nothing to
+load; the original docstore ids come back as ``Document.id``.
+
+Shards written before this format only have ``index.pkl``. Unpickling
+it runs whatever code the file names, so :func:`load_docstore` reads it
+only with ``allow_pickle`` and otherwise raises
+:class:`LegacyDocstoreError`; the indexing Lambda's ``convert_docstores``
+action writes the files above for those shards once.
+"""
+
+import json
+import mmap
+import os
+import pickle
+from collections.abc import Mapping
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+DOCSTORE_NAME = "docstore.jsonl"
+OFFSETS_NAME = "docstore.offsets.npy"
+DOCSTORE_FILES = (DOCSTORE_NAME, OFFSETS_NAME)
+LEGACY_DOCSTORE_NAME = "index.pkl"
+
+
+class LegacyDocstoreError(Exception):
+    """A shard has only a pickled docstore and pickles are not allowed."""
+
+
+def write_docstore(directory: str, docstore, index_to_docstore_id, count: int) -> None:
+    """Write the documents at vector positions ``0..count-1`` to *directory*."""
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    with open(os.path.join(directory, DOCSTORE_NAME), "wb") as fh:
+        for position in range(count):
+            doc_id = index_to_docstore_id[position]
+            doc = docstore.search(doc_id)
+            record = {"id": doc.id or str(doc_id), "text": doc.page_content, "metadata": doc.metadata}
+            fh.write(json.dumps(record, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+            offsets[position + 1] = fh.tell()
+    np.save(os.path.join(directory, OFFSETS_NAME), offsets)
+
+
+class PositionIds(Mapping):
+    """``index_to_docstore_id`` of a store keyed by vector position."""
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __getitem__(self, position: int) -> int:
+        position = int(position)
+        if not 0 <= position < self.count:
+            raise KeyError(position)
+        return position
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class FileDocstore(Docstore):
+    """Read-only docstore over the files written by :func:`write_docstore`."""
+
+    def __init__(self, directory: str):
+        self._offsets = np.load(os.path.join(directory, OFFSETS_NAME), mmap_mode="r")
+        with open(os.path.join(directory, DOCSTORE_NAME), "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            # mmap cannot map an empty file (a shard without documents)
+            self._data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def search(self, search) -> Document | str:
+        try:
+            position = int(search)
+        except (TypeError, ValueError):
+            return f"ID {search} not found."
+        if not 0 <= position < len(self):
+            return f"ID {search} not found."
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        record = json.loads(self._data[start:end])
+        return Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+
+    def add(self, texts: dict) -> None:
+        raise NotImplementedError("FileDocstore is read-only")
+
+    def delete(self, ids: list) -> None:
+        raise NotImplementedError("FileDocstore is read-only")
+
+
+def load_docstore(directory: str, allow_pickle: bool = False) -> tuple:
+    """Return ``(docstore, index_to_docstore_id)`` for the shard files in *directory*.
+
+    A shard written before the file docstore is unpickled from
+    ``index.pkl`` only if *allow_pickle* is set.
+    """
+    if os.path.exists(os.path.join(directory, DOCSTORE_NAME)):
+        docstore = FileDocstore(directory)
+        return docstore, PositionIds(len(docstore))
+    if not allow_pickle:
+        raise LegacyDocstoreError(
+            f"{directory} only has a pickled docstore; convert it (action convert_docstores) "
+            "or set DOCSTORE_ALLOW_PICKLE=true"
+        )
+    with open(os.path.join(directory, LEGACY_DOCSTORE_NAME), "rb") as fh:
+        return pickle.load(fh)
@@ -0,0 +1,367 @@
+"""
+Index Shards — Append-only sharded FAISS layout with a manifest
+
+Keeping one global index means every indexed document downloads, merges
+and re-uploads the whole corpus. Instead, each document is written once
+as its own immutable shard, and a small JSON manifest lists the shards
+that are live:
+
+    <prefix>manifest.json                    the live manifest, replaced by compare-and-swap
+    <prefix>manifests/<version>.json         immutable copy of every manifest version
+    <prefix>shards/<shard id>/index.faiss
+    <prefix>shards/<shard id>/docstore.jsonl         chunk text and metadata (see ``docstore_file``)
+    <prefix>shards/<shard id>/docstore.offsets.npy
+    <prefix>shards/<shard id>/vectors.npy    full-precision vectors, quantized shards only
+
+Manifest::
+
+    {
+        "version": 12,
+        "shards": [{"id": "...", "documents": ["doc123"], "vectors": 87, "created": "...",
+                    "chunks": [{"documents": ["doc123"], "ranges": [[0, 87]]}]},
+                   {"id": "...", "documents": ["doc1", "doc2"], "superseded": ["doc3"],
+                    "superseded_positions": [[40, 52]], ...}],
+        "retired": [{"id": "...", "retired": "..."}]
+    }
+
+Re-indexing a document retires the shards that hold nothing else. A
+shard that also holds other documents, such as a compacted one, stays
+live with the document moved to its ``superseded`` list: readers leave
+that document's chunks out of their results and the next compaction of
+the shard drops them. The positions of those chunks are worked out from
+the shard's ``chunks`` (which documents each range of positions stands
+for) when the document is superseded and stored as
+``superseded_positions``, so readers never scan a shard's docstore.
+
+Writers never overwrite each other's manifest: each update is
+conditional on the manifest it was computed from, and a writer that
+loses the race re-reads the manifest and applies its change again.
+
+Readers load every live shard and search them together through
+:class:`ShardedIndex` and :class:`ShardedDocstore`, and check the
+manifest again before each request, reloading only shards they have not
+loaded yet. Compaction merges small shards into one larger shard; the
+merged shards are retired rather than deleted, so readers that fetched
+an older manifest can still load and search them, and are removed after
+a grace period longer than any one request.
+
+The manifest functions here return updated copies; the handlers read
+and write the manifest itself.
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+
+from docstore_file import PositionIds
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_HISTORY_DIR = "manifests"
+SHARDS_DIR = "shards"
+# Entry of the single global index written before shards existed.
+LEGACY_SHARD = {"id": "legacy", "path": "", "documents": [], "vectors": 0}
+
+
+class CompactionConflict(Exception):
+    """The shards a compaction merged are no longer all live."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def empty_manifest() -> dict:
+    return {"version": 0, "shards": [], "retired": []}
+
+
+def new_shard_id(label: str) -> str:
+    """Return a unique shard id that sorts by creation time."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    return f"{stamp}-{label}-{uuid.uuid4().hex[:8]}"
+
+
+def snapshot_name(version: int) -> str:
+    """Return the history key of manifest *version*, relative to the index prefix."""
+    return f"{MANIFEST_HISTORY_DIR}/{version:012d}.json"
+
+
+def shard_path(shard: dict) -> str:
+    """Return the location of *shard*'s files relative to the index prefix."""
+    return shard.get("path", f"{SHARDS_DIR}/{shard['id']}/")
+
+
+def _retire(manifest: dict, shards: list) -> list:
+    stamp = _now()
+    return manifest.get("retired", []) + [{**shard, "retired": stamp} for shard in shards]
+
+
+def chunk_groups(vectorstore: FAISS) -> list:
+    """Return *vectorstore*'s positions grouped by the documents their chunks stand for.
+
+    Each group is ``{"documents": [...], "ranges": [[start, end], ...]}``
+    with a chunk's own ``document_id`` and those of the near duplicates it
+    is kept for. Stored as a shard's ``chunks`` in the manifest.
+    """
+    groups = {}
+    for position in range(vectorstore.index.ntotal):
+        metadata = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position]).metadata
+        documents = {metadata.get("document_id")}
+        documents.update(reference.get("document_id") for reference in metadata.get("duplicates", []))
+        ranges = groups.setdefault(tuple(sorted(documents, key=str)), [])
+        if ranges and ranges[-1][1] == position:
+            ranges[-1][1] = position + 1
+        else:
+            ranges.append([position, position + 1])
+    return [{"documents": list(documents), "ranges": ranges} for documents, ranges in groups.items()]
+
+
+def _supersede(shard: dict, documents: set) -> dict:
+    """Return *shard* with *documents* moved from ``documents`` to ``superseded``.
+
+    Shards that carry ``chunks`` also get the ``superseded_positions``
+    ranges of the chunks to leave out (see :func:`is_superseded`).
+    """
+    superseded = set(shard.get("superseded", [])) | documents
+    shard = {
+        **shard,
+        "documents": [doc_id for doc_id in shard["documents"] if doc_id not in documents],
+        "superseded": sorted(superseded),
+    }
+    if "chunks" in shard:
+        shard["superseded_positions"] = sorted(
+            span for group in shard["chunks"] if set(group["documents"]) <= superseded
+            for span in group["ranges"]
+        )
+    return shard
+
+
+def add_shard(manifest: dict, shard: dict) -> dict:
+    """Return *manifest* with *shard* live.
+
+    Shards holding only documents of *shard* (a re-indexed upload) are
+    retired in its favour; shards holding other documents as well keep
+    them, with the re-indexed ones superseded.
+    """
+    documents = set(shard["documents"])
+    replaced, shards = [], []
+    for live in manifest["shards"]:
+        overlap = documents & set(live.get("documents", []))
+        if not overlap:
+            shards.append(live)
+        elif set(live["documents"]) <= documents:
+            replaced.append(live)
+        else:
+            shards.append(_supersede(live, overlap))
+    return {
+        "version": manifest["version"] + 1,
+        "shards": shards + [{**shard, "created": _now()}],
+        "retired": _retire(manifest, replaced),
+    }
+
+
+def plan_compaction(manifest: dict, max_vectors: int, min_shards: int = 2) -> list:
+    """Return the shards to merge next, or ``[]`` if compaction is not due.
+
+    Takes the smallest shards below *max_vectors* while their total stays
+    within *max_vectors*; merging happens once at least *min_shards*
+    qualify. Shards then grow towards *max_vectors* and stay there.
+    """
+    small = sorted(
+        (s for s in manifest["shards"] if s["vectors"] < max_vectors),
+        key=lambda s: (s["vectors"], s["id"]),
+    )
+    chosen, total = [], 0
+    for shard in small:
+        if chosen and total + shard["vectors"] > max_vectors:
+            break
+        chosen.append(shard)
+        total += shard["vectors"]
+    return chosen if len(chosen) >= min_shards else []
+
+
+def apply_compaction(manifest: dict, merged: list, shard: dict) -> dict:
+    """Return *manifest* with the *merged* shards replaced by *shard*.
+
+    Shards added since *merged* was planned stay live, and documents they
+    superseded in *merged* meanwhile are superseded in *shard* too (or
+    *shard* is retired straight away if nothing else is left in it).
+    Raises :class:`CompactionConflict` if another compaction or re-index
+    has retired any of *merged* in the meantime.
+    """
+    merged_ids = {s["id"] for s in merged}
+    if not merged_ids <= {s["id"] for s in manifest["shards"]}:
+        raise CompactionConflict("Some merged shards are no longer live")
+    live = [s for s in manifest["shards"] if s["id"] not in merged_ids]
+    replaced = [s for s in manifest["shards"] if s["id"] in merged_ids]
+    superseded = {doc_id for s in replaced for doc_id in s.get("superseded", [])}
+    superseded -= {doc_id for s in merged for doc_id in s.get("superseded", [])}
+    shard = {**shard, "created": _now()}
+    if superseded & set(shard["documents"]):
+        shard = _supersede(shard, superseded & set(shard["documents"]))
+    if shard["documents"] or not shard.get("superseded"):
+        live.append(shard)
+    else:
+        replaced.append(shard)
+    return {
+        "version": manifest["version"] + 1,
+        "shards": live,
+        "retired": _retire(manifest, replaced),
+    }
+
+
+def expire_retired(manifest: dict, grace_seconds: float) -> tuple:
+    """Split off retired shards older than *grace_seconds*.
+
+    Returns ``(expired shards, manifest without them)``.
+    """
+    now = datetime.now(timezone.utc)
+    expired, kept = [], []
+    for shard in manifest.get("retired", []):
+        age = (now - datetime.fromisoformat(shard["retired"])).total_seconds()
+        (expired if age >= grace_seconds else kept).append(shard)
+    if not expired:
+        return [], manifest
+    return expired, {**manifest, "version": manifest["version"] + 1, "retired": kept}
+
+
+def is_superseded(metadata: dict, superseded: set) -> bool:
+    """True if a chunk belongs to a superseded document.
+
+    A chunk kept for near duplicates in other documents (see
+    ``near_duplicates``) stays while any of them is not superseded.
+    """
+    if metadata.get("document_id") not in superseded:
+        return False
+    return all(reference.get("document_id") in superseded for reference in metadata.get("duplicates", []))
+
+
+def superseded_positions(shard: dict, vectorstore: FAISS) -> np.ndarray:
+    """Return the positions of the loaded *shard*'s chunks of superseded documents.
+
+    They come from the shard's ``superseded_positions``; only shards listed
+    without ``chunks`` (written before those were recorded) are scanned.
+    """
+    superseded = set(shard.get("superseded", []))
+    if not superseded:
+        return np.empty(0, dtype=np.int64)
+    if "superseded_positions" in shard:
+        return np.array([
+            position for start, end in shard["superseded_positions"] for position in range(start, end)
+        ], dtype=np.int64)
+    return np.array([
+        position for position in range(vectorstore.index.ntotal)
+        if is_superseded(vectorstore.docstore.search(vectorstore.index_to_docstore_id[position]).metadata, superseded)
+    ], dtype=np.int64)
+
+
+class ShardedIndex:
+    """Read-only FAISS-style index searching several shard indexes as one.
+
+    Positions run through the shards in order, so a store's
+    ``index_to_docstore_id`` is the concatenation of the shards'. Each
+    search asks every shard for its top *k* and keeps the overall *k*
+    smallest L2 distances. *excluded* optionally gives, per shard, the
+    positions (within it) never to return, such as chunks of superseded
+    documents; those shards are asked for that many more candidates.
+    ``reconstruct`` returns a shard's exact vectors where it has them (see
+    ``ExactRerankIndex``).
+    """
+
+    def __init__(self, shards: list, excluded: list = None):
+        self.shards = shards
+        self.excluded = excluded or [np.empty(0, dtype=np.int64)] * len(shards)
+        self.offsets = np.cumsum([0] + [shard.ntotal for shard in shards])
+        self.ntotal = int(self.offsets[-1])
+        self.d = shards[0].d
+        self.metric_type = shards[0].metric_type
+
+    def search(self, queries: np.ndarray, k: int):
+        queries = np.asarray(queries, dtype=np.float32)
+        distances, labels = [], []
+        for offset, shard, excluded in zip(self.offsets, self.shards, self.excluded):
+            if not shard.ntotal:
+                continue
+            shard_distances, shard_labels = shard.search(queries, min(k + len(excluded), shard.ntotal))
+            if len(excluded):
+                shard_labels = np.where(np.isin(shard_labels, excluded), -1, shard_labels)
+            distances.append(np.where(shard_labels >= 0, shard_distances, np.inf))
+            labels.append(np.where(shard_labels >= 0, shard_labels + offset, -1))
+        if not labels:
+            return (np.full((len(queries), k), np.inf, dtype=np.float32),
+                    np.full((len(queries), k), -1, dtype=np.int64))
+        distances, labels = np.hstack(distances), np.hstack(labels)
+        best = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        distances = np.take_along_axis(distances, best, axis=1)
+        labels = np.take_along_axis(labels, best, axis=1)
+        if labels.shape[1] < k:
+            pad = k - labels.shape[1]
+            distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+            labels = np.pad(labels, ((0, 0), (0, pad)), constant_values=-1)
+        return distances.astype(np.float32), labels
+
+    def _shard_vectors(self, shard, start: int, count: int) -> np.ndarray:
+        exact_vectors = getattr(shard, "exact_vectors", None)
+        if exact_vectors is not None:
+            return np.asarray(exact_vectors[start:start + count], dtype=np.float32)
+        return shard.reconstruct_n(start, count)
+
+    def reconstruct(self, position: int) -> np.ndarray:
+        number = int(np.searchsorted(self.offsets, position, side="right")) - 1
+        return self._shard_vectors(self.shards[number], position - int(self.offsets[number]), 1)[0]
+
+    def reconstruct_n(self, start: int, count: int) -> np.ndarray:
+        end = start + count
+        parts = []
+        for number, shard in enumerate(self.shards):
+            low, high = max(start, int(self.offsets[number])), min(end, int(self.offsets[number + 1]))
+            if low < high:
+                parts.append(self._shard_vectors(shard, low - int(self.offsets[number]), high - low))
+        return np.vstack(parts) if parts else np.empty((0, self.d), dtype=np.float32)
+
+
+class ShardedDocstore(Docstore):
+    """Read-only docstore keyed by position across several shard stores.
+
+    Positions run through the shards in the same order as
+    :class:`ShardedIndex`; each lookup is passed on to the owning shard's
+    docstore, so nothing is read up front.
+    """
+
+    def __init__(self, stores: list):
+        self.stores = stores
+        self.offsets = np.cumsum([0] + [store.index.ntotal for store in stores])
+
+    def search(self, search):
+        position = int(search)
+        number = int(np.searchsorted(self.offsets, position, side="right")) - 1
+        if not 0 <= number < len(self.stores):
+            return f"ID {search} not found."
+        store = self.stores[number]
+        return store.docstore.search(store.index_to_docstore_id[position - int(self.offsets[number])])
+
+    def add(self, texts: dict) -> None:
+        raise NotImplementedError("ShardedDocstore is read-only")
+
+    def delete(self, ids: list) -> None:
+        raise NotImplementedError("ShardedDocstore is read-only")
+
+
+def combine_shards(stores: list, embeddings, excluded: list = None) -> FAISS:
+    """Return one LangChain FAISS store over the shard *stores*.
+
+    A single shard with nothing *excluded* (see :class:`ShardedIndex`) is
+    returned unchanged. The combined store is keyed by position and looks
+    documents up in their shard on demand.
+    """
+    if len(stores) == 1 and not (excluded and len(excluded[0])):
+        return stores[0]
+    docstore = ShardedDocstore(stores)
+    return FAISS(
+        embeddings,
+        ShardedIndex([store.index for store in stores], excluded),
+        docstore,
+        PositionIds(int(docstore.offsets[-1])),
+    )
@@ -0,0 +1,117 @@
+"""
+Shared Index — Memory-mapped FAISS shards on a shared filesystem
+
+Loading an index from S3 downloads ``index.faiss`` in every execution
+environment and reads it onto the heap, so cold starts and memory grow
+with the index. When the indexing Lambda also publishes the index to a
+filesystem every environment mounts (EFS), readers open it memory-mapped
+instead: the vectors stay in the file and only the pages a search
+touches are read, through the shared page cache.
+
+The shared root mirrors the S3 index prefix (see ``index_shards``)::
+
+    manifest.json                         replaced atomically
+    shards/<shard id>/index.faiss
+    shards/<shard id>/docstore.jsonl      see ``docstore_file``
+    shards/<shard id>/docstore.offsets.npy
+    shards/<shard id>/vectors.npy         full-precision vectors, quantized shards only
+
+A shard directory is complete before it appears under its final name and
+is never modified afterwards; the manifest is written after its shards,
+and only ever replaced by a newer version (EFS supports the file lock
+this relies on).
+
+Mapped indexes are read-only: adding vectors to one aborts the process
+inside FAISS, so only search, reconstruct and direct-map calls are safe.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+from docstore_file import DOCSTORE_FILES, LEGACY_DOCSTORE_NAME, load_docstore
+from index_shards import MANIFEST_NAME, shard_path
+
+logger = logging.getLogger(__name__)
+
+# index.pkl: the pickled docstore of shards written before docstore_file
+INDEX_FILES = ("index.faiss", *DOCSTORE_FILES, "vectors.npy", LEGACY_DOCSTORE_NAME)
+
+# IO_FLAG_MMAP_IFC (faiss >= 1.10) maps the codes of flat, HNSW and IVF
+# indexes in place; older releases only map IVF inverted lists.
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def read_manifest(root: str) -> dict | None:
+    """Return the manifest published under *root*, if any."""
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(root: str, manifest: dict) -> bool:
+    """Replace the manifest under *root* in one atomic rename.
+
+    Writers hold a lock on the root and never replace a newer version, so
+    concurrent publishers cannot move the shared copy backwards. Returns
+    whether *manifest* was written.
+    """
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".manifest.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        current = read_manifest(root)
+        if current is not None and current["version"] >= manifest["version"]:
+            return False
+        staging = os.path.join(root, f".{MANIFEST_NAME}.{uuid.uuid4().hex[:8]}")
+        with open(staging, "w") as fh:
+            json.dump(manifest, fh)
+        os.replace(staging, os.path.join(root, MANIFEST_NAME))
+    return True
+
+
+def shard_dir(root: str, shard: dict) -> str:
+    return os.path.join(root, shard_path(shard))
+
+
+def publish_shard(source_dir: str, root: str, shard: dict) -> str:
+    """Copy the index files in *source_dir* to *shard*'s directory under *root*."""
+    target = os.path.normpath(shard_dir(root, shard))
+    staging = f"{target}.{uuid.uuid4().hex[:8]}.tmp"
+    os.makedirs(staging)
+    for name in INDEX_FILES:
+        source = os.path.join(source_dir, name)
+        if os.path.exists(source):
+            shutil.copyfile(source, os.path.join(staging, name))
+    os.rename(staging, target)
+    logger.info("Published FAISS shard %s to %s", shard["id"], root)
+    return target
+
+
+def remove_shard(root: str, shard: dict) -> None:
+    directory = shard_dir(root, shard)
+    if os.path.normpath(directory) == os.path.normpath(root):
+        return  # the legacy global index is never published here
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def read_index_mmap(path: str):
+    """Open the FAISS index file at *path* memory-mapped and read-only."""
+    return faiss.read_index(path, MMAP_FLAGS)
+
+
+def load_vectorstore(directory: str, embeddings, allow_pickle: bool = False) -> FAISS:
+    """Load a LangChain FAISS store from *directory* with a memory-mapped index.
+
+    The documents are mapped as well and read when a search returns them
+    (see ``load_docstore`` for *allow_pickle*).
+    """
+    index = read_index_mmap(os.path.join(directory, "index.faiss"))
+    return FAISS(embeddings, index, *load_docstore(directory, allow_pickle))
@@ -19,11 +19,15 @@ logger.setLevel(logging.INFO)
 # AWS clients
 s3_client = boto3.client('s3')
 lambda_client = boto3.client('lambda')
+sqs_client = boto3.client('sqs')
 
 # Environment variables
 S3_BUCKET = os.environ['S3_BUCKET_NAME']
 S3_DOCUMENTS_PREFIX = os.environ.get('S3_DOCUMENTS_PREFIX', 'documents/')
 INDEXING_LAMBDA_ARN = os.environ.get('INDEXING_LAMBDA_ARN', '')
+# Queue the indexing Lambda reads in batches; preferred over invoking it
+# once per document when set
+INDEXING_QUEUE_URL = os.environ.get('INDEXING_QUEUE_URL', '')
 
 
 def list_documents(user_id: str = None) -> list:
@@ -143,16 +147,21 @@ def upload_document(filename: str, content_base64: str, user_id: str) -> Dict[st
         )
         logger.info(f"Uploaded to S3: {s3_key}")
 
-        # Trigger indexing Lambda asynchronously
-        if INDEXING_LAMBDA_ARN:
+        # Queue the document for batched indexing, or trigger the indexing
+        # Lambda asynchronously
+        indexing_event = json.dumps({
+            'document_key': s3_key,
+            'document_id': doc_id,
+            'user_id': user_id
+        })
+        if INDEXING_QUEUE_URL:
+            sqs_client.send_message(QueueUrl=INDEXING_QUEUE_URL, MessageBody=indexing_event)
+            logger.info(f"Queued {doc_id} for indexing")
+        elif INDEXING_LAMBDA_ARN:
             lambda_client.invoke(
                 FunctionName=INDEXING_LAMBDA_ARN,
                 InvocationType='Event',
-                Payload=json.dumps({
-                    'document_key': s3_key,
-                    'document_id': doc_id,
-                    'user_id': user_id
-                })
+                Payload=indexing_event
             )
             logger.info(f"Triggered indexing Lambda for {doc_id}")
 
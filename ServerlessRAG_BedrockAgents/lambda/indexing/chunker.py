@@ -0,0 +1,202 @@
+"""
+Chunker — Single-pass, token-sized text splitting
+
+``RecursiveCharacterTextSplitter`` sizes chunks in characters and
+re-splits oversized pieces once per separator level ("\\n\\n", "\\n",
+" ", ""), re-scanning the text each time and locating every chunk again
+with ``str.find`` to report its offset. This module classifies every
+character of a text once, as NumPy arrays, derives the tokens and the
+strongest separator in front of each (paragraph break, line break,
+space or none), and then picks chunk boundaries from precomputed
+arrays, so each chunk costs a few array lookups.
+
+Chunks hold at most ``chunk_size`` tokens and end at the strongest
+separator that fits, like the recursive splitter: a paragraph break if
+one falls inside the window, else a line break, else a space, else in
+the middle of a long word. Consecutive chunks share up to
+``chunk_overlap`` tokens, starting on a word boundary. Output is a pure
+function of the input, and every chunk records its character offset in
+the source text as ``start_index``.
+
+Bedrock has no local tokenizer, so tokens are approximated as pieces of
+up to six letters, up to three digits, or single punctuation marks:
+common words count as one token and long words, numbers and symbols as
+several, as they do for BPE tokenizers.
+"""
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Character classes; a token is a run of one word class, cut into pieces
+# of at most _PIECE_LENGTH[class] characters.
+_SPACE_CHAR, _NEWLINE, _LETTER, _DIGIT, _SYMBOL = 0, 1, 2, 3, 4
+_PIECE_LENGTH = np.array([1, 1, 6, 3, 1], dtype=np.int64)
+
+# Separator strength in front of a token.
+_NONE, _SPACE, _LINE, _PARAGRAPH = 0, 1, 2, 3
+_BREAKS = [bytes([level]) for level in (_PARAGRAPH, _LINE, _SPACE)]
+_JOINER = "\n\n"
+# Level by 2 * min(newlines in the gap, 2) + (gap is not empty).
+_LEVELS = np.array([_NONE, _SPACE, _LINE, _LINE, _PARAGRAPH, _PARAGRAPH], dtype=np.int8)
+
+
+def _char_class(char: str) -> int:
+    if char == "\n":
+        return _NEWLINE
+    if char.isspace():
+        return _SPACE_CHAR
+    if char.isdecimal():
+        return _DIGIT
+    if char.isalnum():
+        return _LETTER
+    return _SYMBOL
+
+
+def _codepoints(text: str) -> np.ndarray:
+    if text.isascii():
+        return np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    return np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+
+
+_ASCII_CLASSES = np.array([_char_class(chr(c)) for c in range(128)], dtype=np.int8)
+_bmp_classes = None
+
+
+def _classify(codepoints: np.ndarray) -> np.ndarray:
+    """Return the character class of every codepoint."""
+    global _bmp_classes
+    if codepoints.dtype == np.uint8:
+        return _ASCII_CLASSES.take(codepoints)
+    if _bmp_classes is None:
+        _bmp_classes = np.array([_char_class(chr(c)) for c in range(0x10000)], dtype=np.int8)
+    classes = _bmp_classes.take(codepoints, mode="clip")
+    for position in np.flatnonzero(codepoints > 0xFFFF):
+        classes[position] = _char_class(chr(codepoints[position]))
+    return classes
+
+
+def _word_runs(classes: np.ndarray) -> tuple:
+    """Split *classes* into runs; return the word runs and the newlines before each.
+
+    Returns start offsets, end offsets and classes of the runs of
+    non-space characters, the number of newlines in the whitespace before
+    each, and whether any whitespace precedes it at all.
+    """
+    size = len(classes)
+    boundaries = np.flatnonzero(classes[1:] != classes[:-1]) + 1
+    run_starts = np.concatenate(([0], boundaries))
+    run_ends = np.append(boundaries, size)
+    run_classes = classes[run_starts]
+    newlines = np.cumsum(np.where(run_classes == _NEWLINE, run_ends - run_starts, 0))
+    words = np.flatnonzero(run_classes >= _LETTER)
+    newlines_before = np.diff(newlines[words], prepend=0)
+    spaced = np.diff(words, prepend=-1) > 1
+    return run_starts[words], run_ends[words], run_classes[words], newlines_before, spaced
+
+
+def _tokenize(text: str) -> tuple:
+    """Return token start offsets, end offsets and separator levels."""
+    codepoints = _codepoints(text)
+    if not len(codepoints):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    starts, ends, classes, newlines_before, spaced = _word_runs(_classify(codepoints))
+    levels = _LEVELS.take(np.minimum(newlines_before, 2) * 2 + spaced)
+    if len(levels):
+        levels[0] = _PARAGRAPH
+    piece = _PIECE_LENGTH[classes]
+    pieces = (ends - starts + piece - 1) // piece
+    if not len(pieces) or pieces.max() == 1:
+        return starts, ends, levels
+    # Cut long runs into pieces; only the first piece follows the separator.
+    run = np.repeat(np.arange(len(pieces)), pieces)
+    first_piece = np.cumsum(pieces) - pieces
+    within = np.arange(len(run)) - first_piece[run]
+    piece_starts = starts[run] + within * piece[run]
+    piece_levels = np.zeros(len(run), dtype=np.int8)
+    piece_levels[first_piece] = levels
+    return piece_starts, np.minimum(piece_starts + piece[run], ends[run]), piece_levels
+
+
+def count_tokens(text: str) -> int:
+    """Return the number of chunker tokens in *text*."""
+    if not text:
+        return 0
+    starts, ends, classes, _, _ = _word_runs(_classify(_codepoints(text)))
+    piece = _PIECE_LENGTH[classes]
+    return int(((ends - starts + piece - 1) // piece).sum())
+
+
+class TokenChunker:
+    """Split text into chunks of at most *chunk_size* tokens.
+
+    Drop-in for the ``split_text`` / ``split_documents`` methods of
+    LangChain text splitters used by the ingestion pipeline.
+    """
+
+    def __init__(self, chunk_size: int = 256, chunk_overlap: int = 48):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size})"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def _chunk_tokens(self, levels: bytes, first: int, total: int) -> list:
+        """Return ``(first, end)`` token ranges of the chunks of tokens ``first:total``."""
+        chunks = []
+        previous_cut = first
+        while first < total:
+            limit = first + self.chunk_size
+            if limit >= total:
+                chunks.append((first, total))
+                break
+            # End before the strongest separator in the window, as late as possible.
+            cut = limit
+            for level in _BREAKS:
+                candidate = levels.rfind(level, previous_cut + 1, limit + 1)
+                if candidate != -1:
+                    cut = candidate
+                    break
+            chunks.append((first, cut))
+            # Start the overlap on the first word boundary it contains.
+            following = max(cut - self.chunk_overlap, first + 1)
+            word_starts = [levels.find(level, following, cut) for level in _BREAKS]
+            first = min([p for p in word_starts if p != -1], default=cut)
+            previous_cut = cut
+        return chunks
+
+    def split_spans(self, text: str) -> list:
+        """Return ``(start, end)`` character offsets of the chunks of *text*."""
+        starts, ends, levels = _tokenize(text)
+        return [
+            (int(starts[first]), int(ends[last - 1]))
+            for first, last in self._chunk_tokens(levels.tobytes(), 0, len(starts))
+        ]
+
+    def split_text(self, text: str) -> list:
+        """Split *text* into chunk strings."""
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_documents(self, documents) -> list:
+        """Split each document, copying its metadata and adding ``start_index``.
+
+        All documents are tokenized together in one pass (joined by a
+        paragraph break, which no chunk crosses) to amortize the per-call
+        cost over many small pages.
+        """
+        documents = list(documents)
+        texts = [document.page_content for document in documents]
+        offsets = np.cumsum([0] + [len(text) + len(_JOINER) for text in texts])
+        starts, ends, levels = _tokenize(_JOINER.join(texts))
+        token_bounds = np.searchsorted(starts, offsets).tolist()
+        levels = levels.tobytes()
+        chunks = []
+        for position, document in enumerate(documents):
+            text, offset = texts[position], int(offsets[position])
+            spans = self._chunk_tokens(levels, token_bounds[position], token_bounds[position + 1])
+            for first, last in spans:
+                start, end = int(starts[first]) - offset, int(ends[last - 1]) - offset
+                metadata = {**document.metadata, "start_index": start}
+                chunks.append(Document(page_content=text[start:end], metadata=metadata))
+        return chunks
@@ -0,0 +1,392 @@
+"""
+Embedding Cache — Persistent chunk embeddings keyed by content hash (indexing Lambda)
+
+Re-uploaded PDFs, new revisions of a document and boilerplate pages
+(headers, disclaimers) produce chunks whose text has been embedded
+before. This cache keeps every chunk vector under the SHA-256 of the
+model id and the chunk's normalized text (NFC, whitespace collapsed), so
+those chunks skip the Bedrock call.
+
+Entries live in append-only segments under one prefix per model, in S3
+or a local directory (e.g. the EFS mount)::
+
+    <prefix><model>/segments/<segment id>.keys    32-byte digests, one per entry
+    <prefix><model>/segments/<segment id>.npy     float32 vectors, same order
+    <prefix><model>/touched/<segment id>.keys     digests of the cache hits of one run
+
+Each indexing run reads the key files, reads just the rows it hits from
+the vector files (ranged GETs in S3, memory-mapped in a directory; row
+*i* starts ``i * dim * 4`` bytes after the ``.npy`` header), and writes
+the texts it embedded as new segments plus a touched record of its hits.
+:meth:`EmbeddingCache.compact` merges everything into segments of at
+most ``segment_bytes`` of vectors, dropping duplicates and, beyond
+``max_entries``, the entries least recently written or hit; it holds
+one output segment in memory at a time.
+
+Segments are immutable, so their keys are kept in memory between
+invocations; the segment listing is read once per invocation (see
+:meth:`EmbeddingCache.refresh`). Nothing here needs to be consistent: an entry lost to a
+concurrent compaction is embedded again, and duplicates from concurrent
+writers are merged by the next compaction.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import unicodedata
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_DIGEST_SIZE = 32
+_SEGMENTS = "segments"
+_TOUCHED = "touched"
+# Enough for any .npy header np.save writes for a 2-D float32 array
+_HEADER_BYTES = 4096
+# Above this many separate row runs, one segment download beats ranged GETs
+_MAX_RANGES = 16
+
+
+def normalize_text(text: str) -> str:
+    """Return *text* in the form its cache key is computed from."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_id: str, text: str) -> bytes:
+    """Return the 32-byte cache key of *text* embedded by *model_id*."""
+    return hashlib.sha256(f"{model_id}\n{normalize_text(text)}".encode("utf-8")).digest()
+
+
+def _segment_id() -> str:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    return f"{stamp}-{uuid.uuid4().hex[:8]}"
+
+
+def _pack_keys(keys: list) -> bytes:
+    return b"".join(keys)
+
+
+def _unpack_keys(data: bytes) -> list:
+    return [data[i:i + _DIGEST_SIZE] for i in range(0, len(data), _DIGEST_SIZE)]
+
+
+def _pack_vectors(vectors: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(vectors, dtype=np.float32))
+    return buffer.getvalue()
+
+
+def _read_header(data: bytes) -> tuple:
+    """Return ``(data offset, shape)`` of the ``.npy`` file starting with *data*."""
+    buffer = io.BytesIO(data)
+    version = np.lib.format.read_magic(buffer)
+    if version == (1, 0):
+        shape, _, dtype = np.lib.format.read_array_header_1_0(buffer)
+    else:
+        shape, _, dtype = np.lib.format.read_array_header_2_0(buffer)
+    if dtype != np.float32 or len(shape) != 2:
+        raise ValueError(f"Unexpected embedding cache segment {dtype} {shape}")
+    return buffer.tell(), shape
+
+
+def _row_runs(rows: list) -> list:
+    """Group sorted *rows* into ``(first, count)`` runs of consecutive rows."""
+    runs = []
+    for row in rows:
+        if runs and runs[-1][0] + runs[-1][1] == row:
+            runs[-1][1] += 1
+        else:
+            runs.append([row, 1])
+    return runs
+
+
+class S3Store:
+    """Cache objects under *prefix* in an S3 bucket."""
+
+    def __init__(self, s3_client, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def list(self, folder: str) -> list:
+        names, token = [], None
+        while True:
+            kwargs = {"Bucket": self.bucket, "Prefix": f"{self.prefix}{folder}/"}
+            if token:
+                kwargs["ContinuationToken"] = token
+            response = self.s3_client.list_objects_v2(**kwargs)
+            names += [item["Key"][len(self.prefix):] for item in response.get("Contents", [])]
+            if not response.get("IsTruncated"):
+                return sorted(names)
+            token = response["NextContinuationToken"]
+
+    def get(self, name: str) -> bytes:
+        return self.s3_client.get_object(Bucket=self.bucket, Key=f"{self.prefix}{name}")["Body"].read()
+
+    def get_range(self, name: str, start: int, length: int) -> bytes:
+        response = self.s3_client.get_object(
+            Bucket=self.bucket, Key=f"{self.prefix}{name}", Range=f"bytes={start}-{start + length - 1}"
+        )
+        return response["Body"].read()
+
+    def put(self, name: str, data: bytes) -> None:
+        self.s3_client.put_object(Bucket=self.bucket, Key=f"{self.prefix}{name}", Body=data)
+
+    def delete(self, name: str) -> None:
+        self.s3_client.delete_object(Bucket=self.bucket, Key=f"{self.prefix}{name}")
+
+
+class DirectoryStore:
+    """Cache files under a local or shared directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def list(self, folder: str) -> list:
+        try:
+            files = os.listdir(os.path.join(self.root, folder))
+        except FileNotFoundError:
+            return []
+        return sorted(f"{folder}/{name}" for name in files if not name.startswith("."))
+
+    def get(self, name: str) -> bytes:
+        with open(os.path.join(self.root, name), "rb") as fh:
+            return fh.read()
+
+    def get_range(self, name: str, start: int, length: int) -> bytes:
+        with open(os.path.join(self.root, name), "rb") as fh:
+            fh.seek(start)
+            return fh.read(length)
+
+    def read_rows(self, name: str, rows: list) -> np.ndarray:
+        return np.asarray(np.load(os.path.join(self.root, name), mmap_mode="r")[rows], dtype=np.float32)
+
+    def put(self, name: str, data: bytes) -> None:
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        staging = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex[:8]}.tmp")
+        with open(staging, "wb") as fh:
+            fh.write(data)
+        os.replace(staging, path)
+
+    def delete(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.root, name))
+        except FileNotFoundError:
+            pass
+
+
+class EmbeddingCache:
+    """Look up and store chunk vectors for one embedding model in *store*.
+
+    ``stats`` is updated after every :meth:`embed` call with the chunk
+    count, cache hits, Bedrock calls made and saved, and the hit ratio.
+    A *max_entries* of zero or less keeps every entry on compaction.
+    """
+
+    def __init__(self, store, model_id: str, max_entries: int = 200_000, segment_bytes: int = 16 << 20):
+        self.store = store
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.segment_bytes = max(1, segment_bytes)
+        self.stats = {}
+        self._keys = {}  # segment name -> list of keys; segments never change
+        self._headers = {}  # vectors name -> (data offset, shape)
+        self._located = None  # key -> (vectors name, row), until refresh()
+
+    def _segment_keys(self, name: str) -> list:
+        if name not in self._keys:
+            self._keys[name] = _unpack_keys(self.store.get(name))
+        return self._keys[name]
+
+    def _header(self, name: str) -> tuple:
+        if name not in self._headers:
+            self._headers[name] = _read_header(self.store.get_range(name, 0, _HEADER_BYTES))
+        return self._headers[name]
+
+    def read_rows(self, name: str, rows: list) -> np.ndarray:
+        """Return rows *rows* (sorted) of segment vectors *name* without reading the rest."""
+        if hasattr(self.store, "read_rows"):
+            return self.store.read_rows(name, rows)
+        runs = _row_runs(rows)
+        if len(runs) > _MAX_RANGES:
+            return np.load(io.BytesIO(self.store.get(name)))[rows]
+        offset, (_, dim) = self._header(name)
+        row_bytes = dim * 4
+        parts = [
+            np.frombuffer(self.store.get_range(name, offset + first * row_bytes, count * row_bytes), dtype=np.float32)
+            for first, count in runs
+        ]
+        return np.concatenate(parts).reshape(len(rows), dim)
+
+    def refresh(self) -> None:
+        """Forget the segment listing, so the next lookup sees segments written by others."""
+        self._located = None
+
+    def _index(self) -> dict:
+        """Map every cached key to ``(segment vectors name, row)``, newest segment winning.
+
+        Built from one listing of the segments and then kept up to date with
+        the segments this cache writes, until :meth:`refresh`.
+        """
+        if self._located is not None:
+            return self._located
+        located = {}
+        names = [name for name in self.store.list(_SEGMENTS) if name.endswith(".keys")]
+        self._keys = {name: keys for name, keys in self._keys.items() if name in names}
+        self._headers = {
+            name: header for name, header in self._headers.items() if f"{name[:-len('.npy')]}.keys" in names
+        }
+        for name in names:
+            try:
+                keys = self._segment_keys(name)
+            except Exception as e:
+                logger.warning("Skipping embedding cache segment %s: %s", name, e)
+                continue
+            vectors_name = f"{name[:-len('.keys')]}.npy"
+            for row, key in enumerate(keys):
+                located[key] = (vectors_name, row)
+        self._located = located
+        return located
+
+    def lookup(self, keys: list) -> dict:
+        """Return the cached vectors of those *keys* that are cached, by key."""
+        return self._read(keys, self._index())
+
+    def _read(self, keys: list, located: dict) -> dict:
+        """Read the vectors of *keys* at their *located* rows, a segment at a time."""
+        rows_by_segment = {}
+        for key in set(keys):
+            if key in located:
+                name, row = located[key]
+                rows_by_segment.setdefault(name, []).append((key, row))
+        found = {}
+        for name, rows in rows_by_segment.items():
+            rows.sort(key=lambda item: item[1])
+            try:
+                vectors = self.read_rows(name, [row for _, row in rows])
+            except Exception as e:
+                logger.warning("Embedding cache segment %s unavailable: %s", name, e)
+                continue
+            for (key, _), vector in zip(rows, vectors):
+                found[key] = vector
+        return found
+
+    def _segment_rows(self, dim: int) -> int:
+        return max(1, self.segment_bytes // (max(1, dim) * 4))
+
+    def write_segment(self, keys: list, vectors: np.ndarray, touched: list = ()) -> None:
+        """Store *vectors* under *keys* as segments of at most ``segment_bytes`` and record *touched* keys as used."""
+        if keys:
+            step = self._segment_rows(vectors.shape[1])
+            for start in range(0, len(keys), step):
+                segment = _segment_id()
+                self.store.put(f"{_SEGMENTS}/{segment}.npy", _pack_vectors(vectors[start:start + step]))
+                self.store.put(f"{_SEGMENTS}/{segment}.keys", _pack_keys(keys[start:start + step]))
+                if self._located is not None:
+                    self._keys[f"{_SEGMENTS}/{segment}.keys"] = keys[start:start + step]
+                    for row, key in enumerate(keys[start:start + step]):
+                        self._located[key] = (f"{_SEGMENTS}/{segment}.npy", row)
+        if touched:
+            self.store.put(f"{_TOUCHED}/{_segment_id()}.keys", _pack_keys(touched))
+
+    def embed(self, texts: list, embed_fn) -> np.ndarray:
+        """Return the vectors of *texts*, calling ``embed_fn(texts)`` only for uncached ones.
+
+        Texts that normalize to the same key are embedded once.
+        """
+        keys = [cache_key(self.model_id, text) for text in texts]
+        try:
+            found = self.lookup(keys)
+        except Exception as e:
+            logger.warning("Embedding cache unavailable, embedding every chunk: %s", e)
+            found = {}
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            new_vectors = embed_fn(list(missing.values()))
+            found.update(zip(missing, new_vectors))
+        try:
+            self.write_segment(
+                list(missing),
+                np.asarray([found[key] for key in missing], dtype=np.float32),
+                touched=[key for key in set(keys) if key not in missing],
+            )
+        except Exception as e:
+            logger.warning("Could not write embedding cache segment: %s", e)
+
+        hits = sum(1 for key in keys if key not in missing)
+        self.stats = {
+            "chunks": len(texts),
+            "hits": hits,
+            "embedded": len(missing),
+            "saved_calls": len(texts) - len(missing),
+            "hit_ratio": hits / len(texts) if texts else 0.0,
+        }
+        logger.info(
+            "Embedding cache: %d of %d chunk(s) cached (%.0f%%), %d Bedrock call(s) saved",
+            hits, len(texts), self.stats["hit_ratio"] * 100, self.stats["saved_calls"],
+        )
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.asarray([found[key] for key in keys], dtype=np.float32)
+
+    def compact(self) -> dict:
+        """Merge all segments into as few as possible, keeping the newest ``max_entries`` keys.
+
+        Every key is kept if ``max_entries`` is not positive. An entry's
+        recency is the newest segment that wrote or touched it. Only keys
+        are read up front; vectors are copied one output segment at a time.
+        """
+        segments = [name for name in self.store.list(_SEGMENTS) if name.endswith(".keys")]
+        touched = self.store.list(_TOUCHED)
+        recency, located = {}, {}
+        for name in segments:
+            try:
+                keys = self._segment_keys(name)
+            except Exception as e:
+                logger.warning("Skipping embedding cache segment %s: %s", name, e)
+                continue
+            stamp = name.rsplit("/", 1)[-1]
+            vectors_name = f"{name[:-len('.keys')]}.npy"
+            for row, key in enumerate(keys):
+                located[key] = (vectors_name, row)
+                recency[key] = max(recency.get(key, ""), stamp)
+        for name in touched:
+            stamp = name.rsplit("/", 1)[-1]
+            for key in _unpack_keys(self.store.get(name)):
+                if key in recency:
+                    recency[key] = max(recency[key], stamp)
+
+        # Oldest first, so the merged segments' ids keep the recency order
+        kept = sorted(recency, key=recency.get)
+        if self.max_entries > 0:
+            kept = kept[-self.max_entries:]
+        step = self._segment_rows(self._header(located[kept[0]][0])[1][1]) if kept else 1
+        for start in range(0, len(kept), step):
+            keys = kept[start:start + step]
+            found = self._read(keys, located)
+            keys = [key for key in keys if key in found]
+            if keys:
+                self.write_segment(keys, np.asarray([found[key] for key in keys], dtype=np.float32))
+        for name in segments:
+            self.store.delete(name)
+            self.store.delete(f"{name[:-len('.keys')]}.npy")
+        for name in touched:
+            self.store.delete(name)
+        self.refresh()
+
+        result = {
+            "segments_merged": len(segments),
+            "entries": len(kept),
+            "evicted": len(recency) - len(kept),
+        }
+        logger.info("Compacted embedding cache: %s", result)
+        return result
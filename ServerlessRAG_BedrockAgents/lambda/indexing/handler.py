@@ -5,15 +5,36 @@ Processes uploaded PDFs, creates embeddings, and stores FAISS index in S3
 import json
 import logging
 import os
+import random
+import shutil
 import tempfile
+import time
 from typing import Dict, Any
 
 import boto3
+import faiss
+import numpy as np
+from botocore.exceptions import ClientError
 from langchain_aws import BedrockEmbeddings
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from ann_index import choose_index_type, convert_index, quantization_of
+from chunker import TokenChunker
+from docstore_file import (
+    DOCSTORE_FILES, DOCSTORE_NAME, LEGACY_DOCSTORE_NAME, load_docstore, write_docstore
+)
+from embedding_cache import DirectoryStore, EmbeddingCache, S3Store
+from embedding_engine import EmbeddingEngine, build_faiss_from_documents
+from index_shards import (
+    LEGACY_SHARD, MANIFEST_NAME, CompactionConflict, add_shard, apply_compaction, chunk_groups,
+    empty_manifest, expire_retired, is_superseded, new_shard_id, plan_compaction, shard_path,
+    snapshot_name
+)
+from near_duplicates import NearDuplicateDetector
+from shared_index import INDEX_FILES, publish_shard, remove_shard, shard_dir, write_manifest
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -26,8 +47,55 @@ S3_BUCKET = os.environ['S3_BUCKET_NAME']
 S3_FAISS_PREFIX = os.environ.get('S3_FAISS_PREFIX', 'faiss-indexes/')
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')  # AWS_REGION is automatically set by Lambda
 EMBEDDING_MODEL_ID = os.environ.get('EMBEDDING_MODEL_ID', 'amazon.titan-embed-text-v2:0')
-CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE', '1000'))
-CHUNK_OVERLAP = int(os.environ.get('CHUNK_OVERLAP', '200'))
+CHUNKER = os.environ.get('CHUNKER', 'recursive')  # 'recursive' (sizes in characters) or 'token' (opt-in, tokens)
+if CHUNKER == 'token':
+    CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE_TOKENS', '256'))
+    CHUNK_OVERLAP = int(os.environ.get('CHUNK_OVERLAP_TOKENS', '48'))
+else:
+    CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE', '1000'))
+    CHUNK_OVERLAP = int(os.environ.get('CHUNK_OVERLAP', '200'))
+EMBED_MAX_WORKERS = int(os.environ.get('EMBED_MAX_WORKERS', '8'))
+EMBED_MAX_RETRIES = int(os.environ.get('EMBED_MAX_RETRIES', '6'))
+ANN_INDEX_TYPE = os.environ.get('ANN_INDEX_TYPE', 'auto')
+ANN_AUTO_THRESHOLD = int(os.environ.get('ANN_AUTO_THRESHOLD', '100000'))
+ANN_IVF_NLIST = int(os.environ.get('ANN_IVF_NLIST', '0'))
+ANN_HNSW_M = int(os.environ.get('ANN_HNSW_M', '32'))
+ANN_QUANTIZATION = os.environ.get('ANN_QUANTIZATION', 'none')
+ANN_PQ_M = int(os.environ.get('ANN_PQ_M', '0'))
+# Each document becomes its own shard; compaction merges shards below
+# SHARD_COMPACT_MAX_VECTORS once SHARD_COMPACT_MIN_SHARDS of them exist.
+SHARD_COMPACT_MAX_VECTORS = int(os.environ.get('SHARD_COMPACT_MAX_VECTORS', '100000'))
+SHARD_COMPACT_MIN_SHARDS = int(os.environ.get('SHARD_COMPACT_MIN_SHARDS', '8'))
+# Retrieval checks the manifest at the start of every invocation, so a
+# retired shard can be searched for at most one invocation after its
+# retirement; the grace period never drops below Lambda's 900 s maximum.
+SHARD_RETIRE_GRACE_SECONDS = max(int(os.environ.get('SHARD_RETIRE_GRACE_SECONDS', '3600')), 900)
+# Manifest updates are compare-and-swap; a writer that loses the race
+# re-reads the manifest and retries.
+MANIFEST_MAX_RETRIES = int(os.environ.get('MANIFEST_MAX_RETRIES', '20'))
+MANIFEST_RETRY_BASE_DELAY = float(os.environ.get('MANIFEST_RETRY_BASE_DELAY', '0.05'))
+MANIFEST_RETRY_MAX_DELAY = float(os.environ.get('MANIFEST_RETRY_MAX_DELAY', '2.0'))
+# PreconditionFailed: the ETag moved on; ConditionalRequestConflict: a
+# concurrent conditional write to the same key was in flight.
+MANIFEST_CONFLICT_CODES = {'PreconditionFailed', 'ConditionalRequestConflict', '412', '409'}
+# Shared filesystem (e.g. an EFS mount) the retrieval Lambda opens the
+# shards from memory-mapped; S3 stays the source of truth.
+FAISS_SHARED_PATH = os.environ.get('FAISS_SHARED_PATH', '')
+# Chunk embedding cache, keyed by model id and normalized chunk text; in
+# EMBEDDING_CACHE_DIR (e.g. on EFS) if set, otherwise under the S3 prefix
+EMBEDDING_CACHE_ENABLED = os.environ.get('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+EMBEDDING_CACHE_DIR = os.environ.get('EMBEDDING_CACHE_DIR', '')
+EMBEDDING_CACHE_PREFIX = os.environ.get('EMBEDDING_CACHE_PREFIX', 'embedding-cache/')
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get('EMBEDDING_CACHE_MAX_ENTRIES', '200000'))  # 0: no limit
+EMBEDDING_CACHE_SEGMENT_MB = int(os.environ.get('EMBEDDING_CACHE_SEGMENT_MB', '16'))
+# Near-duplicate chunks (estimated Jaccard similarity of word 5-grams at
+# least NEAR_DUPLICATE_THRESHOLD) are collapsed into one before embedding
+# and when shards are compacted.
+NEAR_DUPLICATE_ENABLED = os.environ.get('NEAR_DUPLICATE_ENABLED', 'true').lower() == 'true'
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', '0.85'))
+
+_embedding_cache = None
+_near_duplicate_detector = None
 
 
 def get_embeddings():
@@ -38,6 +106,47 @@ def get_embeddings():
     )
 
 
+def get_embedding_cache():
+    """Return the chunk embedding cache, kept across warm invocations, or None if disabled"""
+    global _embedding_cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _embedding_cache is None:
+        if EMBEDDING_CACHE_DIR:
+            store = DirectoryStore(os.path.join(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL_ID))
+        else:
+            store = S3Store(s3_client, S3_BUCKET, f"{EMBEDDING_CACHE_PREFIX}{EMBEDDING_MODEL_ID}/")
+        _embedding_cache = EmbeddingCache(
+            store,
+            EMBEDDING_MODEL_ID,
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+            segment_bytes=EMBEDDING_CACHE_SEGMENT_MB << 20
+        )
+    return _embedding_cache
+
+
+def embedding_cache_stats() -> Dict[str, Any]:
+    """Hit ratio and saved Bedrock calls of this invocation's embedding run"""
+    cache = get_embedding_cache()
+    return cache.stats if cache is not None else {}
+
+
+def get_near_duplicate_detector():
+    """Return the near-duplicate chunk detector, or None if disabled"""
+    global _near_duplicate_detector
+    if not NEAR_DUPLICATE_ENABLED:
+        return None
+    if _near_duplicate_detector is None:
+        _near_duplicate_detector = NearDuplicateDetector(threshold=NEAR_DUPLICATE_THRESHOLD)
+    return _near_duplicate_detector
+
+
+def near_duplicate_stats() -> Dict[str, Any]:
+    """Chunks kept and collapsed by this invocation's near-duplicate pass"""
+    detector = get_near_duplicate_detector()
+    return detector.stats if detector is not None else {}
+
+
 def download_from_s3(bucket: str, key: str, local_path: str):
     """Download file from S3"""
     logger.info(f"Downloading s3://{bucket}/{key} to {local_path}")
@@ -50,9 +159,9 @@ def upload_to_s3(local_path: str, bucket: str, key: str):
     s3_client.upload_file(local_path, bucket, key)
 
 
-def process_document(pdf_path: str, doc_id: str) -> FAISS:
+def load_chunks(pdf_path: str, doc_id: str) -> list:
     """
-    Load PDF, split into chunks, create embeddings, and build FAISS index
+    Load PDF and split it into chunks tagged with the document id
     """
     # Load PDF
     logger.info(f"Loading PDF: {pdf_path}")
@@ -65,74 +174,424 @@ def process_document(pdf_path: str, doc_id: str) -> FAISS:
         page.metadata['document_id'] = doc_id
     
     # Split into chunks
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        separators=["\n\n", "\n", " ", ""]
-    )
+    if CHUNKER == 'token':
+        splitter = TokenChunker(CHUNK_SIZE, CHUNK_OVERLAP)
+    else:
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            separators=["\n\n", "\n", " ", ""]
+        )
     chunks = splitter.split_documents(pages)
     logger.info(f"Split into {len(chunks)} chunks")
+    return chunks
+
+
+def embed_chunks(chunks: list) -> FAISS:
+    """
+    Collapse near-duplicate chunks, create embeddings for the rest
+    concurrently and build a FAISS index
+    """
+    detector = get_near_duplicate_detector()
+    if detector is not None:
+        chunks = detector.collapse(chunks)
     
-    # Create embeddings and FAISS index
     embeddings = get_embeddings()
     logger.info("Building FAISS index...")
-    vectorstore = FAISS.from_documents(chunks, embeddings)
-    logger.info(f"FAISS index created with {vectorstore.index.ntotal} vectors")
+    engine = EmbeddingEngine(
+        embeddings,
+        max_workers=EMBED_MAX_WORKERS,
+        max_retries=EMBED_MAX_RETRIES
+    )
+    vectorstore = build_faiss_from_documents(chunks, embeddings, engine, get_embedding_cache())
+    logger.info(
+        f"FAISS index created with {vectorstore.index.ntotal} vectors "
+        f"({engine.stats.get('chunks_per_second', 0.0):.1f} chunks/s, "
+        f"{engine.stats.get('throttled', 0)} throttled)"
+    )
     
     return vectorstore
 
 
-def merge_or_create_index(new_vectorstore: FAISS, doc_id: str) -> FAISS:
+def process_document(pdf_path: str, doc_id: str) -> FAISS:
     """
-    Merge new vectors with existing FAISS index or create new one
+    Load PDF, split into chunks, collapse near duplicates, create
+    embeddings, and build FAISS index
+    """
+    return embed_chunks(load_chunks(pdf_path, doc_id))
+
+
+def read_manifest_from_s3() -> tuple:
+    """
+    Read the shard manifest and its ETag. Without one, an index written
+    before shards existed (index.faiss at the prefix root) becomes the
+    first shard, and the ETag is None.
     """
-    index_key = f"{S3_FAISS_PREFIX}index.faiss"
-    pkl_key = f"{S3_FAISS_PREFIX}index.pkl"
-    
     try:
-        # Try to download existing index
-        with tempfile.TemporaryDirectory() as tmpdir:
-            local_index = os.path.join(tmpdir, "index.faiss")
-            local_pkl = os.path.join(tmpdir, "index.pkl")
-            
-            download_from_s3(S3_BUCKET, index_key, local_index)
-            download_from_s3(S3_BUCKET, pkl_key, local_pkl)
-            
-            # Load existing index
-            embeddings = get_embeddings()
-            existing_vectorstore = FAISS.load_local(
-                tmpdir, 
-                embeddings,
-                index_name="index",
-                allow_dangerous_deserialization=True
+        response = s3_client.get_object(Bucket=S3_BUCKET, Key=f"{S3_FAISS_PREFIX}{MANIFEST_NAME}")
+        return json.loads(response['Body'].read()), response['ETag']
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+            raise
+    manifest = empty_manifest()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        local_index = os.path.join(tmpdir, "index.faiss")
+        try:
+            download_from_s3(S3_BUCKET, f"{S3_FAISS_PREFIX}index.faiss", local_index)
+        except ClientError:
+            return manifest, None
+        legacy = {**LEGACY_SHARD, 'vectors': faiss.read_index(local_index).ntotal}
+    logger.info(f"Adopting the existing global index ({legacy['vectors']} vectors) as a shard")
+    # Before it is published, so retrieval never sees it with only index.pkl
+    convert_docstore(legacy)
+    return add_shard(manifest, legacy), None
+
+
+def is_write_conflict(exc: Exception) -> bool:
+    """True if a conditional S3 write lost to a concurrent writer"""
+    response = getattr(exc, 'response', None)
+    error = response.get('Error') if isinstance(response, dict) else None
+    return isinstance(error, dict) and error.get('Code') in MANIFEST_CONFLICT_CODES
+
+
+def update_manifest(change) -> Dict[str, Any]:
+    """
+    Apply change(manifest) to the current manifest and swap the result in.
+    
+    The write is conditional on the ETag of the manifest the change was
+    applied to (or on no manifest existing yet). If another writer got
+    there first, re-read the manifest and apply the change again, after
+    a jittered exponential back-off. Every version is also kept as an
+    immutable snapshot under manifests/.
+    """
+    key = f"{S3_FAISS_PREFIX}{MANIFEST_NAME}"
+    for attempt in range(MANIFEST_MAX_RETRIES + 1):
+        current, etag = read_manifest_from_s3()
+        manifest = change(current)
+        body = json.dumps(manifest).encode('utf-8')
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        try:
+            s3_client.put_object(
+                Bucket=S3_BUCKET, Key=key, Body=body, ContentType='application/json', **condition
             )
-            logger.info(f"Loaded existing index with {existing_vectorstore.index.ntotal} vectors")
-            
-            # Merge indexes
-            existing_vectorstore.merge_from(new_vectorstore)
-            logger.info(f"Merged index now has {existing_vectorstore.index.ntotal} vectors")
-            
-            return existing_vectorstore
-            
-    except Exception as e:
-        logger.info(f"No existing index found or error loading: {e}. Creating new index.")
-        return new_vectorstore
+            break
+        except ClientError as e:
+            if not is_write_conflict(e) or attempt == MANIFEST_MAX_RETRIES:
+                raise
+            delay = min(MANIFEST_RETRY_MAX_DELAY, MANIFEST_RETRY_BASE_DELAY * (2 ** attempt))
+            logger.info(f"Manifest changed concurrently (attempt {attempt + 1}); rebasing")
+            time.sleep(delay * random.uniform(0.5, 1.0))
+    
+    s3_client.put_object(
+        Bucket=S3_BUCKET,
+        Key=f"{S3_FAISS_PREFIX}{snapshot_name(manifest['version'])}",
+        Body=body,
+        ContentType='application/json'
+    )
+    if FAISS_SHARED_PATH:
+        write_manifest(FAISS_SHARED_PATH, manifest)
+    logger.info(f"Manifest version {manifest['version']}: {len(manifest['shards'])} live shards")
+    return manifest
 
 
-def save_index_to_s3(vectorstore: FAISS):
-    """Save FAISS index to S3"""
+def load_shard(shard: Dict[str, Any], tmpdir: str) -> FAISS:
+    """
+    Download a shard from S3. The store carries the full-precision vectors
+    as exact_vectors, read from vectors.npy when the shard is quantized.
+    """
+    prefix = f"{S3_FAISS_PREFIX}{shard_path(shard)}"
+    directory = os.path.join(tmpdir, shard['id'])
+    os.makedirs(directory)
+    download_from_s3(S3_BUCKET, f"{prefix}index.faiss", os.path.join(directory, "index.faiss"))
+    try:
+        for name in DOCSTORE_FILES:
+            download_from_s3(S3_BUCKET, f"{prefix}{name}", os.path.join(directory, name))
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey'):
+            raise
+        # Shards written before the file docstore have a pickled one;
+        # convert it the first time it is touched
+        convert_docstore(shard)
+        for name in DOCSTORE_FILES:
+            download_from_s3(S3_BUCKET, f"{prefix}{name}", os.path.join(directory, name))
+    vectorstore = FAISS(
+        get_embeddings(),
+        faiss.read_index(os.path.join(directory, "index.faiss")),
+        *load_docstore(directory)
+    )
+    exact_vectors = None
+    if quantization_of(vectorstore.index) != 'none':
+        local_vectors = os.path.join(directory, "vectors.npy")
+        try:
+            download_from_s3(S3_BUCKET, f"{prefix}vectors.npy", local_vectors)
+            exact_vectors = np.load(local_vectors)
+        except Exception as e:
+            logger.warning(f"Exact vectors unavailable ({e}); using quantized reconstructions")
+    if exact_vectors is None:
+        exact_vectors = vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+    vectorstore.exact_vectors = exact_vectors
+    return vectorstore
+
+
+def merge_shards(shards: list) -> FAISS:
+    """
+    Combine the vectors and documents of several shards into one flat store,
+    leaving out the chunks of documents a shard lists as superseded
+    """
+    texts, metadatas, ids, vectors = [], [], [], []
     with tempfile.TemporaryDirectory() as tmpdir:
-        # Save locally
-        vectorstore.save_local(tmpdir, index_name="index")
-        
-        # Upload to S3
-        index_file = os.path.join(tmpdir, "index.faiss")
-        pkl_file = os.path.join(tmpdir, "index.pkl")
+        for shard in shards:
+            store = load_shard(shard, tmpdir)
+            superseded = set(shard.get('superseded', []))
+            keep = []
+            for position in range(store.index.ntotal):
+                doc_id = store.index_to_docstore_id[position]
+                doc = store.docstore.search(doc_id)
+                if is_superseded(doc.metadata, superseded):
+                    continue
+                keep.append(position)
+                texts.append(doc.page_content)
+                metadatas.append(doc.metadata)
+                ids.append(doc.id or doc_id)
+            vectors.append(np.asarray(store.exact_vectors, dtype=np.float32)[keep])
+    vectors = np.concatenate(vectors)
+    
+    # Collapse near duplicates across the merged shards' documents
+    detector = get_near_duplicate_detector()
+    if detector is not None:
+        keep = detector.collapse_records(texts, metadatas)
+        logger.info(f"Collapsed {len(texts) - len(keep)} near-duplicate chunks across {len(shards)} shards")
+        texts, metadatas, ids = ([values[i] for i in keep] for values in (texts, metadatas, ids))
+        vectors = vectors[keep]
+    merged = FAISS.from_embeddings(zip(texts, vectors), get_embeddings(), metadatas=metadatas, ids=ids)
+    merged.exact_vectors = vectors
+    return merged
+
+
+def apply_index_type(vectorstore: FAISS) -> FAISS:
+    """
+    Rebuild the index as the configured ANN type and quantization for its
+    current size, always from the exact vectors to avoid quantizing twice
+    """
+    index_type = choose_index_type(
+        vectorstore.index.ntotal, ANN_INDEX_TYPE, ANN_AUTO_THRESHOLD
+    )
+    return convert_index(
+        vectorstore,
+        index_type,
+        ANN_QUANTIZATION,
+        vectors=getattr(vectorstore, 'exact_vectors', None),
+        nlist=ANN_IVF_NLIST or None,
+        hnsw_m=ANN_HNSW_M,
+        pq_m=ANN_PQ_M or None
+    )
+
+
+def save_shard(vectorstore: FAISS, shard: Dict[str, Any]):
+    """
+    Upload a shard's files (and exact vectors for quantized indexes) to S3,
+    and publish them under FAISS_SHARED_PATH if set
+    """
+    prefix = f"{S3_FAISS_PREFIX}{shard_path(shard)}"
+    with tempfile.TemporaryDirectory() as tmpdir:
+        faiss.write_index(vectorstore.index, os.path.join(tmpdir, "index.faiss"))
+        write_docstore(tmpdir, vectorstore.docstore, vectorstore.index_to_docstore_id, vectorstore.index.ntotal)
+        exact_vectors = getattr(vectorstore, 'exact_vectors', None)
+        if quantization_of(vectorstore.index) != 'none' and exact_vectors is not None:
+            np.save(os.path.join(tmpdir, "vectors.npy"), np.ascontiguousarray(exact_vectors, dtype=np.float32))
         
-        upload_to_s3(index_file, S3_BUCKET, f"{S3_FAISS_PREFIX}index.faiss")
-        upload_to_s3(pkl_file, S3_BUCKET, f"{S3_FAISS_PREFIX}index.pkl")
+        for name in INDEX_FILES:
+            local_path = os.path.join(tmpdir, name)
+            if os.path.exists(local_path):
+                upload_to_s3(local_path, S3_BUCKET, f"{prefix}{name}")
         
-        logger.info("FAISS index saved to S3")
+        if FAISS_SHARED_PATH:
+            publish_shard(tmpdir, FAISS_SHARED_PATH, shard)
+    logger.info(f"FAISS shard {shard['id']} saved ({vectorstore.index.ntotal} vectors)")
+
+
+def delete_shard(shard: Dict[str, Any]):
+    """Delete a retired shard's files from S3 and the shared path"""
+    prefix = f"{S3_FAISS_PREFIX}{shard_path(shard)}"
+    for name in INDEX_FILES:
+        s3_client.delete_object(Bucket=S3_BUCKET, Key=f"{prefix}{name}")
+    if FAISS_SHARED_PATH:
+        remove_shard(FAISS_SHARED_PATH, shard)
+    logger.info(f"Deleted retired FAISS shard {shard['id']}")
+
+
+def index_documents(new_vectorstore: FAISS, doc_ids: list) -> Dict[str, Any]:
+    """
+    Write the documents' vectors as one new shard and list it in the manifest.
+    Cost depends only on the documents, not on the size of the corpus.
+    """
+    shard = {
+        'id': new_shard_id(doc_ids[0] if len(doc_ids) == 1 else f"batch{len(doc_ids)}"),
+        'documents': list(doc_ids),
+        'vectors': new_vectorstore.index.ntotal,
+        'chunks': chunk_groups(new_vectorstore)
+    }
+    save_shard(new_vectorstore, shard)
+    update_manifest(lambda manifest: add_shard(manifest, shard))
+    return shard
+
+
+def index_document(new_vectorstore: FAISS, doc_id: str) -> Dict[str, Any]:
+    """Write a single document's vectors as a new shard"""
+    return index_documents(new_vectorstore, [doc_id])
+
+
+def parse_batch(event: Dict[str, Any]) -> list:
+    """
+    Return the items of a batch event, each with an item_id to report
+    failures by (the SQS messageId, or the document id). Records whose
+    body cannot be parsed are returned with their error.
+    """
+    if 'Records' in event:
+        items = []
+        for record in event['Records']:
+            try:
+                body = json.loads(record['body'])
+                items.append({**body, 'item_id': record['messageId']})
+            except (KeyError, TypeError, ValueError) as e:
+                items.append({'item_id': record.get('messageId'), 'error': f"Invalid record: {e}"})
+        return items
+    return [{**document, 'item_id': document.get('document_id')} for document in event['documents']]
+
+
+def index_batch(items: list) -> tuple:
+    """
+    Parse every document in the batch, embed all their chunks in one run
+    and publish them as a single shard with one manifest update.
+    
+    Returns (shard or None, failures); a document that cannot be
+    downloaded or parsed fails on its own without failing the batch.
+    """
+    failures = [
+        {'item_id': item['item_id'], 'error': item['error']} for item in items if 'error' in item
+    ]
+    chunks, indexed = [], []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for item in items:
+            if 'error' in item:
+                continue
+            try:
+                doc_id = item['document_id']
+                local_pdf = os.path.join(tmpdir, f"{len(indexed)}.pdf")
+                download_from_s3(S3_BUCKET, item['document_key'], local_pdf)
+                document_chunks = load_chunks(local_pdf, doc_id)
+                if not document_chunks:
+                    raise ValueError("No text could be extracted from the document")
+            except Exception as e:
+                logger.warning(f"Skipping batch item {item['item_id']}: {e}")
+                failures.append({'item_id': item['item_id'], 'error': str(e)})
+                continue
+            chunks.extend(document_chunks)
+            indexed.append(item)
+    
+    if not indexed:
+        return None, failures
+    try:
+        shard = index_documents(embed_chunks(chunks), [item['document_id'] for item in indexed])
+    except Exception as e:
+        logger.error(f"Failed to index batch of {len(indexed)} documents: {e}", exc_info=True)
+        return None, failures + [{'item_id': item['item_id'], 'error': str(e)} for item in indexed]
+    logger.info(f"Indexed {len(indexed)} of {len(items)} batch documents into shard {shard['id']}")
+    return shard, failures
+
+
+def compact_shards() -> Dict[str, Any]:
+    """
+    Merge small shards into one, built as the configured ANN index type,
+    and delete shards that have been retired for longer than the grace period
+    """
+    manifest, _ = read_manifest_from_s3()
+    merged = plan_compaction(manifest, SHARD_COMPACT_MAX_VECTORS, SHARD_COMPACT_MIN_SHARDS)
+    shard = None
+    if merged:
+        logger.info(f"Compacting {len(merged)} shards ({sum(s['vectors'] for s in merged)} vectors)")
+        vectorstore = apply_index_type(merge_shards(merged))
+        shard = {
+            'id': new_shard_id('compacted'),
+            'documents': sorted({doc_id for s in merged for doc_id in s['documents']}),
+            'vectors': vectorstore.index.ntotal,
+            'chunks': chunk_groups(vectorstore)
+        }
+        save_shard(vectorstore, shard)
+        try:
+            manifest = update_manifest(lambda current: apply_compaction(current, merged, shard))
+        except CompactionConflict:
+            logger.warning("Shards were compacted concurrently; discarding this merge")
+            delete_shard(shard)
+            merged, shard = [], None
+    
+    expired, _ = expire_retired(manifest, SHARD_RETIRE_GRACE_SECONDS)
+    if expired:
+        expired_ids = {s['id'] for s in expired}
+        manifest = update_manifest(lambda current: {
+            **current,
+            'version': current['version'] + 1,
+            'retired': [s for s in current['retired'] if s['id'] not in expired_ids]
+        })
+        for retired in expired:
+            delete_shard(retired)
+    
+    return {
+        'compacted_shards': len(merged),
+        'new_shard_id': shard and shard['id'],
+        'deleted_shards': len(expired),
+        'live_shards': len(manifest['shards'])
+    }
+
+
+def convert_docstore(shard: Dict[str, Any]) -> bool:
+    """
+    Write the file docstore of a shard that only has a pickled one (from
+    before the file docstore), next to it in S3 and on the shared path, so
+    the retrieval Lambda can read it without DOCSTORE_ALLOW_PICKLE. The
+    pickle is one this Lambda wrote. Returns False if there was nothing to
+    convert.
+    """
+    prefix = f"{S3_FAISS_PREFIX}{shard_path(shard)}"
+    try:
+        s3_client.head_object(Bucket=S3_BUCKET, Key=f"{prefix}{DOCSTORE_NAME}")
+        return False
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+            raise
+    with tempfile.TemporaryDirectory() as tmpdir:
+        download_from_s3(S3_BUCKET, f"{prefix}{LEGACY_DOCSTORE_NAME}", os.path.join(tmpdir, LEGACY_DOCSTORE_NAME))
+        docstore, index_to_docstore_id = load_docstore(tmpdir, allow_pickle=True)
+        write_docstore(tmpdir, docstore, index_to_docstore_id, len(index_to_docstore_id))
+        for name in DOCSTORE_FILES:
+            upload_to_s3(os.path.join(tmpdir, name), S3_BUCKET, f"{prefix}{name}")
+        shared = FAISS_SHARED_PATH and shard_dir(FAISS_SHARED_PATH, shard)
+        if shared and os.path.exists(os.path.join(shared, "index.faiss")):
+            # Offsets first: readers take the docstore.jsonl as the signal
+            for name in reversed(DOCSTORE_FILES):
+                staging = os.path.join(shared, f".{name}.tmp")
+                shutil.copyfile(os.path.join(tmpdir, name), staging)
+                os.replace(staging, os.path.join(shared, name))
+    logger.info(f"Converted the pickled docstore of shard {shard['id']}")
+    return True
+
+
+def convert_docstores() -> Dict[str, Any]:
+    """
+    Convert the pickled docstore of every live shard that still has one;
+    deploy.sh runs this once after updating the Lambdas
+    """
+    manifest, _ = read_manifest_from_s3()
+    return {'converted_shards': [shard['id'] for shard in manifest['shards'] if convert_docstore(shard)]}
+
+
+def compact_embedding_cache() -> Dict[str, Any]:
+    """
+    Merge the embedding cache's segments and evict the least recently
+    used entries beyond EMBEDDING_CACHE_MAX_ENTRIES
+    """
+    cache = get_embedding_cache()
+    return cache.compact() if cache is not None else {}
 
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -145,10 +604,69 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         "document_id": "doc123",
         "user_id": "user456"
     }
+    
+    or a batch, indexed into one shard:
+    {
+        "documents": [{"document_key": "...", "document_id": "...", "user_id": "..."}, ...]
+    }
+    
+    or an SQS batch whose message bodies are single-document events; failed
+    messages are returned as batchItemFailures (ReportBatchItemFailures)
+    
+    or, from the compaction schedule:
+    {
+        "action": "compact"
+    }
+    
+    or, after a deploy, to convert the pickled docstores of shards written
+    before the file docstore:
+    {
+        "action": "convert_docstores"
+    }
     """
     try:
         logger.info(f"Received event: {json.dumps(event)}")
         
+        # Other containers may have added cache segments since the last invocation
+        cache = get_embedding_cache()
+        if cache is not None:
+            cache.refresh()
+        
+        if event.get('action') == 'compact':
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    **compact_shards(),
+                    'embedding_cache': compact_embedding_cache()
+                })
+            }
+        
+        if event.get('action') == 'convert_docstores':
+            return {'statusCode': 200, 'body': json.dumps(convert_docstores())}
+        
+        if 'documents' in event and not event['documents']:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'documents must list at least one document'})
+            }
+        
+        if 'Records' in event or 'documents' in event:
+            items = parse_batch(event)
+            shard, failures = index_batch(items)
+            if 'Records' in event:
+                return {'batchItemFailures': [{'itemIdentifier': f['item_id']} for f in failures]}
+            return {
+                'statusCode': 500 if len(failures) == len(items) else 207 if failures else 200,
+                'body': json.dumps({
+                    'message': f"Indexed {len(items) - len(failures)} of {len(items)} documents",
+                    'shard_id': shard and shard['id'],
+                    'vectors_count': shard['vectors'] if shard else 0,
+                    'embedding_cache': embedding_cache_stats() if shard else {},
+                    'near_duplicates': near_duplicate_stats() if shard else {},
+                    'failures': failures
+                })
+            }
+        
         # Parse event
         document_key = event['document_key']
         doc_id = event['document_id']
@@ -162,11 +680,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             # Process document and create FAISS index
             new_vectorstore = process_document(local_pdf, doc_id)
             
-            # Merge with existing index or create new
-            final_vectorstore = merge_or_create_index(new_vectorstore, doc_id)
-            
-            # Save to S3
-            save_index_to_s3(final_vectorstore)
+            # Save as a new shard; compaction merges shards later
+            shard = index_document(new_vectorstore, doc_id)
         
         # Return success
         return {
@@ -174,12 +689,17 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({
                 'message': 'Document indexed successfully',
                 'document_id': doc_id,
-                'vectors_count': final_vectorstore.index.ntotal
+                'shard_id': shard['id'],
+                'vectors_count': shard['vectors'],
+                'embedding_cache': embedding_cache_stats(),
+                'near_duplicates': near_duplicate_stats()
             })
         }
         
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}", exc_info=True)
+        if 'Records' in event:
+            raise  # an SQS batch must fail as a whole to be redelivered
         return {
             'statusCode': 500,
             'body': json.dumps({
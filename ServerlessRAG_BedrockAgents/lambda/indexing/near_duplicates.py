@@ -0,0 +1,160 @@
+"""
+Near Duplicates — MinHash/LSH collapsing of near-identical chunks (indexing Lambda)
+
+Corporate PDFs repeat paragraphs almost verbatim across documents: legal
+footers, disclaimers, policy templates with a name or date changed. Every
+copy used to be embedded, stored and retrieved, and the copies crowd
+distinct passages out of the top *k*.
+
+Each chunk is reduced to the set of its lower-cased word *shingle_size*-
+grams and a MinHash signature of *num_perm* values over that set; the
+fraction of equal signature values estimates the Jaccard similarity of
+two chunks. Signatures are split into bands, and only chunks sharing a
+band are compared, so detection stays close to linear in the number of
+chunks. Chunks estimated at least *threshold* similar to an earlier
+chunk are collapsed into it: the earlier chunk keeps its text and vector
+and lists the others under ``metadata["duplicates"]`` as source
+references (``document_id``, ``source``, ``page``).
+"""
+
+import hashlib
+import logging
+import re
+import time
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SHINGLE_BASE = np.uint64(0x100000001B3)
+_WORD = re.compile(r"\w+")
+REFERENCE_FIELDS = ("document_id", "source", "page")
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer: a bijection on uint64 that scrambles every bit."""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def shingle_hashes(text: str, size: int) -> np.ndarray:
+    """Return the distinct 64-bit hashes of the lower-cased word *size*-grams of *text*.
+
+    Texts shorter than *size* words count as one shingle.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    word_hashes = np.fromiter((_word_hash(word) for word in words), dtype=np.uint64, count=len(words))
+    count = max(1, len(words) - size + 1)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(min(size, len(words))):
+        hashes = hashes * _SHINGLE_BASE + word_hashes[offset:offset + count]
+    return np.unique(_mix(hashes))
+
+
+def source_reference(metadata: dict) -> dict:
+    """Return the fields of *metadata* that identify where a chunk came from."""
+    return {field: metadata[field] for field in REFERENCE_FIELDS if field in metadata}
+
+
+class NearDuplicateDetector:
+    """Group near-duplicate texts by MinHash signatures and LSH banding.
+
+    ``stats`` is updated after every :meth:`collapse` call with the chunk
+    count, chunks kept and collapsed, and the time taken.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, bands: int = 32, shingle_size: int = 5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        # One hash function per permutation: the shingle hash XOR a seed, mixed
+        self._seeds = np.random.default_rng(1).integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64)
+        self.stats = {}
+
+    def signature(self, text: str) -> np.ndarray | None:
+        """Return the MinHash signature of *text*, or None if it has no words."""
+        hashes = shingle_hashes(text, self.shingle_size)
+        if not len(hashes):
+            return None
+        return _mix(self._seeds[:, None] ^ hashes).min(axis=1)
+
+    def representatives(self, texts: list) -> list:
+        """Return, for every text, the index of the earliest text it duplicates (itself if none)."""
+        rows = self.num_perm // self.bands
+        buckets = {}
+        kept = []
+        result = []
+        for position, text in enumerate(texts):
+            signature = self.signature(text)
+            if signature is None:
+                result.append(position)
+                continue
+            keys = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+            candidates = {candidate for key in keys for candidate in buckets.get(key, ())}
+            match = None
+            for candidate in sorted(candidates):
+                if np.mean(kept[candidate][1] == signature) >= self.threshold:
+                    match = kept[candidate][0]
+                    break
+            if match is not None:
+                result.append(match)
+                continue
+            for key in keys:
+                buckets.setdefault(key, []).append(len(kept))
+            kept.append((position, signature))
+            result.append(position)
+        return result
+
+    def collapse_records(self, texts: list, metadatas: list) -> list:
+        """Return the indexes of the records to keep, merging the references of the rest.
+
+        The kept records' metadata gains a ``duplicates`` list with the
+        source references of the records collapsed into them (and of any
+        they had collapsed before). *metadatas* is updated in place.
+        """
+        representative = self.representatives(texts)
+        extended = set()
+        for position, target in enumerate(representative):
+            if target != position:
+                if target not in extended:
+                    metadatas[target]["duplicates"] = list(metadatas[target].get("duplicates", []))
+                    extended.add(target)
+                references = metadatas[target]["duplicates"]
+                references.append(source_reference(metadatas[position]))
+                references.extend(metadatas[position].get("duplicates", []))
+        return [position for position, target in enumerate(representative) if target == position]
+
+    def collapse(self, documents: list) -> list:
+        """Return *documents* with near duplicates collapsed into their first occurrence."""
+        start = time.perf_counter()
+        metadatas = [dict(doc.metadata) for doc in documents]
+        keep = self.collapse_records([doc.page_content for doc in documents], metadatas)
+        collapsed = []
+        for position in keep:
+            doc = documents[position].model_copy()
+            doc.metadata = metadatas[position]
+            collapsed.append(doc)
+        elapsed = time.perf_counter() - start
+        self.stats = {
+            "chunks": len(documents),
+            "kept": len(collapsed),
+            "collapsed": len(documents) - len(collapsed),
+            "seconds": elapsed,
+        }
+        logger.info(
+            "Collapsed %d near-duplicate chunk(s) of %d in %.2fs",
+            self.stats["collapsed"], len(documents), elapsed,
+        )
+        return collapsed
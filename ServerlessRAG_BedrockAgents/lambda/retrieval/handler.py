@@ -5,13 +5,26 @@ Retrieves relevant context from FAISS index for a given question
 import json
 import logging
 import os
+import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
 
 import boto3
+import faiss
+import numpy as np
+from botocore.exceptions import ClientError
 from langchain_aws import BedrockEmbeddings
 from langchain_community.vectorstores import FAISS
 
+from ann_index import enable_exact_rerank, quantization_of
+from docstore_file import DOCSTORE_FILES, LEGACY_DOCSTORE_NAME, LegacyDocstoreError, load_docstore
+from index_shards import (
+    LEGACY_SHARD, MANIFEST_NAME, combine_shards, empty_manifest, shard_path, superseded_positions
+)
+from mmr_retrieval import MMRRetriever, get_normalized_vectors
+from shared_index import load_vectorstore, read_manifest, shard_dir
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -27,9 +40,30 @@ EMBEDDING_MODEL_ID = os.environ.get('EMBEDDING_MODEL_ID', 'amazon.titan-embed-te
 SEARCH_K = int(os.environ.get('SEARCH_K', '4'))
 SEARCH_FETCH_K = int(os.environ.get('SEARCH_FETCH_K', '8'))
 SEARCH_TYPE = os.environ.get('SEARCH_TYPE', 'mmr')
+ANN_IVF_NPROBE = int(os.environ.get('ANN_IVF_NPROBE', '16'))
+ANN_HNSW_EF_SEARCH = int(os.environ.get('ANN_HNSW_EF_SEARCH', '64'))
+ANN_EXACT_RERANK = os.environ.get('ANN_EXACT_RERANK', 'false').lower() == 'true'
+ANN_RERANK_FACTOR = int(os.environ.get('ANN_RERANK_FACTOR', '4'))
+# Shared filesystem (e.g. an EFS mount) the indexing Lambda publishes shards
+# to; they are then opened memory-mapped there, with S3 as the fallback.
+FAISS_SHARED_PATH = os.environ.get('FAISS_SHARED_PATH', '')
+SHARD_LOAD_WORKERS = int(os.environ.get('SHARD_LOAD_WORKERS', '8'))
+# Shards written before the file docstore have a pickled one (index.pkl),
+# which is only unpickled when explicitly allowed
+DOCSTORE_ALLOW_PICKLE = os.environ.get('DOCSTORE_ALLOW_PICKLE', 'false').lower() == 'true'
+# Exact vectors outlive the download tempdir because they are memory-mapped.
+EXACT_VECTORS_DIR = '/tmp/faiss-exact-vectors'
+# Shard docstores are read on demand, so they outlive the download too.
+DOCSTORE_DIR = '/tmp/faiss-docstores'
 
-# Cache for FAISS index
+# Cache for FAISS index, with the manifest it was loaded from: the ETag of
+# the S3 manifest or the version of the shared one. Every invocation checks
+# the manifest first and reloads when it has changed.
 _vectorstore_cache = None
+_manifest_tag = None
+# Loaded shards by id, so a new manifest only loads the shards it adds:
+# (source, store, superseded documents, positions of their chunks)
+_shard_cache = {}
 
 
 def get_embeddings():
@@ -40,42 +74,218 @@ def get_embeddings():
     )
 
 
+def configure_index_search(index):
+    """Apply query-time knobs for IVF (nprobe) and HNSW (efSearch) indexes"""
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(ANN_IVF_NPROBE, index.nlist)
+        if index.direct_map.type == faiss.DirectMap.NoMap:
+            index.make_direct_map()  # needed by MMR to reconstruct vectors
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ANN_HNSW_EF_SEARCH
+
+
+def attach_exact_rerank(vectorstore: FAISS, vectors_path: str):
+    """
+    Re-score quantized search candidates against the full-precision vectors
+    in vectors.npy. The file is memory-mapped, so only candidate rows are read.
+    """
+    exact_vectors = np.load(vectors_path, mmap_mode='r')
+    if len(exact_vectors) != vectorstore.index.ntotal:
+        logger.warning("Exact vectors do not match the index; serving quantized scores")
+        return
+    enable_exact_rerank(vectorstore, exact_vectors, ANN_RERANK_FACTOR)
+
+
+def read_s3_manifest() -> tuple:
+    """
+    Read the shard manifest and its ETag; without one, the global index is
+    the only shard and the ETag is None
+    """
+    try:
+        response = s3_client.get_object(Bucket=S3_BUCKET, Key=f"{S3_FAISS_PREFIX}{MANIFEST_NAME}")
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+            raise
+        return {**empty_manifest(), 'shards': [LEGACY_SHARD]}, None
+    return json.loads(response['Body'].read()), response['ETag']
+
+
+def current_manifest_tag():
+    """
+    Identify the manifest the index would be loaded from now: the version of
+    the shared manifest if one is published, else the S3 manifest's ETag
+    from a HEAD request. Returns (tag, shared manifest or None).
+    """
+    if FAISS_SHARED_PATH:
+        manifest = read_manifest(FAISS_SHARED_PATH)
+        if manifest is not None:
+            return ('shared', manifest['version']), manifest
+    try:
+        response = s3_client.head_object(Bucket=S3_BUCKET, Key=f"{S3_FAISS_PREFIX}{MANIFEST_NAME}")
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('NoSuchKey', '404', 'NotFound'):
+            raise
+        return ('s3', None), None
+    return ('s3', response.get('ETag')), None
+
+
+def download_docstore(prefix: str, directory: str):
+    """
+    Download a shard's docstore files (index.pkl for shards written before
+    them, if DOCSTORE_ALLOW_PICKLE is set)
+    """
+    os.makedirs(directory, exist_ok=True)
+    try:
+        for name in DOCSTORE_FILES:
+            s3_client.download_file(S3_BUCKET, f"{prefix}{name}", os.path.join(directory, name))
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey'):
+            raise
+        if not DOCSTORE_ALLOW_PICKLE:
+            raise LegacyDocstoreError(
+                f"Shard {prefix} only has a pickled docstore; convert it (action convert_docstores) "
+                "or set DOCSTORE_ALLOW_PICKLE=true"
+            ) from e
+        s3_client.download_file(S3_BUCKET, f"{prefix}{LEGACY_DOCSTORE_NAME}", os.path.join(directory, LEGACY_DOCSTORE_NAME))
+
+
+def load_shard(shard: Dict[str, Any], embeddings, directory: str = None) -> FAISS:
+    """
+    Load one shard: memory-mapped from its directory on the shared path,
+    or downloaded from S3 and read into memory
+    """
+    if directory:
+        vectorstore = load_vectorstore(directory, embeddings, DOCSTORE_ALLOW_PICKLE)
+        vectors_path = os.path.join(directory, 'vectors.npy')
+    else:
+        prefix = f"{S3_FAISS_PREFIX}{shard_path(shard)}"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            s3_client.download_file(S3_BUCKET, f"{prefix}index.faiss", os.path.join(tmpdir, "index.faiss"))
+            index = faiss.read_index(os.path.join(tmpdir, "index.faiss"))
+        docstore_dir = os.path.join(DOCSTORE_DIR, shard['id'])
+        download_docstore(prefix, docstore_dir)
+        vectorstore = FAISS(embeddings, index, *load_docstore(docstore_dir, DOCSTORE_ALLOW_PICKLE))
+        vectors_path = os.path.join(EXACT_VECTORS_DIR, f"{shard['id']}.npy")
+    configure_index_search(vectorstore.index)
+    if ANN_EXACT_RERANK and quantization_of(vectorstore.index) != 'none':
+        try:
+            if not directory:
+                os.makedirs(EXACT_VECTORS_DIR, exist_ok=True)
+                s3_client.download_file(S3_BUCKET, f"{prefix}vectors.npy", vectors_path)
+            attach_exact_rerank(vectorstore, vectors_path)
+        except Exception as e:
+            logger.warning(f"Exact vectors of shard {shard['id']} unavailable, serving quantized scores: {e}")
+    return vectorstore
+
+
+def release_shard(shard_id: str):
+    """Drop a shard that is no longer live, with its downloaded files"""
+    _shard_cache.pop(shard_id, None)
+    shutil.rmtree(os.path.join(DOCSTORE_DIR, shard_id), ignore_errors=True)
+    try:
+        os.remove(os.path.join(EXACT_VECTORS_DIR, f"{shard_id}.npy"))
+    except FileNotFoundError:
+        pass
+
+
+def load_shards(manifest: Dict[str, Any], embeddings, root: str = None) -> FAISS:
+    """
+    Load the live shards in the manifest (concurrently) and combine them.
+    Shards already loaded from the same place are reused; shards no longer
+    live are released, so a retired shard is never searched again. Chunks
+    of documents a shard lists as superseded are left out of searches.
+    """
+    shards = manifest['shards']
+    if not shards:
+        raise ValueError("No FAISS index shards have been written yet")
+    source = root or 's3'
+    for shard_id, (loaded_from, *_) in list(_shard_cache.items()):
+        if loaded_from != source:
+            release_shard(shard_id)
+    new = [shard for shard in shards if shard['id'] not in _shard_cache]
+    directories = [shard_dir(root, shard) if root else None for shard in new]
+    missing = [d for d in directories if d and not os.path.isdir(d)]
+    if missing:
+        raise FileNotFoundError(f"Shards missing from the shared path: {missing}")
+    if new:
+        with ThreadPoolExecutor(max_workers=min(SHARD_LOAD_WORKERS, len(new))) as pool:
+            stores = list(pool.map(load_shard, new, [embeddings] * len(new), directories))
+        for shard, store in zip(new, stores):
+            _shard_cache[shard['id']] = (source, store, None, None)
+    for shard in shards:
+        _, store, cached_superseded, _ = _shard_cache[shard['id']]
+        superseded = shard.get('superseded', [])
+        if superseded != cached_superseded:
+            _shard_cache[shard['id']] = (source, store, superseded, superseded_positions(shard, store))
+    live_ids = {shard['id'] for shard in shards}
+    for shard_id in [shard_id for shard_id in _shard_cache if shard_id not in live_ids]:
+        release_shard(shard_id)
+    logger.info(
+        f"Loaded {len(new)} new of {len(shards)} FAISS shards (manifest version {manifest['version']})"
+    )
+    cached = [_shard_cache[shard['id']] for shard in shards]
+    return combine_shards([entry[1] for entry in cached], embeddings, [entry[3] for entry in cached])
+
+
+def load_shared_index(manifest: Dict[str, Any], embeddings) -> FAISS:
+    """Open the shards of the manifest published under FAISS_SHARED_PATH memory-mapped"""
+    logger.info(f"Opening FAISS index memory-mapped from {FAISS_SHARED_PATH}...")
+    vectorstore = load_shards(manifest, embeddings, FAISS_SHARED_PATH)
+    # MMR reads candidate rows per query instead of copying every vector
+    vectorstore.memory_mapped = True
+    return vectorstore
+
+
+def load_s3_index(embeddings) -> tuple:
+    """Download the index shards from S3 and read them into memory; returns (store, ETag)"""
+    logger.info("Loading FAISS index from S3...")
+    manifest, etag = read_s3_manifest()
+    vectorstore = load_shards(manifest, embeddings)
+    if SEARCH_TYPE == 'mmr':
+        get_normalized_vectors(vectorstore)  # build once per manifest, not per query
+    return vectorstore, etag
+
+
 def load_faiss_index() -> FAISS:
-    """Load FAISS index from S3 (with caching)"""
-    global _vectorstore_cache
+    """
+    Load FAISS index from the shared path or S3, cached while the manifest
+    is unchanged
+    """
+    global _vectorstore_cache, _manifest_tag
     
-    if _vectorstore_cache is not None:
+    try:
+        tag, shared_manifest = current_manifest_tag()
+    except Exception as e:
+        if _vectorstore_cache is None:
+            raise
+        logger.warning(f"Could not check the FAISS manifest, serving the cached index: {e}")
+        return _vectorstore_cache
+    if _vectorstore_cache is not None and tag == _manifest_tag:
         logger.info("Using cached FAISS index")
         return _vectorstore_cache
     
-    logger.info("Loading FAISS index from S3...")
+    embeddings = get_embeddings()
+    vectorstore = None
+    if shared_manifest is not None:
+        try:
+            vectorstore = load_shared_index(shared_manifest, embeddings)
+        except Exception as e:
+            logger.warning(f"Could not open shared FAISS index, falling back to S3: {e}")
+    elif FAISS_SHARED_PATH:
+        logger.warning(f"No FAISS index published under {FAISS_SHARED_PATH}; falling back to S3")
+    if vectorstore is None:
+        vectorstore, etag = load_s3_index(embeddings)
+        if shared_manifest is None:
+            tag = ('s3', etag)
+        # else keep the shared version, so the shared path is retried only
+        # once a newer manifest is published there
     
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # Download index files
-        index_key = f"{S3_FAISS_PREFIX}index.faiss"
-        pkl_key = f"{S3_FAISS_PREFIX}index.pkl"
-        
-        local_index = os.path.join(tmpdir, "index.faiss")
-        local_pkl = os.path.join(tmpdir, "index.pkl")
-        
-        s3_client.download_file(S3_BUCKET, index_key, local_index)
-        s3_client.download_file(S3_BUCKET, pkl_key, local_pkl)
-        
-        # Load FAISS index
-        embeddings = get_embeddings()
-        vectorstore = FAISS.load_local(
-            tmpdir,
-            embeddings,
-            index_name="index",
-            allow_dangerous_deserialization=True
-        )
-        
-        logger.info(f"Loaded FAISS index with {vectorstore.index.ntotal} vectors")
-        
-        # Cache for subsequent invocations
-        _vectorstore_cache = vectorstore
-        
-        return vectorstore
+    logger.info(f"Loaded FAISS index with {vectorstore.index.ntotal} vectors")
+    
+    # Cache for subsequent invocations with the same manifest
+    _vectorstore_cache, _manifest_tag = vectorstore, tag
+    
+    return vectorstore
 
 
 def retrieve_context(question: str, k: int = SEARCH_K) -> List[Dict[str, Any]]:
@@ -86,9 +296,12 @@ def retrieve_context(question: str, k: int = SEARCH_K) -> List[Dict[str, Any]]:
     
     # Create retriever
     if SEARCH_TYPE == 'mmr':
-        retriever = vectorstore.as_retriever(
-            search_type='mmr',
-            search_kwargs={'k': k, 'fetch_k': SEARCH_FETCH_K}
+        # Vectorized MMR over a cached normalized matrix of the index vectors
+        retriever = MMRRetriever(
+            vectorstore=vectorstore,
+            k=k,
+            fetch_k=SEARCH_FETCH_K,
+            materialize=not getattr(vectorstore, 'memory_mapped', False)
         )
     else:
         retriever = vectorstore.as_retriever(
@@ -0,0 +1,50 @@
+"""
+Fixtures for offline tests of the Lambda handlers against LocalS3
+"""
+import os
+import sys
+
+_ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(_ROOT, 'benchmarks'))
+sys.path.insert(0, os.path.join(_ROOT, '..', 'RAG_Project', 'benchmarks'))
+
+import pytest  # noqa: E402
+
+from bench_index_loading import RandomEmbeddings  # noqa: E402
+from bench_sharded_indexing import _document, _load_handler  # noqa: E402
+from local_s3 import LocalS3  # noqa: E402
+
+DIM = 16
+
+
+@pytest.fixture
+def s3(tmp_path):
+    return LocalS3(str(tmp_path / 's3'))
+
+
+@pytest.fixture
+def indexing(s3):
+    """A fresh import of the indexing handler writing to *s3*."""
+    handler = _load_handler('indexing')
+    handler.s3_client = s3
+    handler.get_embeddings = lambda: RandomEmbeddings(DIM)
+    handler.EMBEDDING_CACHE_ENABLED = False
+    handler.NEAR_DUPLICATE_ENABLED = False
+    handler.SHARD_COMPACT_MIN_SHARDS = 2
+    return handler
+
+
+@pytest.fixture
+def retrieval(s3, tmp_path):
+    """A fresh import of the retrieval handler reading from *s3*."""
+    handler = _load_handler('retrieval')
+    handler.s3_client = s3
+    handler.get_embeddings = lambda: RandomEmbeddings(DIM)
+    handler.DOCSTORE_DIR = str(tmp_path / 'docstores')
+    handler.EXACT_VECTORS_DIR = str(tmp_path / 'exact-vectors')
+    return handler
+
+
+def document(number: int, chunks: int = 5):
+    """A FAISS store of *chunks* random vectors tagged ``doc<number>``."""
+    return _document(number, chunks, DIM)
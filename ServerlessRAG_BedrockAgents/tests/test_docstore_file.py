@@ -0,0 +1,106 @@
+"""
+Tests for the offset-indexed shard docstore and the pickled legacy format
+"""
+import json
+import os
+
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from conftest import document
+from docstore_file import FileDocstore, LegacyDocstoreError, PositionIds, load_docstore, write_docstore
+from index_shards import add_shard, empty_manifest
+
+
+def _legacy_shard(s3, indexing) -> dict:
+    """Store doc1 the way shards were written before the file docstore."""
+    shard = {'id': 'legacy-doc1', 'documents': ['doc1'], 'vectors': 5}
+    directory = os.path.join(s3.root, indexing.S3_BUCKET, indexing.S3_FAISS_PREFIX, 'shards', shard['id'])
+    os.makedirs(directory)
+    document(1).save_local(directory)
+    s3.put_object(
+        Bucket=indexing.S3_BUCKET, Key=f"{indexing.S3_FAISS_PREFIX}manifest.json",
+        Body=json.dumps(add_shard(empty_manifest(), shard)).encode('utf-8'),
+    )
+    return shard
+
+
+def test_documents_round_trip_by_position(tmp_path):
+    store = document(1)
+    first = store.docstore.search(store.index_to_docstore_id[0])
+    first.metadata['duplicates'] = [{'document_id': 'doc2', 'page': 3}]
+    first.page_content = 'Überstunden — “quoted” text\nacross lines'
+
+    write_docstore(str(tmp_path), store.docstore, store.index_to_docstore_id, store.index.ntotal)
+    docstore, ids = load_docstore(str(tmp_path))
+
+    assert isinstance(docstore, FileDocstore) and isinstance(ids, PositionIds)
+    assert len(docstore) == len(ids) == 5
+    for position in range(5):
+        original = store.docstore.search(store.index_to_docstore_id[position])
+        loaded = docstore.search(ids[position])
+        assert (loaded.page_content, loaded.metadata) == (original.page_content, original.metadata)
+        assert loaded.id == store.index_to_docstore_id[position]
+    assert docstore.search(5) == 'ID 5 not found.'
+    assert docstore.search('not a position') == 'ID not a position not found.'
+    with pytest.raises(KeyError):
+        ids[5]
+
+
+def test_empty_docstore_round_trips(tmp_path):
+    write_docstore(str(tmp_path), None, {}, 0)
+
+    docstore, ids = load_docstore(str(tmp_path))
+
+    assert len(docstore) == len(ids) == 0
+
+
+def test_pickled_docstore_is_refused_unless_allowed(tmp_path):
+    document(1).save_local(str(tmp_path))
+
+    with pytest.raises(LegacyDocstoreError):
+        load_docstore(str(tmp_path))
+    docstore, ids = load_docstore(str(tmp_path), allow_pickle=True)
+    assert docstore.search(ids[0]).metadata['document_id'] == 'doc1'
+
+
+def test_retrieval_refuses_a_legacy_shard_until_it_is_converted(s3, indexing, retrieval):
+    _legacy_shard(s3, indexing)
+    with pytest.raises(LegacyDocstoreError):
+        retrieval.load_faiss_index()
+
+    response = indexing.lambda_handler({'action': 'convert_docstores'}, None)
+    assert json.loads(response['body']) == {'converted_shards': ['legacy-doc1']}
+    assert json.loads(indexing.lambda_handler({'action': 'convert_docstores'}, None)['body']) == {
+        'converted_shards': []
+    }
+
+    vectorstore = retrieval.load_faiss_index()
+    assert isinstance(vectorstore, FAISS) and vectorstore.index.ntotal == 5
+    assert vectorstore.docstore.search(vectorstore.index_to_docstore_id[0]).metadata['document_id'] == 'doc1'
+
+
+def test_adopting_the_pre_shard_index_converts_its_docstore(s3, indexing, retrieval):
+    directory = os.path.join(s3.root, indexing.S3_BUCKET, indexing.S3_FAISS_PREFIX)
+    os.makedirs(directory)
+    document(1).save_local(directory)
+
+    indexing.index_document(document(2), 'doc2')
+
+    assert os.path.isfile(os.path.join(directory, 'docstore.jsonl'))
+    vectorstore = retrieval.load_faiss_index()
+    documents = {vectorstore.docstore.search(i).metadata['document_id']
+                 for i in vectorstore.index_to_docstore_id.values()}
+    assert documents == {'doc1', 'doc2'}
+
+
+def test_compaction_converts_a_legacy_shard_it_loads(s3, indexing, retrieval):
+    shard = _legacy_shard(s3, indexing)
+    indexing.index_document(document(2), 'doc2')
+
+    result = json.loads(indexing.lambda_handler({'action': 'compact'}, None)['body'])
+
+    assert result['compacted_shards'] == 2
+    directory = os.path.join(s3.root, indexing.S3_BUCKET, indexing.S3_FAISS_PREFIX, 'shards', shard['id'])
+    assert os.path.isfile(os.path.join(directory, 'docstore.jsonl'))
+    assert retrieval.load_faiss_index().index.ntotal == 10
@@ -0,0 +1,102 @@
+"""
+Tests for the chunk embedding cache's segment reads, sizes and compaction
+"""
+import numpy as np
+import pytest
+
+from embedding_cache import DirectoryStore, EmbeddingCache, S3Store
+from local_s3 import LocalS3
+
+DIM = 64
+
+
+def _embed(texts: list) -> np.ndarray:
+    return np.asarray([np.random.default_rng(len(text)).standard_normal(DIM) for text in texts], dtype=np.float32)
+
+
+def _texts(count: int, start: int = 0) -> list:
+    return [f"chunk {'x' * number}" for number in range(start, start + count)]
+
+
+@pytest.fixture(params=['s3', 'directory'])
+def store(request, tmp_path):
+    if request.param == 'directory':
+        return DirectoryStore(str(tmp_path / 'cache'))
+    return S3Store(LocalS3(str(tmp_path / 's3')), 'bucket', 'embedding-cache/model/')
+
+
+def _cache(store, **kwargs) -> EmbeddingCache:
+    return EmbeddingCache(store, 'model', **kwargs)
+
+
+def _segments(store) -> list:
+    return [name for name in store.list('segments') if name.endswith('.npy')]
+
+
+def test_hit_reads_only_its_rows_from_s3(tmp_path):
+    s3 = LocalS3(str(tmp_path / 's3'))
+    store = S3Store(s3, 'bucket', 'embedding-cache/model/')
+    texts = _texts(500)
+    _cache(store).embed(texts, _embed)
+    segment_bytes = len(store.get(_segments(store)[0]))
+
+    before = s3.bytes_transferred
+    vectors = _cache(store).embed([texts[250], texts[251], texts[400]], pytest.fail)
+
+    np.testing.assert_array_equal(vectors, _embed([texts[250], texts[251], texts[400]]))
+    read = s3.bytes_transferred - before - 500 * 32  # keys are always read
+    assert read < segment_bytes / 10
+
+
+def test_segments_are_capped_by_size(store):
+    cache = _cache(store, segment_bytes=10 * DIM * 4)
+    cache.embed(_texts(25), _embed)
+
+    assert len(_segments(store)) == 3
+
+
+def test_compaction_keeps_the_most_recently_used_entries(store):
+    cache = _cache(store, max_entries=30, segment_bytes=16 * DIM * 4)
+    old, recent = _texts(20), _texts(20, start=20)
+    cache.embed(old, _embed)
+    cache.embed(recent, _embed)
+    cache.embed(old[:10], pytest.fail)  # touched again
+
+    result = cache.compact()
+
+    assert result == {'segments_merged': 4, 'entries': 30, 'evicted': 10}
+    assert len(_segments(store)) == 2
+    assert store.list('touched') == []
+    compacted = _cache(store)
+    np.testing.assert_array_equal(compacted.embed(old[:10] + recent, pytest.fail), _embed(old[:10] + recent))
+    assert compacted.embed(old[10:], _embed).shape == (10, DIM)
+    assert compacted.stats['hits'] == 0
+
+
+def test_segments_are_listed_once_until_refreshed(store, monkeypatch):
+    cache = _cache(store)
+    listings = []
+    list_folder = store.list
+    monkeypatch.setattr(store, 'list', lambda folder: listings.append(folder) or list_folder(folder))
+    first, second = _texts(10), _texts(10, start=10)
+
+    cache.embed(first, _embed)
+    cache.embed(second, _embed)
+    np.testing.assert_array_equal(cache.embed(first + second, pytest.fail), _embed(first + second))
+    assert listings == ['segments']
+
+    _cache(store).embed(_texts(5, start=20), _embed)  # another container
+    cache.refresh()
+    assert cache.embed(_texts(5, start=20), pytest.fail).shape == (5, DIM)
+    assert listings == ['segments', 'segments', 'segments']
+
+
+def test_compaction_without_an_entry_limit_keeps_everything(store):
+    cache = _cache(store, max_entries=0)
+    cache.embed(_texts(20), _embed)
+    cache.embed(_texts(20, start=20), _embed)
+
+    result = cache.compact()
+
+    assert result == {'segments_merged': 2, 'entries': 40, 'evicted': 0}
+    np.testing.assert_array_equal(_cache(store).embed(_texts(40), pytest.fail), _embed(_texts(40)))
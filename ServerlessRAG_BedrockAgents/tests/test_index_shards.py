@@ -0,0 +1,139 @@
+"""
+Tests for the shard manifest functions and the combined shard search
+"""
+import faiss
+import numpy as np
+import pytest
+
+from conftest import DIM, document
+from index_shards import (
+    CompactionConflict, add_shard, apply_compaction, chunk_groups, combine_shards, empty_manifest, is_superseded
+)
+
+
+def _shard(shard_id: str, *documents: str, vectors: int = 10) -> dict:
+    return {'id': shard_id, 'documents': list(documents), 'vectors': vectors}
+
+
+def _manifest(*shards: dict) -> dict:
+    manifest = empty_manifest()
+    for shard in shards:
+        manifest = add_shard(manifest, shard)
+    return manifest
+
+
+def test_reindexing_retires_a_shard_holding_only_that_document():
+    manifest = _manifest(_shard('a', 'doc1'), _shard('b', 'doc1'))
+
+    assert [s['id'] for s in manifest['shards']] == ['b']
+    assert [s['id'] for s in manifest['retired']] == ['a']
+
+
+def test_reindexing_supersedes_a_document_in_a_shared_shard():
+    manifest = _manifest(_shard('merged', 'doc1', 'doc2', 'doc3'), _shard('new', 'doc2'))
+
+    merged = manifest['shards'][0]
+    assert (merged['documents'], merged['superseded']) == (['doc1', 'doc3'], ['doc2'])
+    assert manifest['retired'] == []
+
+    manifest = add_shard(manifest, _shard('newer', 'doc1', 'doc3'))
+    assert [s['id'] for s in manifest['shards']] == ['new', 'newer']
+    assert [s['id'] for s in manifest['retired']] == ['merged']
+
+
+def test_chunk_groups_record_the_documents_each_position_stands_for():
+    store = document(1)
+    store.docstore.search(store.index_to_docstore_id[3]).metadata['duplicates'] = [{'document_id': 'doc2', 'page': 1}]
+
+    assert chunk_groups(store) == [
+        {'documents': ['doc1'], 'ranges': [[0, 3], [4, 5]]},
+        {'documents': ['doc1', 'doc2'], 'ranges': [[3, 4]]},
+    ]
+
+
+def test_superseding_records_the_positions_to_leave_out():
+    chunks = [
+        {'documents': ['doc1'], 'ranges': [[0, 3], [8, 9]]},
+        {'documents': ['doc2'], 'ranges': [[3, 5]]},
+        {'documents': ['doc1', 'doc2'], 'ranges': [[5, 8]]},
+    ]
+    manifest = _manifest({**_shard('merged', 'doc1', 'doc2', 'doc3'), 'chunks': chunks}, _shard('new', 'doc1'))
+    assert manifest['shards'][0]['superseded_positions'] == [[0, 3], [8, 9]]
+
+    manifest = add_shard(manifest, _shard('newer', 'doc2'))
+    assert manifest['shards'][0]['superseded_positions'] == [[0, 3], [3, 5], [5, 8], [8, 9]]
+
+
+def test_compaction_carries_over_documents_superseded_while_it_ran():
+    manifest = _manifest(_shard('a', 'doc1', 'doc2'), _shard('b', 'doc3'))
+    merged = list(manifest['shards'])
+    manifest = add_shard(manifest, _shard('c', 'doc2'))
+
+    manifest = apply_compaction(manifest, merged, _shard('compacted', 'doc1', 'doc2', 'doc3'))
+
+    compacted = manifest['shards'][-1]
+    assert [s['id'] for s in manifest['shards']] == ['c', 'compacted']
+    assert (compacted['documents'], compacted['superseded']) == (['doc1', 'doc3'], ['doc2'])
+
+
+def test_compaction_of_a_retired_shard_conflicts():
+    manifest = _manifest(_shard('a', 'doc1'), _shard('b', 'doc2'))
+    merged = list(manifest['shards'])
+    manifest = add_shard(manifest, _shard('c', 'doc1'))
+
+    with pytest.raises(CompactionConflict):
+        apply_compaction(manifest, merged, _shard('compacted', 'doc1', 'doc2'))
+
+
+def test_chunks_standing_in_for_live_duplicates_are_not_superseded():
+    duplicates = [{'document_id': 'doc2', 'page': 0}]
+
+    assert is_superseded({'document_id': 'doc1'}, {'doc1'})
+    assert not is_superseded({'document_id': 'doc1', 'duplicates': duplicates}, {'doc1'})
+    assert is_superseded({'document_id': 'doc1', 'duplicates': duplicates}, {'doc1', 'doc2'})
+    assert not is_superseded({'document_id': 'doc2'}, {'doc1'})
+
+
+def test_sharded_search_matches_one_index_over_all_vectors():
+    stores = [document(number, chunks=chunks) for number, chunks in ((1, 7), (2, 3), (3, 9))]
+    combined = combine_shards(stores, stores[0].embeddings)
+    reference = faiss.IndexFlatL2(DIM)
+    for store in stores:
+        reference.add(store.index.reconstruct_n(0, store.index.ntotal))
+    queries = np.random.default_rng(0).standard_normal((4, DIM), dtype=np.float32)
+
+    distances, labels = combined.index.search(queries, 5)
+    expected_distances, expected_labels = reference.search(queries, 5)
+
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+    np.testing.assert_array_equal(combined.index.reconstruct_n(5, 6), reference.reconstruct_n(5, 6))
+
+
+def test_positions_map_to_the_owning_shards_documents():
+    stores = [document(1, chunks=2), document(2, chunks=3)]
+    combined = combine_shards(stores, stores[0].embeddings)
+
+    docs = [combined.docstore.search(combined.index_to_docstore_id[p]) for p in range(combined.index.ntotal)]
+
+    assert [(d.metadata['document_id'], d.metadata['page']) for d in docs] == [
+        ('doc1', 0), ('doc1', 1), ('doc2', 0), ('doc2', 1), ('doc2', 2)
+    ]
+    assert combined.docstore.search(5) == 'ID 5 not found.'
+
+
+def test_excluded_positions_are_never_returned():
+    stores = [document(1, chunks=4), document(2, chunks=4)]
+    combined = combine_shards(stores, stores[0].embeddings, [np.array([0, 1, 2]), np.array([], dtype=np.int64)])
+
+    _, labels = combined.index.search(stores[0].index.reconstruct_n(0, 1), 8)
+
+    assert sorted(labels[0][labels[0] >= 0]) == [3, 4, 5, 6, 7]
+    assert list(labels[0][-3:]) == [-1, -1, -1]
+
+
+def test_a_single_shard_is_returned_unchanged_unless_filtered():
+    store = document(1)
+
+    assert combine_shards([store], store.embeddings) is store
+    assert combine_shards([store], store.embeddings, [np.array([0])]) is not store
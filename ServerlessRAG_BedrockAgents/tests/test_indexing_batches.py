@@ -0,0 +1,71 @@
+"""
+Tests for batched indexing events: direct ``documents`` lists and SQS batches
+"""
+import json
+import os
+
+import pytest
+from pdf_fixtures import make_text_pdf
+
+
+@pytest.fixture
+def upload(s3, indexing):
+    """Store a text PDF at documents/<name>.pdf and return its key."""
+    def upload(name: str, pages: int = 2) -> str:
+        key = f"documents/{name}.pdf"
+        path = os.path.join(s3.root, indexing.S3_BUCKET, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        make_text_pdf(path, pages, seed=len(name))
+        return key
+    return upload
+
+
+def _sqs(*bodies) -> dict:
+    return {'Records': [
+        {'messageId': f'm{number}', 'body': body if isinstance(body, str) else json.dumps(body)}
+        for number, body in enumerate(bodies)
+    ]}
+
+
+def test_parse_batch_keys_items_by_message_id_or_document_id(indexing):
+    sqs = indexing.parse_batch(_sqs({'document_key': 'a.pdf', 'document_id': 'a'}, 'not json'))
+    assert sqs[0] == {'document_key': 'a.pdf', 'document_id': 'a', 'item_id': 'm0'}
+    assert sqs[1]['item_id'] == 'm1' and 'error' in sqs[1]
+
+    direct = indexing.parse_batch({'documents': [{'document_key': 'b.pdf', 'document_id': 'b'}]})
+    assert direct == [{'document_key': 'b.pdf', 'document_id': 'b', 'item_id': 'b'}]
+
+
+def test_sqs_batch_reports_only_the_failed_messages(indexing, upload):
+    event = _sqs(
+        {'document_key': upload('doc1'), 'document_id': 'doc1'},
+        {'document_key': 'documents/missing.pdf', 'document_id': 'missing'},
+        '{broken',
+        {'document_key': upload('doc2'), 'document_id': 'doc2'},
+    )
+
+    response = indexing.lambda_handler(event, None)
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': 'm2'}, {'itemIdentifier': 'm1'}]}
+    manifest, _ = indexing.read_manifest_from_s3()
+    assert [s['documents'] for s in manifest['shards']] == [['doc1', 'doc2']]
+
+
+def test_documents_batch_reports_partial_and_total_failure(indexing, upload):
+    partial = indexing.lambda_handler({'documents': [
+        {'document_key': upload('doc1'), 'document_id': 'doc1'},
+        {'document_key': 'documents/missing.pdf', 'document_id': 'missing'},
+    ]}, None)
+    assert partial['statusCode'] == 207
+    assert [f['item_id'] for f in json.loads(partial['body'])['failures']] == ['missing']
+
+    failed = indexing.lambda_handler({'documents': [
+        {'document_key': 'documents/missing.pdf', 'document_id': 'missing'},
+    ]}, None)
+    assert failed['statusCode'] == 500
+
+
+def test_empty_documents_batch_is_a_bad_request(indexing):
+    response = indexing.lambda_handler({'documents': []}, None)
+
+    assert response['statusCode'] == 400
@@ -0,0 +1,103 @@
+"""
+Tests for the indexing Lambda's compare-and-swap manifest updates
+"""
+import json
+import os
+import threading
+
+import pytest
+
+from conftest import document
+from index_shards import LEGACY_SHARD, add_shard
+
+
+def _shard(number: int) -> dict:
+    return {'id': f'shard{number}', 'documents': [f'doc{number}'], 'vectors': 1}
+
+
+class RecordingS3:
+    """Wrap LocalS3 to record write conditions; with *conflict*, the first
+    write loses to another writer that adds shard99 just before it."""
+
+    def __init__(self, s3, indexing, conflict: bool = False):
+        self.s3 = s3
+        self.indexing = indexing
+        self.conflict = conflict
+        self.puts = []
+
+    def __getattr__(self, name):
+        return getattr(self.s3, name)
+
+    def put_object(self, **kwargs):
+        self.puts.append({key: value for key, value in kwargs.items() if key.startswith('If')})
+        if self.conflict and len(self.puts) == 1:
+            manifest, etag = self.indexing.read_manifest_from_s3()
+            self.s3.put_object(
+                Bucket=kwargs['Bucket'], Key=kwargs['Key'], IfMatch=etag,
+                Body=json.dumps(add_shard(manifest, _shard(99))).encode('utf-8'),
+            )
+        return self.s3.put_object(**kwargs)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(indexing):
+    indexing.MANIFEST_RETRY_BASE_DELAY = indexing.MANIFEST_RETRY_MAX_DELAY = 0
+
+
+def test_first_write_requires_that_no_manifest_exists(indexing, s3):
+    indexing.s3_client = writer = RecordingS3(s3, indexing)
+
+    indexing.update_manifest(lambda manifest: add_shard(manifest, _shard(1)))
+
+    assert writer.puts[0] == {'IfNoneMatch': '*'}
+    assert s3.conflicts == 0
+
+
+def test_losing_writer_rebases_on_the_winning_manifest(indexing, s3):
+    indexing.update_manifest(lambda manifest: add_shard(manifest, _shard(1)))
+    indexing.s3_client = writer = RecordingS3(s3, indexing, conflict=True)
+
+    manifest = indexing.update_manifest(lambda current: add_shard(current, _shard(2)))
+
+    assert s3.conflicts == 1
+    assert [list(put) for put in writer.puts[:2]] == [['IfMatch'], ['IfMatch']]
+    assert writer.puts[0] != writer.puts[1]
+    assert [s['id'] for s in manifest['shards']] == ['shard1', 'shard99', 'shard2']
+    assert manifest['version'] == 3
+    assert indexing.read_manifest_from_s3()[0] == manifest
+
+
+def test_concurrent_writers_lose_no_updates(indexing, s3):
+    writers = [
+        threading.Thread(target=indexing.update_manifest, args=(lambda m, n=n: add_shard(m, _shard(n)),))
+        for n in range(12)
+    ]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    manifest, _ = indexing.read_manifest_from_s3()
+    assert sorted(s['id'] for s in manifest['shards']) == sorted(f'shard{n}' for n in range(12))
+    assert manifest['version'] == 12
+
+
+def test_write_conflict_needs_a_precondition_failure(indexing):
+    assert not indexing.is_write_conflict(RuntimeError('boom'))
+    assert not indexing.is_write_conflict(type('Failed', (Exception,), {'response': None})())
+
+
+def test_global_index_is_adopted_as_the_first_shard(indexing, s3):
+    directory = os.path.join(s3.root, indexing.S3_BUCKET, indexing.S3_FAISS_PREFIX)
+    os.makedirs(directory)
+    document(1).save_local(directory)
+
+    manifest, etag = indexing.read_manifest_from_s3()
+    assert etag is None
+    assert manifest['shards'] == [{**LEGACY_SHARD, 'vectors': 5, 'created': manifest['shards'][0]['created']}]
+
+    indexing.index_document(document(2), 'doc2')
+    manifest, etag = indexing.read_manifest_from_s3()
+    assert etag is not None
+    assert [s['id'] for s in manifest['shards']][0] == LEGACY_SHARD['id']
+    assert len(manifest['shards']) == 2
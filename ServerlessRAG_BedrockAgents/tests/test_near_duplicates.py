@@ -0,0 +1,71 @@
+"""
+Tests for MinHash/LSH near-duplicate chunk collapsing
+"""
+import random
+
+from langchain_core.documents import Document
+
+from near_duplicates import NearDuplicateDetector
+
+_VOCABULARY = [f"word{number}" for number in range(5000)]
+
+
+def _text(seed: int, words: int = 300) -> list:
+    return random.Random(seed).choices(_VOCABULARY, k=words)
+
+
+def _edit(words: list, every: int) -> str:
+    """Replace every *every*-th word, so a shingle survives only between edits."""
+    return " ".join(f"edited{i}" if i % every == every - 1 else word for i, word in enumerate(words))
+
+
+def _chunk(text: str, document_id: str, page: int = 0) -> Document:
+    return Document(page_content=text, metadata={'document_id': document_id, 'page': page})
+
+
+def test_chunks_above_the_threshold_collapse_into_the_first():
+    base = _text(1)
+    documents = [
+        _chunk(" ".join(base), 'doc1'),
+        _chunk(" ".join(_text(2)), 'doc2'),
+        _chunk(_edit(base, 150), 'doc3', page=4),  # one shingle in ~30 differs
+        _chunk("\n".join(base), 'doc4', page=7),  # only whitespace differs
+    ]
+
+    detector = NearDuplicateDetector(threshold=0.85)
+    kept = detector.collapse(documents)
+
+    assert [doc.metadata['document_id'] for doc in kept] == ['doc1', 'doc2']
+    assert kept[0].metadata['duplicates'] == [
+        {'document_id': 'doc3', 'page': 4}, {'document_id': 'doc4', 'page': 7}
+    ]
+    assert 'duplicates' not in documents[0].metadata
+    assert detector.stats['collapsed'] == 2
+
+
+def test_chunks_below_the_threshold_are_all_kept():
+    base = _text(1)
+    # Every 8th word edited leaves about 3 of 8 shingles shared (Jaccard ~0.2)
+    texts = [" ".join(base), _edit(base, 8), _edit(base, 4), " ".join(_text(3))]
+
+    detector = NearDuplicateDetector(threshold=0.85)
+
+    assert detector.representatives(texts) == [0, 1, 2, 3]
+    assert detector.collapse_records(texts, [{} for _ in texts]) == [0, 1, 2, 3]
+
+
+def test_collapsed_references_are_carried_over():
+    text = " ".join(_text(1))
+    metadatas = [
+        {'document_id': 'doc1', 'page': 0},
+        {'document_id': 'doc2', 'page': 1, 'duplicates': [{'document_id': 'doc3', 'page': 2}]},
+    ]
+
+    keep = NearDuplicateDetector().collapse_records([text, text], metadatas)
+
+    assert keep == [0]
+    assert metadatas[0]['duplicates'] == [{'document_id': 'doc2', 'page': 1}, {'document_id': 'doc3', 'page': 2}]
+
+
+def test_texts_without_words_are_kept():
+    assert NearDuplicateDetector().representatives(["", "   ", "one"]) == [0, 1, 2]
@@ -0,0 +1,79 @@
+"""
+Offline tests for the retrieval Lambda's manifest-aware index cache
+"""
+from conftest import document
+
+
+def _document_ids(vectorstore) -> set:
+    return {
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[position]).metadata['document_id']
+        for position in range(vectorstore.index.ntotal)
+    }
+
+
+def test_warm_container_picks_up_new_shards_and_drops_retired_ones(indexing, retrieval):
+    first = indexing.index_document(document(1), 'doc1')
+    indexing.index_document(document(2), 'doc2')
+    assert retrieval.load_faiss_index().index.ntotal == 10
+
+    indexing.index_document(document(3), 'doc3')
+    vectorstore = retrieval.load_faiss_index()
+    assert _document_ids(vectorstore) == {'doc1', 'doc2', 'doc3'}
+
+    # Re-indexing doc1 retires its first shard
+    indexing.index_document(document(1, chunks=3), 'doc1')
+    vectorstore = retrieval.load_faiss_index()
+    assert vectorstore.index.ntotal == 13
+    assert first['id'] not in retrieval._shard_cache
+
+
+def test_unchanged_manifest_serves_the_cached_index_after_a_head_request(indexing, retrieval, s3):
+    indexing.index_document(document(1), 'doc1')
+    cached = retrieval.load_faiss_index()
+    requests = s3.requests
+
+    assert retrieval.load_faiss_index() is cached
+    assert s3.requests == requests + 1
+
+
+def test_only_shards_added_since_the_last_load_are_downloaded(indexing, retrieval, monkeypatch):
+    indexing.index_document(document(1), 'doc1')
+    retrieval.load_faiss_index()
+    loaded = []
+    load_shard = retrieval.load_shard
+    monkeypatch.setattr(retrieval, 'load_shard', lambda shard, *args: loaded.append(shard['id']) or load_shard(shard, *args))
+
+    second = indexing.index_document(document(2), 'doc2')
+    retrieval.load_faiss_index()
+
+    assert loaded == [second['id']]
+
+
+def _chunks_of(vectorstore, document_id: str) -> int:
+    _, labels = vectorstore.index.search(document(0).index.reconstruct_n(0, 1), vectorstore.index.ntotal)
+    return sum(
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[label]).metadata['document_id'] == document_id
+        for label in labels[0] if label >= 0
+    )
+
+
+def test_reindexed_document_in_a_compacted_shard_is_not_served_twice(indexing, retrieval):
+    indexing.index_document(document(1), 'doc1')
+    indexing.index_document(document(2), 'doc2')
+    indexing.compact_shards()
+    assert _chunks_of(retrieval.load_faiss_index(), 'doc1') == 5
+
+    indexing.index_document(document(1, chunks=3), 'doc1')
+    manifest, _ = indexing.read_manifest_from_s3()
+    assert manifest['shards'][0]['superseded_positions'] == [[0, 5]]
+    vectorstore = retrieval.load_faiss_index()
+    assert _chunks_of(vectorstore, 'doc1') == 3
+    assert _chunks_of(vectorstore, 'doc2') == 5
+
+    # The next compaction drops the superseded chunks for good
+    indexing.compact_shards()
+    manifest, _ = indexing.read_manifest_from_s3()
+    assert [(s['documents'], s['vectors'], s.get('superseded')) for s in manifest['shards']] == [
+        (['doc1', 'doc2'], 8, None)
+    ]
+    assert _chunks_of(retrieval.load_faiss_index(), 'doc1') == 3
@@ -0,0 +1,38 @@
+"""
+Checks that modules copied between projects have not drifted
+
+The indexing and retrieval Lambdas share ``lambda/common``, which both
+images copy in. The modules below also exist in ``RAG_Project``, which is
+packaged separately, so they are kept as byte-identical copies of it.
+"""
+import filecmp
+import os
+
+import pytest
+
+_ROOT = os.path.join(os.path.dirname(__file__), '..')
+_LAMBDA_DIR = os.path.join(_ROOT, 'lambda')
+_RAG_PROJECT = os.path.join(_ROOT, '..', 'RAG_Project')
+
+COPIES = {
+    'ann_index.py': 'common',
+    'chunker.py': 'indexing',
+    'embedding_engine.py': 'indexing',
+    'mmr_retrieval.py': 'retrieval',
+}
+
+
+@pytest.mark.parametrize('name', sorted(COPIES))
+def test_lambda_copy_matches_rag_project(name):
+    lambda_copy = os.path.join(_LAMBDA_DIR, COPIES[name], name)
+
+    assert filecmp.cmp(os.path.join(_RAG_PROJECT, name), lambda_copy, shallow=False), (
+        f"lambda/{COPIES[name]}/{name} differs from RAG_Project/{name}; copy the change across"
+    )
+
+
+def test_common_modules_are_not_shadowed_by_function_copies():
+    common = {name for name in os.listdir(os.path.join(_LAMBDA_DIR, 'common')) if name.endswith('.py')}
+
+    for function in ('indexing', 'retrieval'):
+        assert not common & set(os.listdir(os.path.join(_LAMBDA_DIR, function))), function